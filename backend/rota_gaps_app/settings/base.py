@@ -10,6 +10,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 # Application definition
 INSTALLED_APPS = [
+    # Serves runserver over ASGI so WebSockets work in development
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -21,6 +23,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'rest_framework_simplejwt.token_blacklist',
     'rest_framework',
+    'channels',
 
     # Custom Apps
     'shifts.apps.ShiftsConfig',
@@ -35,14 +38,85 @@ ACCOUNT_USERNAME_REQUIRED = False
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'shifts.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'shifts.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Default and maximum page sizes for the cursor-paginated list endpoints
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Limits for the bulk shift endpoints: the most rows accepted per request
+# and how many rows are written per INSERT/UPDATE statement
+SHIFT_BULK_MAX_ROWS = 5000
+SHIFT_BULK_BATCH_SIZE = 500
+
+# Number of rows fetched per round trip by the streaming exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Delta sync: how far before a token changes are re-read, to catch rows
+# written by transactions that committed late, and how long tombstones of
+# deleted rows are kept. Older tokens get a full snapshot instead. At most
+# SHIFT_SYNC_PAGE_SIZE shifts, claims and deletions are sent per response;
+# the rest follow on the next page.
+SHIFT_SYNC_OVERLAP_SECONDS = 5
+SHIFT_SYNC_RETENTION_DAYS = 30
+SHIFT_SYNC_PAGE_SIZE = 500
+
+# Shift matching: candidates proposed per open shift, and the weekly hours
+# no proposed candidate may go over
+MATCHING_CANDIDATES_PER_SHIFT = 5
+MATCHING_MAX_WEEKLY_HOURS = 48
+
+# Recurring shifts: how many days ahead their occurrences are posted as
+# shifts by the daily materialize_recurring_shifts run
+RECURRING_SHIFT_WINDOW_DAYS = 28
+
+# Background jobs: the base delay (in seconds) before a failed job is
+# retried, doubling on each attempt, and how long a running job's lease
+# lasts: its worker renews it every third of that, and a job whose lease
+# runs out is assumed lost and handed to another worker
+JOBS_RETRY_BACKOFF = 30
+JOBS_TIMEOUT = 600
+
+# Rota uploads larger than this many bytes are imported in the background
+ROTA_IMPORT_INLINE_MAX_BYTES = 256 * 1024
+
+# Avatars: the square sizes (in pixels) every upload is rendered at, the
+# largest upload accepted in bytes and in decoded pixels, and the WebP
+# quality of the renditions
+AVATAR_SIZES = (64, 256)
+AVATAR_MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+AVATAR_MAX_PIXELS = 4096 * 4096
+AVATAR_QUALITY = 80
+
+# Link emailed with invitations; {token} is the invitation token
+INVITATION_URL = 'http://localhost:5173/register?token={token}'
+DEFAULT_FROM_EMAIL = 'RotaIQ <no-reply@rotaiq.local>'
+
+# Cache settings. The local-memory backend is used unless a deployment
+# overrides CACHES, e.g. with django.core.cache.backends.redis.RedisCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
 }
 
+# How long (in seconds) analytics responses may be served from the cache
+ANALYTICS_CACHE_TIMEOUT = 300
+
+# How long (in seconds) a user's row and resolved scope may be reused by
+# authentication before being reloaded
+USER_SCOPE_CACHE_TIMEOUT = 300
+
 # Simple JWT settings for token lifespan
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -66,6 +140,14 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Request instrumentation is opt-in: add
+# 'shifts.metrics.RequestMetricsMiddleware' first in MIDDLEWARE to report
+# per-view query counts and timings through Server-Timing headers and
+# /api/metrics/. Requests running more queries than the budget are logged,
+# and the metrics are only served to staff users at the listed addresses.
+REQUEST_METRICS_QUERY_BUDGET = 50
+REQUEST_METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')
+
 ROOT_URLCONF = 'rota_gaps_app.urls'
 
 TEMPLATES = [
@@ -84,6 +166,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'rota_gaps_app.wsgi.application'
+ASGI_APPLICATION = 'rota_gaps_app.asgi.application'
+
+# Channel layer used to fan out real-time shift board events. The in-memory
+# layer only reaches connections served by the same process; deployments
+# with several workers should use channels_redis.core.RedisChannelLayer.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -114,4 +206,8 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
+
+# Uploaded files (avatars, queued rota imports)
+MEDIA_URL = '/media/'
+MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
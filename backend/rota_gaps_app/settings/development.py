@@ -10,10 +10,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock when a transaction starts so concurrent
+        # writers wait for each other instead of failing to upgrade a lock
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Use a file for the test database so tests running several
+        # threads share one database with normal locking
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
     "http://127.0.0.1:5173",
-]
\ No newline at end of file
+]
+# Print outgoing emails, such as invitations, to the console
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
@@ -19,9 +21,11 @@ router.register(r'users', views.UserViewSet)
 router.register(r'shifts', views.ShiftViewSet)
 router.register(r'regions', views.RegionViewSet)
 router.register(r'branches', views.BranchViewSet)
+router.register(r'recurring-shifts', views.RecurringShiftViewSet)
 router.register(r'claims', views.ShiftClaimViewSet, basename='shiftclaim')
 router.register(r'invitations', views.InvitationViewSet)
 router.register(r'analytics', views.AnalyticsViewSet, basename='analytics')
+router.register(r'jobs', views.JobViewSet, basename='job')
 
 
 urlpatterns = [
@@ -52,4 +56,9 @@ urlpatterns = [
         TokenRefreshView.as_view(),
         name='token_refresh'
     ),
-]
\ No newline at end of file
+
+    path('api/metrics/', views.request_metrics, name='request_metrics'),
+]
+
+# Uploaded media is served by Django only in development
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import Branch, User, Shift, Invitation, Region
+from .models import (
+    Branch, User, Shift, Invitation, Region, DailyShiftStat, Job,
+    RecurringShift
+)
 
 
 @admin.register(Region)
@@ -28,6 +31,40 @@ class ShiftAdmin(admin.ModelAdmin):
     search_fields = ('role', 'description')
 
 
+@admin.register(RecurringShift)
+class RecurringShiftAdmin(admin.ModelAdmin):
+    """Admin configuration for recurring shift patterns."""
+    list_display = (
+        'role', 'branch', 'frequency', 'start_time', 'end_time',
+        'starts_on', 'ends_on', 'materialized_until'
+    )
+    list_filter = ('frequency', 'branch')
+    readonly_fields = ('materialized_until',)
+
+
+@admin.register(DailyShiftStat)
+class DailyShiftStatAdmin(admin.ModelAdmin):
+    """Admin configuration for the DailyShiftStat rollup."""
+    list_display = ('branch', 'date', 'status', 'count')
+    list_filter = ('status', 'branch')
+    date_hierarchy = 'date'
+    readonly_fields = ('branch', 'date', 'status', 'count')
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Admin configuration for background jobs."""
+    list_display = (
+        'name', 'status', 'attempts', 'created_by', 'created_at',
+        'finished_at'
+    )
+    list_filter = ('status', 'name')
+    readonly_fields = (
+        'name', 'kwargs', 'attempts', 'result', 'error', 'worker',
+        'created_by', 'created_at', 'started_at', 'finished_at'
+    )
+
+
 @admin.register(Invitation)
 class InvitationAdmin(admin.ModelAdmin):
     """Admin configuration for the Invitation model."""
@@ -0,0 +1,167 @@
+"""
+Avatar image pipeline.
+
+An uploaded avatar is checked against byte and pixel limits using only
+its header and stored as is, as `avatars/<hash>/original`, where `<hash>`
+is a hash of the uploaded bytes. The `process_avatar` background job then
+decodes it once, turns it into square WebP renditions at each of
+`AVATAR_SIZES`, stored as `avatars/<hash>/<size>.webp`, and deletes the
+original. Identical uploads share files, and a URL always refers to the
+same image and can be cached indefinitely.
+"""
+import hashlib
+import io
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+AVATAR_DIR = 'avatars'
+RENDITION_RE = re.compile(r'^avatars/[0-9a-f]{64}/\d+\.webp$')
+
+
+def rendition_name(digest, size):
+    return f'{AVATAR_DIR}/{digest}/{size}.webp'
+
+
+def original_name(digest):
+    return f'{AVATAR_DIR}/{digest}/original'
+
+
+def digest_of(name):
+    return posixpath.basename(posixpath.dirname(name))
+
+
+def avatar_url(name, size):
+    """
+    Returns the URL of an avatar at the given size.
+
+    Avatars stored before the pipeline existed only have their original
+    file, which is returned for every size.
+    """
+    if not name:
+        return None
+    if RENDITION_RE.match(name):
+        name = posixpath.join(posixpath.dirname(name), f'{size}.webp')
+    return default_storage.url(name)
+
+
+def validate_upload(upload):
+    """
+    Rejects uploads that are too large in bytes or pixels, reading only
+    the image header.
+
+    Raises:
+        ValidationError: If the upload is over a limit or not an image.
+    """
+    if upload.size > settings.AVATAR_MAX_UPLOAD_BYTES:
+        limit = settings.AVATAR_MAX_UPLOAD_BYTES // (1024 * 1024)
+        raise ValidationError(f'Avatars must be at most {limit} MB.')
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError('Upload a valid image.')
+    finally:
+        upload.seek(0)
+    if width * height > settings.AVATAR_MAX_PIXELS:
+        raise ValidationError(
+            f'Avatars must be at most {settings.AVATAR_MAX_PIXELS} pixels.'
+        )
+
+
+def render(image, size):
+    """
+    Crops a decoded image to a centred square of `size` pixels and encodes
+    it as WebP.
+    """
+    square = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    square.save(output, 'WEBP', quality=settings.AVATAR_QUALITY, method=4)
+    return output.getvalue()
+
+
+def missing_renditions(name):
+    """
+    Returns the sizes, largest first, not yet rendered for an avatar.
+    """
+    digest = digest_of(name)
+    return [
+        size for size in sorted(settings.AVATAR_SIZES, reverse=True)
+        if not default_storage.exists(rendition_name(digest, size))
+    ]
+
+
+def store_upload(upload):
+    """
+    Stores an uploaded avatar as is, for `render_avatar` to produce its
+    renditions from later.
+
+    Nothing is written if the same image has been uploaded before.
+
+    Returns:
+        str: The storage name of the largest rendition, to be saved as
+        `User.avatar` once the renditions exist.
+    """
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    digest = hasher.hexdigest()
+    name = rendition_name(digest, max(settings.AVATAR_SIZES))
+
+    original = original_name(digest)
+    if missing_renditions(name) and not default_storage.exists(original):
+        upload.seek(0)
+        default_storage.save(original, upload)
+    return name
+
+
+def render_avatar(name):
+    """
+    Produces the missing renditions of an avatar stored by `store_upload`
+    from its original, which is then deleted.
+
+    Renditions that already exist, from an earlier upload of the same
+    image, are reused rather than written again.
+    """
+    digest = digest_of(name)
+    missing = missing_renditions(name)
+    if missing:
+        with default_storage.open(original_name(digest)) as original, \
+                Image.open(original) as image:
+            largest = max(settings.AVATAR_SIZES)
+            # Let JPEG decode at a reduced scale when it is much larger
+            # than the biggest rendition
+            image.draft('RGB', (largest * 2, largest * 2))
+            image = ImageOps.exif_transpose(image)
+            has_alpha = (
+                'A' in image.getbands() or 'transparency' in image.info
+            )
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+            for size in missing:
+                default_storage.save(
+                    rendition_name(digest, size),
+                    ContentFile(render(image, size))
+                )
+    default_storage.delete(original_name(digest))
+
+
+def delete_avatar(name):
+    """
+    Deletes the files of an avatar that is no longer used, including all
+    of its renditions.
+    """
+    if not name:
+        return
+    if RENDITION_RE.match(name):
+        digest = digest_of(name)
+        for size in settings.AVATAR_SIZES:
+            default_storage.delete(rendition_name(digest, size))
+        default_storage.delete(original_name(digest))
+    else:
+        default_storage.delete(name)
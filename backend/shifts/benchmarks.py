@@ -0,0 +1,462 @@
+"""
+Synthetic data and scripted API scenarios for benchmarking.
+
+`seed()` fills a database with regions, branches, staff, shifts and claims
+at a chosen scale. The same arguments and seed always produce the same
+data, so two runs of `benchmark_api` against databases seeded the same way
+can be compared. `ApiBenchmark` then sends scripted requests through the
+full Django stack (middleware, JWT authentication, views, rendering) with
+the test client and records latency percentiles, query counts and peak
+memory for each scenario. Network and web server overhead are not
+included.
+
+Write scenarios (claiming and approving) work on shifts they create far in
+the future and delete again afterwards, leaving the seeded data as it was.
+"""
+import math
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import cache as analytics_cache, scopes
+from .models import (
+    Region, Branch, User, Shift, ShiftClaim, DailyShiftStat, Tombstone
+)
+
+EMAIL_PREFIX = 'bench.'
+PASSWORD = 'benchmark'
+
+# Named shift counts accepted by `seed_benchmark_data --scale`
+SCALES = {
+    'small': 1_000,
+    'medium': 100_000,
+    'large': 1_000_000,
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def bench_email(kind, number):
+    return f'{EMAIL_PREFIX}{kind}{number}@example.com'
+
+
+def seed(shifts, regions=5, branches=10, staff=20, claims=2, days=90,
+         seed=0, batch_size=5000, log=None):
+    """
+    Creates a synthetic organisation and its rota.
+
+    Each region has `branches` branches with a manager and `staff`
+    employees, one in ten of them floating, and each region has a region
+    manager. Shifts are spread over `days` days either side of today: past
+    shifts are mostly assigned, future ones mostly open with `claims`
+    pending claims each.
+
+    Returns:
+        dict: The number of rows created per model.
+    """
+    rng = random.Random(seed)
+    password = make_password(PASSWORD)
+    write = log or (lambda message: None)
+
+    with transaction.atomic():
+        region_list = Region.objects.bulk_create(
+            Region(name=f'Benchmark Region {i}') for i in range(regions)
+        )
+        branch_list = Branch.objects.bulk_create(
+            Branch(
+                name=f'Benchmark Branch {i}',
+                region=region_list[i % regions],
+            )
+            for i in range(regions * branches)
+        )
+        users = [User(
+            email=bench_email('head', 0), password=password,
+            first_name='Head', last_name='Office', role='head_office',
+        )]
+        for i, region in enumerate(region_list):
+            users.append(User(
+                email=bench_email('region', i), password=password,
+                first_name='Region', last_name=str(i),
+                role='region_manager', region=region,
+            ))
+        for i, branch in enumerate(branch_list):
+            users.append(User(
+                email=bench_email('manager', i), password=password,
+                first_name='Branch', last_name=str(i),
+                role='branch_manager', branch=branch,
+            ))
+        for i in range(len(branch_list) * staff):
+            users.append(User(
+                email=bench_email('employee', i), password=password,
+                first_name='Employee', last_name=str(i),
+                role='floating_employee' if i % 10 == 9 else 'employee',
+                branch=branch_list[i % len(branch_list)],
+            ))
+        users = User.objects.bulk_create(users, batch_size=batch_size)
+    write(f'Created {len(region_list)} regions, {len(branch_list)} '
+          f'branches and {len(users)} users.')
+
+    managers = {
+        user.branch_id: user for user in users
+        if user.role == 'branch_manager'
+    }
+    employees = {}
+    for user in users:
+        if user.role in ('employee', 'floating_employee'):
+            employees.setdefault(user.branch_id, []).append(user)
+
+    now = timezone.now().replace(minute=0, second=0, microsecond=0)
+    first = now - timedelta(days=days)
+    created_shifts = created_claims = 0
+    for offset in range(0, shifts, batch_size):
+        batch, pending = [], []
+        for _ in range(min(batch_size, shifts - offset)):
+            branch = rng.choice(branch_list)
+            start = first + timedelta(hours=rng.randrange(days * 2 * 24))
+            past = start < now
+            status = rng.choices(
+                ('open', 'claimed', 'filled'),
+                (30, 10, 60) if past else (60, 25, 15)
+            )[0]
+            staff_list = employees[branch.pk]
+            assignee = rng.choice(staff_list) if status != 'open' else None
+            batch.append(Shift(
+                branch=branch,
+                posted_by=managers[branch.pk],
+                assigned_to=assignee,
+                start_time=start,
+                end_time=start + timedelta(hours=rng.choice((4, 6, 8, 10))),
+                role=rng.choice(('Cashier', 'Barista', 'Supervisor')),
+                status=status,
+            ))
+            claimants = (
+                [assignee] if assignee
+                else rng.sample(staff_list, min(claims, len(staff_list)))
+            )
+            pending.append(claimants)
+
+        with transaction.atomic():
+            batch = Shift.objects.bulk_create(batch)
+            claim_rows = [
+                ShiftClaim(
+                    shift=shift, user=user,
+                    status='approved' if shift.assigned_to_id else 'pending',
+                )
+                for shift, claimants in zip(batch, pending)
+                for user in claimants
+            ]
+            ShiftClaim.objects.bulk_create(claim_rows, batch_size=batch_size)
+        created_shifts += len(batch)
+        created_claims += len(claim_rows)
+        write(f'Created {created_shifts} of {shifts} shifts.')
+
+    # Bulk inserts skip the signals that keep these up to date
+    DailyShiftStat.objects.rebuild()
+    analytics_cache.invalidate_all()
+    scopes.invalidate_all()
+    return {
+        'regions': len(region_list),
+        'branches': len(branch_list),
+        'users': len(users),
+        'shifts': created_shifts,
+        'claims': created_claims,
+    }
+
+
+def percentile(values, pct):
+    """
+    Returns the nearest-rank percentile of a list of numbers.
+    """
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def summarise(latencies, queries, peak_memory, sizes, errors):
+    """
+    Reduces the measurements of one scenario to its report entry.
+    """
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'latency_ms': {
+            **{
+                f'p{pct}': round(percentile(latencies, pct) * 1000, 3)
+                for pct in PERCENTILES
+            },
+            'mean': round(statistics.fmean(latencies) * 1000, 3),
+            'max': round(max(latencies) * 1000, 3),
+        },
+        'queries': {
+            'min': min(queries),
+            'max': max(queries),
+            'mean': round(statistics.fmean(queries), 2),
+        },
+        'peak_memory_kib': round(peak_memory / 1024, 1),
+        'response_bytes': round(statistics.fmean(sizes)),
+    }
+
+
+class ApiBenchmark:
+    """
+    Runs scripted request scenarios against seeded benchmark data.
+
+    Every scenario is a method returning a request function, which sets
+    up anything it needs untimed and then returns `(method, path, data,
+    expected_status)`. Each scenario is warmed up, then timed for
+    `iterations` requests, and run once more under `tracemalloc` to find
+    the peak memory of a request, since tracing slows everything down.
+    """
+    SCENARIOS = (
+        'shift_list', 'shift_list_all', 'claim_list', 'claim', 'approve',
+        'analytics', 'token_obtain',
+    )
+
+    def __init__(self, iterations=50, warmup=3):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.client = APIClient()
+        self.created = []
+
+    def load(self):
+        """
+        Picks the seeded users the scenarios act as.
+        """
+        users = User.objects.filter(email__in=[
+            bench_email('head', 0), bench_email('manager', 0),
+        ]).in_bulk(field_name='email')
+        if len(users) < 2:
+            raise LookupError(
+                'No benchmark data found; run seed_benchmark_data first.'
+            )
+        self.head_office = users[bench_email('head', 0)]
+        self.manager = users[bench_email('manager', 0)]
+        self.employee = User.objects.filter(
+            role='employee', branch_id=self.manager.branch_id,
+            email__startswith=EMAIL_PREFIX,
+        ).order_by('pk').first()
+        self.tokens = {
+            user.pk: str(AccessToken.for_user(user))
+            for user in (self.head_office, self.manager, self.employee)
+        }
+        # Benchmark shifts start well after any seeded shift
+        self.future = (
+            timezone.now() + timedelta(days=3650)
+        ).replace(minute=0, second=0, microsecond=0)
+
+    def authenticate(self, user):
+        if user is None:
+            self.client.credentials()
+        else:
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f'Bearer {self.tokens[user.pk]}'
+            )
+
+    def create_shift(self, **kwargs):
+        """
+        Creates a throwaway open shift at the benchmark manager's branch.
+        """
+        start = self.future + timedelta(days=len(self.created))
+        shift = Shift.objects.create(
+            branch_id=self.manager.branch_id, posted_by=self.manager,
+            start_time=start, end_time=start + timedelta(hours=8),
+            role='Benchmark', **kwargs
+        )
+        self.created.append(shift.pk)
+        return shift
+
+    def shift_list(self):
+        self.authenticate(self.manager)
+        return lambda: ('get', '/api/shifts/', None, 200)
+
+    def shift_list_all(self):
+        self.authenticate(self.head_office)
+        return lambda: ('get', '/api/shifts/', None, 200)
+
+    def claim_list(self):
+        self.authenticate(self.manager)
+        return lambda: ('get', '/api/claims/', None, 200)
+
+    def claim(self):
+        self.authenticate(self.employee)
+
+        def request():
+            shift = self.create_shift()
+            return 'post', f'/api/shifts/{shift.pk}/claim/', None, 201
+        return request
+
+    def approve(self):
+        self.authenticate(self.manager)
+
+        def request():
+            claim = ShiftClaim.objects.create(
+                shift=self.create_shift(),
+                user=self.employee,
+            )
+            return 'post', f'/api/claims/{claim.pk}/approve/', None, 200
+        return request
+
+    def analytics(self):
+        self.authenticate(self.head_office)
+
+        def request():
+            # Measure computing the response, not a cache hit
+            analytics_cache.invalidate_all()
+            return (
+                'get', '/api/analytics/all-shifts-timeline/', None, 200
+            )
+        return request
+
+    def token_obtain(self):
+        self.authenticate(None)
+        data = {'email': self.employee.email, 'password': PASSWORD}
+        return lambda: ('post', '/api/token/', data, 200)
+
+    def send(self, method, path, data):
+        if method == 'get':
+            return self.client.get(path, data)
+        return getattr(self.client, method)(path, data, format='json')
+
+    def measure(self, name):
+        """
+        Runs one scenario and returns its report entry.
+        """
+        request = getattr(self, name)()
+        for _ in range(self.warmup):
+            self.send(*request()[:3])
+
+        latencies, queries, sizes = [], [], []
+        errors = 0
+        for _ in range(self.iterations):
+            method, path, data, expected = request()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self.send(method, path, data)
+                latencies.append(time.perf_counter() - started)
+            queries.append(len(context.captured_queries))
+            sizes.append(len(response.content))
+            errors += response.status_code != expected
+
+        method, path, data, expected = request()
+        tracemalloc.start()
+        try:
+            self.send(method, path, data)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return summarise(latencies, queries, peak, sizes, errors)
+
+    def cleanup(self, started):
+        """
+        Deletes the shifts the write scenarios created, and the tombstones
+        their deletion leaves behind.
+        """
+        Shift.objects.filter(pk__in=self.created).delete()
+        Tombstone.objects.filter(deleted_at__gte=started).delete()
+        self.created = []
+
+    def run(self, scenarios=None, log=None):
+        """
+        Runs the given scenarios, or all of them.
+
+        Returns:
+            dict: The report, with an `environment` and a `scenarios`
+            entry.
+        """
+        write = log or (lambda message: None)
+        self.load()
+        started = timezone.now()
+        results = {}
+        # The test client addresses requests to 'testserver'
+        hosts = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        )
+        try:
+            hosts.enable()
+            for name in scenarios or self.SCENARIOS:
+                results[name] = self.measure(name)
+                write(
+                    f"{name}: p50 {results[name]['latency_ms']['p50']} ms, "
+                    f"p95 {results[name]['latency_ms']['p95']} ms"
+                )
+        finally:
+            hosts.disable()
+            self.cleanup(started)
+        return {'environment': environment(), 'scenarios': results}
+
+
+def environment():
+    """
+    Describes where a benchmark ran, so reports from different machines
+    or data sets are not compared by mistake.
+    """
+    return {
+        'created': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.platform(),
+        'data': {
+            'regions': Region.objects.count(),
+            'branches': Branch.objects.count(),
+            'users': User.objects.count(),
+            'shifts': Shift.objects.count(),
+            'claims': ShiftClaim.objects.count(),
+        },
+    }
+
+
+def compare(report, baseline, threshold=20):
+    """
+    Compares a report with a baseline report.
+
+    A scenario regresses if its p95 latency or peak memory grew by more
+    than `threshold` percent, or if its requests make more queries at all,
+    since query counts do not depend on the machine. The fewest queries of
+    any request is compared, as the first write to a new day of the
+    analytics rollup costs an extra query.
+
+    Returns:
+        list: One `{'scenario', 'metric', 'baseline', 'current', 'change',
+        'regression'}` dict per metric of every scenario in both reports.
+    """
+    rows = []
+    for name, current in report['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if before is None:
+            continue
+        metrics = (
+            ('p50_ms', before['latency_ms']['p50'],
+             current['latency_ms']['p50'], None),
+            ('p95_ms', before['latency_ms']['p95'],
+             current['latency_ms']['p95'], threshold),
+            ('queries', before['queries']['min'],
+             current['queries']['min'], 0),
+            ('peak_memory_kib', before['peak_memory_kib'],
+             current['peak_memory_kib'], threshold),
+        )
+        for metric, old, new, limit in metrics:
+            change = (new - old) / old * 100 if old else 0.0
+            rows.append({
+                'scenario': name,
+                'metric': metric,
+                'baseline': old,
+                'current': new,
+                'change': round(change, 1),
+                'regression': limit is not None and new > old and (
+                    change > limit if limit else True
+                ),
+            })
+    return rows
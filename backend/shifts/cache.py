@@ -0,0 +1,130 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY_PREFIX = 'analytics'
+HITS_KEY = f'{KEY_PREFIX}:stats:hits'
+MISSES_KEY = f'{KEY_PREFIX}:stats:misses'
+EPOCH_KEY = f'{KEY_PREFIX}:epoch'
+
+# The query parameters that analytics responses depend on
+CACHED_PARAMS = ('region_id', 'branch_id', 'year', 'month')
+
+
+def _incr(key):
+    """
+    Increments a counter in the cache, creating it if it does not exist.
+    """
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def _version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def user_scope(user):
+    """
+    Returns the scope of shifts a user's analytics are restricted to, in
+    line with `AnalyticsViewSet.get_base_queryset`.
+    """
+    if user.role == 'branch_manager':
+        return f'branch:{user.branch_id}'
+    elif user.role == 'region_manager':
+        return f'region:{user.region_id}'
+    elif user.is_staff or user.role == 'head_office':
+        return 'all'
+    return 'none'
+
+
+def data_scope(user, params):
+    """
+    Returns the narrowest scope whose shifts determine a response.
+
+    A `branch_id` or `region_id` filter narrows the data down to that branch
+    or region, so only changes there need to invalidate the entry.
+    """
+    if params.get('branch_id'):
+        return f"branch:{params['branch_id']}"
+    if params.get('region_id'):
+        return f"region:{params['region_id']}"
+    return user_scope(user)
+
+
+def cache_key(name, user, params):
+    """
+    Builds the cache key for an analytics response.
+
+    The key combines the action name, the caller's scope, the relevant query
+    parameters and the current version of the data scope, so entries are
+    never shared across scopes and go stale as soon as that scope changes.
+    """
+    scope = data_scope(user, params)
+    versions = (
+        cache.get(EPOCH_KEY, 0), cache.get(_version_key(scope), 0)
+    )
+    raw = '|'.join(
+        [name, user_scope(user)]
+        + [str(params.get(param, '')) for param in CACHED_PARAMS]
+        + [str(version) for version in versions]
+    )
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{digest}'
+
+
+def get_or_compute(name, user, params, compute):
+    """
+    Returns a cached analytics response, computing and storing it on a miss.
+
+    Returns:
+        tuple: The response data and whether it was served from the cache.
+    """
+    key = cache_key(name, user, params)
+    data = cache.get(key)
+    if data is not None:
+        _incr(HITS_KEY)
+        return data, True
+
+    _incr(MISSES_KEY)
+    data = compute()
+    cache.set(
+        key, data, timeout=getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 300)
+    )
+    return data, False
+
+
+def invalidate_branch(branch_id, region_id):
+    """
+    Expires cached analytics covering a branch: the branch itself, its
+    region and the organisation-wide view.
+    """
+    scopes = [f'branch:{branch_id}', f'region:{region_id}', 'all']
+    for scope in scopes:
+        _incr(_version_key(scope))
+
+
+def invalidate_all():
+    """
+    Expires every cached analytics response.
+    """
+    _incr(EPOCH_KEY)
+
+
+def get_stats():
+    """
+    Returns the cache hit and miss counters.
+    """
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else None,
+    }
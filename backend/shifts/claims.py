@@ -0,0 +1,318 @@
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import realtime
+from .intervals import group_intervals
+from .models import Branch, Shift, ShiftClaim, DailyShiftStat, User
+from .signals import sync_stats
+
+
+CLASH_MESSAGE = 'The claimant is already working a shift at this time.'
+
+
+class ClaimConflict(Exception):
+    """
+    Raised when a claim cannot be decided because it, or its shift, was
+    changed by another request first, or because the claimant is already
+    working an overlapping shift.
+    """
+
+
+def has_clash(user_id, shift):
+    """
+    Returns whether a user is assigned to any shift overlapping `shift`,
+    with one query on the `(assigned_to, start_time, end_time)` index.
+    """
+    return Shift.objects.filter(assigned_to_id=user_id).exclude(
+        pk=shift.pk
+    ).overlapping(shift.start_time, shift.end_time).exists()
+
+
+def locked_shifts():
+    """
+    Returns shifts locked for update, with their branch's region for the
+    realtime events. Only the shift rows are locked, not their branches.
+    """
+    return Shift.objects.select_for_update(of=('self',)).annotate(
+        branch_region_id=F('branch__region_id')
+    )
+
+
+def approve_claim(claim):
+    """
+    Approves a pending claim and assigns its shift to the claimant.
+
+    Everything happens in one transaction. The shift row is locked first so
+    that competing approvals for the same shift are serialised, and the
+    shift is only assigned with a conditional `UPDATE ... WHERE
+    status='open'`, so on backends without row locks at most one approval
+    can win. The remaining pending claims on the shift are declined with a
+    single bulk `UPDATE`.
+
+    Returns:
+        int: The number of other claims that were declined.
+
+    Raises:
+        ClaimConflict: If the claim is no longer pending or the shift is no
+        longer open.
+    """
+    with transaction.atomic():
+        shift = locked_shifts().get(pk=claim.shift_id)
+        claim = ShiftClaim.objects.select_for_update().get(pk=claim.pk)
+        if claim.status != 'pending':
+            raise ClaimConflict('Claim is no longer in a pending state.')
+        # Serialise approvals for the same claimant, so two overlapping
+        # shifts cannot both be given to them by concurrent requests
+        User.objects.select_for_update().filter(pk=claim.user_id).exists()
+        if has_clash(claim.user_id, shift):
+            raise ClaimConflict(CLASH_MESSAGE)
+
+        previous_key = DailyShiftStat.key_for(shift)
+        now = timezone.now()
+        assigned = Shift.objects.filter(pk=shift.pk, status='open').update(
+            status='claimed', assigned_to_id=claim.user_id, filled_at=now,
+            updated_at=now
+        )
+        if not assigned:
+            raise ClaimConflict('This shift is no longer open.')
+        approved = ShiftClaim.objects.filter(
+            pk=claim.pk, status='pending'
+        ).update(status='approved', decided_at=now, updated_at=now)
+        if not approved:
+            raise ClaimConflict('Claim is no longer in a pending state.')
+
+        declined = list(ShiftClaim.objects.filter(
+            shift_id=shift.pk, status='pending'
+        ).values_list('pk', flat=True))
+        ShiftClaim.objects.filter(pk__in=declined).update(
+            status='declined', decided_at=now, updated_at=now
+        )
+
+        shift.status = 'claimed'
+        shift.assigned_to_id = claim.user_id
+        shift.filled_at = claim.decided_at = now
+        claim.status = 'approved'
+        sync_stats([previous_key], [DailyShiftStat.key_for(shift)])
+        realtime.publish(
+            'claim.approved', shift.branch_id, shift.branch_region_id,
+            claim=realtime.claim_payload(claim),
+            shift=realtime.shift_payload(shift),
+            declined=declined,
+        )
+    return len(declined)
+
+
+def decline_claim(claim):
+    """
+    Declines a pending claim with a conditional update.
+
+    Raises:
+        ClaimConflict: If the claim is no longer pending.
+    """
+    with transaction.atomic():
+        now = timezone.now()
+        declined = ShiftClaim.objects.filter(
+            pk=claim.pk, status='pending'
+        ).update(status='declined', decided_at=now, updated_at=now)
+        if not declined:
+            raise ClaimConflict('Claim is no longer in a pending state.')
+        claim.status = 'declined'
+        claim.decided_at = now
+        branch_id, region_id = Shift.objects.filter(
+            pk=claim.shift_id
+        ).values_list('branch_id', 'branch__region_id').get()
+        realtime.publish(
+            'claim.declined', branch_id, region_id,
+            claim=realtime.claim_payload(claim),
+        )
+
+
+def decide_claims(decisions, can_manage=None):
+    """
+    Approves and declines a batch of claims in one transaction.
+
+    Conflicts are detected up front, before anything is written: a claim
+    that is unknown, listed twice or no longer pending, a shift that is no
+    longer open, several approvals for the same shift, or an approval that
+    would give the claimant overlapping shifts. Conflicting
+    decisions are skipped and the rest are applied with set-based updates:
+    one UPDATE for approved claims, one for their shifts and one for
+    declined claims, including the other pending claims on each shift that
+    was filled. One `claims.approved` and one `claims.declined` event is
+    published per branch, listing the claim IDs; the declined IDs include
+    the claims declined because their shift was filled.
+
+    Args:
+        decisions (list): (claim_id, decision) pairs, where decision is
+            'approve' or 'decline'.
+        can_manage (callable): Optional check of whether the caller may
+            decide claims at a branch. Decisions on claims at other branches
+            are reported as errors and skipped.
+
+    Returns:
+        list: One `{'id', 'result', 'detail'}` report per decision, in the
+        order given.
+
+    Raises:
+        ClaimConflict: If a shift was filled by another request while the
+        batch was being applied. Nothing is written in that case.
+    """
+    reports = [
+        {'id': claim_id, 'result': None, 'detail': ''}
+        for claim_id, _ in decisions
+    ]
+
+    def conflict(index, detail):
+        reports[index].update(result='conflict', detail=detail)
+
+    with transaction.atomic():
+        claim_ids = {claim_id for claim_id, _ in decisions}
+        shift_ids = set(ShiftClaim.objects.filter(
+            pk__in=claim_ids
+        ).values_list('shift_id', flat=True))
+        # Lock shifts before claims, in the same order as approve_claim
+        shifts = locked_shifts().order_by('pk').in_bulk(shift_ids)
+        claims = ShiftClaim.objects.select_for_update().in_bulk(claim_ids)
+        branches = Branch.objects.in_bulk(
+            {shift.branch_id for shift in shifts.values()}
+        )
+        managed = {
+            branch_id: can_manage is None or can_manage(branch)
+            for branch_id, branch in branches.items()
+        }
+
+        seen = set()
+        approvals = {}
+        for index, (claim_id, decision) in enumerate(decisions):
+            claim = claims.get(claim_id)
+            if claim is None:
+                reports[index].update(
+                    result='error', detail='Shift claim not found.'
+                )
+            elif not managed[shifts[claim.shift_id].branch_id]:
+                reports[index].update(
+                    result='error',
+                    detail='You cannot manage claims at this branch.'
+                )
+            elif claim_id in seen:
+                conflict(index, 'This claim appears more than once.')
+            elif claim.status != 'pending':
+                conflict(index, 'Claim is no longer in a pending state.')
+            elif decision == 'approve':
+                if shifts[claim.shift_id].status != 'open':
+                    conflict(index, 'This shift is no longer open.')
+                else:
+                    approvals.setdefault(claim.shift_id, []).append(index)
+            seen.add(claim_id)
+
+        for indexes in approvals.values():
+            if len(indexes) > 1:
+                for index in indexes:
+                    conflict(index, 'Another claim for this shift is being '
+                                    'approved in the same batch.')
+
+        # Check the remaining approvals against the shifts each claimant
+        # already works, and against each other, with one query
+        approving = [
+            indexes[0] for indexes in approvals.values() if len(indexes) == 1
+        ]
+        if approving:
+            batch = [
+                (index, claims[decisions[index][0]].user_id,
+                 shifts[claims[decisions[index][0]].shift_id])
+                for index in approving
+            ]
+            user_ids = sorted({user_id for _, user_id, _ in batch})
+            User.objects.select_for_update().filter(pk__in=user_ids).exists()
+            working = group_intervals(
+                Shift.objects.filter(assigned_to_id__in=user_ids).overlapping(
+                    min(shift.start_time for _, _, shift in batch),
+                    max(shift.end_time for _, _, shift in batch),
+                ).values_list('assigned_to_id', 'start_time', 'end_time')
+            )
+            accepted = {}
+            for index, user_id, shift in sorted(
+                batch, key=lambda item: item[0]
+            ):
+                times = (shift.start_time, shift.end_time)
+                if (
+                    user_id in working and working[user_id].overlaps(*times)
+                ) or any(
+                    start < times[1] and end > times[0]
+                    for start, end in accepted.get(user_id, [])
+                ):
+                    conflict(index, CLASH_MESSAGE)
+                else:
+                    accepted.setdefault(user_id, []).append(times)
+
+        approved = {}
+        declined = []
+        for index, (claim_id, decision) in enumerate(decisions):
+            if reports[index]['result'] is not None:
+                continue
+            claim = claims[claim_id]
+            if decision == 'approve':
+                approved[claim.shift_id] = claim
+                reports[index]['result'] = 'approved'
+            else:
+                declined.append(claim_id)
+                reports[index]['result'] = 'declined'
+
+        now = timezone.now()
+        if approved:
+            assigned = Shift.objects.filter(
+                pk__in=approved, status='open'
+            ).update(
+                status='claimed',
+                filled_at=now,
+                updated_at=now,
+                assigned_to_id=Case(*[
+                    When(pk=shift_id, then=Value(claim.user_id))
+                    for shift_id, claim in approved.items()
+                ])
+            )
+            if assigned != len(approved):
+                raise ClaimConflict('A shift in this batch is no longer open.')
+            ShiftClaim.objects.filter(
+                pk__in=[claim.pk for claim in approved.values()]
+            ).update(status='approved', decided_at=now, updated_at=now)
+
+        # The other pending claims on each filled shift are declined too
+        others = list(ShiftClaim.objects.filter(
+            shift_id__in=list(approved), status='pending'
+        ).exclude(pk__in=declined).values_list('pk', 'shift_id'))
+        ShiftClaim.objects.filter(
+            pk__in=declined + [claim_id for claim_id, _ in others]
+        ).update(status='declined', decided_at=now, updated_at=now)
+
+        previous_keys, keys = [], []
+        events = {}
+        for shift_id, claim in approved.items():
+            shift = shifts[shift_id]
+            previous_keys.append(DailyShiftStat.key_for(shift))
+            shift.status = 'claimed'
+            shift.assigned_to_id = claim.user_id
+            shift.filled_at = claim.decided_at = now
+            keys.append(DailyShiftStat.key_for(shift))
+            claim.status = 'approved'
+            events.setdefault(
+                ('claims.approved', shift.branch_id, shift.branch_region_id),
+                []
+            ).append(claim.pk)
+        sync_stats(previous_keys, keys)
+        for claim_id in declined:
+            claim = claims[claim_id]
+            claim.status = 'declined'
+            claim.decided_at = now
+            others.append((claim_id, claim.shift_id))
+        for claim_id, shift_id in sorted(others):
+            shift = shifts[shift_id]
+            events.setdefault(
+                ('claims.declined', shift.branch_id, shift.branch_region_id),
+                []
+            ).append(claim_id)
+        for (event_type, branch_id, region_id), ids in events.items():
+            realtime.publish(event_type, branch_id, region_id, ids=ids)
+
+    return reports
@@ -0,0 +1,118 @@
+"""
+Conditional GET support for list and analytics responses.
+
+Each response is identified by validators computed from a cheap aggregate
+over the rows it is built from: their count and latest `updated_at`. A
+client that sends back the `ETag` (`If-None-Match`) or `Last-Modified`
+(`If-Modified-Since`) it was given gets a bodiless 304 while the data is
+unchanged, without the response being built or rendered.
+
+Responses also embed users, branches and regions (names, avatars), which
+have no `updated_at` of their own. When any of them last changed is kept
+in the cache, moved on by `shifts.signals`, and counts as a modification
+of every response, like the version counter of the user scope cache.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+NESTED_CHANGED_KEY = 'conditional:nested-changed-at'
+
+
+def nested_changed_at():
+    """
+    Returns when a user, branch or region last changed, as far as the
+    cache knows; a cache that has lost it starts again from now.
+    """
+    cache.add(NESTED_CHANGED_KEY, timezone.now(), timeout=None)
+    return cache.get(NESTED_CHANGED_KEY) or timezone.now()
+
+
+def touch_nested():
+    """
+    Records that a user, branch or region has changed, moving the
+    validators of every response on.
+    """
+    cache.set(NESTED_CHANGED_KEY, timezone.now(), timeout=None)
+
+
+def aggregate_validators(queryset, *related):
+    """
+    Returns the number of rows in a queryset, plus any related rows, and
+    the latest `updated_at` among them, all in one query.
+
+    Args:
+        queryset (QuerySet): The rows a response is built from.
+        *related (str): Reverse relations whose rows are rendered too,
+            such as a shift's claims.
+
+    Returns:
+        tuple: A list of counts and the latest modification time, or None
+        if there are no rows.
+    """
+    aggregates = {
+        'count': Count('pk', distinct=bool(related)),
+        'updated': Max('updated_at'),
+    }
+    for name in related:
+        aggregates[f'{name}_count'] = Count(name)
+        aggregates[f'{name}_updated'] = Max(f'{name}__updated_at')
+    values = queryset.aggregate(**aggregates)
+
+    counts = [values['count']] + [values[f'{n}_count'] for n in related]
+    timestamps = [values['updated']] + [
+        values[f'{name}_updated'] for name in related
+    ]
+    timestamps = [value for value in timestamps if value is not None]
+    return counts, max(timestamps) if timestamps else None
+
+
+def make_etag(request, counts, last_modified):
+    """
+    Builds a strong ETag for a response.
+
+    The full path and the caller are part of the tag, as two users or two
+    pages with the same underlying rows still get different bodies, and
+    so is the `Accept` header, which selects the renderer.
+    """
+    raw = '|'.join([
+        request.get_full_path(),
+        str(request.user.pk),
+        request.META.get('HTTP_ACCEPT', ''),
+        ','.join(str(count) for count in counts),
+        last_modified.isoformat() if last_modified else '',
+    ])
+    return '"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_response(request, queryset, build, related=()):
+    """
+    Returns a 304 if the client's copy of a response is still current, or
+    calls `build` to produce the response otherwise.
+
+    Args:
+        request (Request): The incoming request.
+        queryset (QuerySet): The rows the response is built from.
+        build (callable): Builds the full response.
+        related (tuple): Reverse relations that are rendered as well.
+    """
+    counts, last_modified = aggregate_validators(queryset, *related)
+    last_modified = max(filter(None, [last_modified, nested_changed_at()]))
+    etag = make_etag(request, counts, last_modified)
+    timestamp = int(last_modified.timestamp())
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(timestamp)
+    return response
@@ -0,0 +1,34 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .realtime import subscription_group
+
+
+class ShiftBoardConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes shift and claim events to a connected board.
+
+    The connection joins the single group matching the user's scope, so a
+    branch only hears about its own shifts while head office hears about
+    all of them. Unauthenticated connections are refused.
+    """
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = await database_sync_to_async(subscription_group)(
+            user
+        )
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(
+                self.group_name, self.channel_name
+            )
+
+    async def shift_event(self, event):
+        await self.send_json(event['payload'])
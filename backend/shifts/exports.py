@@ -0,0 +1,92 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Flattened projection of a shift and one of its claims. Shifts without
+# claims produce a single row with empty claim columns.
+SHIFT_FIELDS = {
+    'id': 'id',
+    'branch': 'branch__name',
+    'region': 'branch__region__name',
+    'start_time': 'start_time',
+    'end_time': 'end_time',
+    'role': 'role',
+    'status': 'status',
+    'description': 'description',
+    'posted_by': 'posted_by__email',
+    'assigned_to': 'assigned_to__email',
+}
+CLAIM_FIELDS = {
+    'claim_id': 'claims__id',
+    'claim_user': 'claims__user__email',
+    'claim_status': 'claims__status',
+    'claim_created_at': 'claims__created_at',
+}
+COLUMNS = list(SHIFT_FIELDS) + list(CLAIM_FIELDS)
+
+
+class Echo:
+    """
+    A file-like object that returns what is written to it, so csv.writer
+    can produce one line at a time for a streaming response.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, chunk_size=None):
+    """
+    Yields flattened shift/claim rows using a server-side cursor.
+
+    Rows are ordered by shift so that all claims for a shift are adjacent.
+    """
+    projection = {**SHIFT_FIELDS, **CLAIM_FIELDS}
+    rows = queryset.values_list(*projection.values()).order_by(
+        'start_time', 'id', 'claims__id'
+    )
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    for values in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(COLUMNS, values))
+
+
+def iter_csv(rows):
+    """
+    Yields the export as CSV lines, starting with a header line.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        yield writer.writerow([
+            '' if row[column] is None else row[column] for column in COLUMNS
+        ])
+
+
+def iter_ndjson(rows):
+    """
+    Yields the export as newline-delimited JSON, one shift per line with
+    its claims nested in a `claims` list.
+    """
+    shift = None
+    for row in rows:
+        if shift is None or shift['id'] != row['id']:
+            if shift is not None:
+                yield json.dumps(shift, cls=DjangoJSONEncoder) + '\n'
+            shift = {field: row[field] for field in SHIFT_FIELDS}
+            shift['claims'] = []
+        if row['claim_id'] is not None:
+            shift['claims'].append({
+                'id': row['claim_id'],
+                'user': row['claim_user'],
+                'status': row['claim_status'],
+                'created_at': row['claim_created_at'],
+            })
+    if shift is not None:
+        yield json.dumps(shift, cls=DjangoJSONEncoder) + '\n'
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
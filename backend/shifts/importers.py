@@ -0,0 +1,270 @@
+import csv
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Branch, User, Shift, DailyShiftStat
+from .signals import sync_stats
+
+CSV_COLUMNS = (
+    'branch', 'start_time', 'end_time', 'role', 'description', 'assigned_to',
+    'status'
+)
+
+# How many row errors are kept in an import report
+MAX_REPORTED_ERRORS = 100
+
+
+class RowError(ValueError):
+    """
+    Raised when a single import row cannot be turned into a shift.
+    """
+
+
+def iter_csv_rows(stream):
+    """
+    Yields one dict per data row of a CSV rota, reading the stream lazily.
+
+    The first row must be a header naming the columns in `CSV_COLUMNS`;
+    `description`, `assigned_to` and `status` are optional.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield {key.strip().lower(): value for key, value in row.items() if key}
+
+
+def _unfold_lines(stream):
+    """
+    Joins iCalendar continuation lines (starting with a space or tab) onto
+    the line they continue, without reading the whole stream.
+    """
+    current = None
+    for line in stream:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def _parse_ics_datetime(params, value):
+    if 'VALUE=DATE' in params or 'T' not in value:
+        raise RowError("All-day events cannot be imported as shifts.")
+    utc = value.endswith('Z')
+    parsed = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    if utc:
+        return parsed.replace(tzinfo=ZoneInfo('UTC'))
+    for param in params:
+        if param.startswith('TZID='):
+            try:
+                return parsed.replace(tzinfo=ZoneInfo(param[5:]))
+            except ZoneInfoNotFoundError:
+                raise RowError(f"Unknown time zone '{param[5:]}'.")
+    return parsed
+
+
+def iter_ics_rows(stream):
+    """
+    Yields one dict per VEVENT of an iCalendar rota, reading it lazily.
+
+    Events map onto shifts as follows: LOCATION is the branch name,
+    SUMMARY the role, DESCRIPTION the description and an ATTENDEE
+    `mailto:` address the assigned user.
+    """
+    event = None
+    for line in _unfold_lines(stream):
+        if line == 'BEGIN:VEVENT':
+            event = {}
+            continue
+        if line == 'END:VEVENT':
+            if event is not None:
+                yield event
+            event = None
+            continue
+        if event is None or ':' not in line:
+            continue
+
+        name, value = line.split(':', 1)
+        name, *params = name.split(';')
+        name = name.upper()
+        value = (
+            value.replace('\\n', '\n').replace('\\,', ',')
+            .replace('\\;', ';')
+        )
+        try:
+            if name == 'DTSTART':
+                event['start_time'] = _parse_ics_datetime(params, value)
+            elif name == 'DTEND':
+                event['end_time'] = _parse_ics_datetime(params, value)
+            elif name == 'LOCATION':
+                event['branch'] = value
+            elif name == 'SUMMARY':
+                event['role'] = value
+            elif name == 'DESCRIPTION':
+                event['description'] = value
+            elif name == 'ATTENDEE' and value.lower().startswith('mailto:'):
+                event['assigned_to'] = value[7:]
+        except (RowError, ValueError) as error:
+            event['error'] = str(error)
+
+
+PARSERS = {
+    'csv': iter_csv_rows,
+    'ics': iter_ics_rows,
+}
+
+
+def detect_format(filename):
+    """
+    Guesses the rota format from a file name, defaulting to CSV.
+    """
+    if filename.lower().endswith(('.ics', '.ical', '.ifb')):
+        return 'ics'
+    return 'csv'
+
+
+class RotaImporter:
+    """
+    Turns a stream of parsed rota rows into shifts.
+
+    Branch names and user emails are resolved through lookup tables built
+    once per import, and shifts are inserted in fixed-size batches, each in
+    its own transaction, so memory use does not depend on the file size.
+
+    Args:
+        posted_by (User): The user recorded as having posted the shifts.
+        branches (QuerySet): The branches rows may refer to. Defaults to
+            all branches.
+        batch_size (int): How many shifts are inserted per batch.
+        progress (callable): Called after every batch with the number of
+            rows processed and shifts created so far.
+    """
+    def __init__(self, posted_by, branches=None, batch_size=None,
+                 progress=None):
+        self.posted_by = posted_by
+        self.batch_size = batch_size or settings.SHIFT_BULK_BATCH_SIZE
+        self.progress = progress
+        if branches is None:
+            branches = Branch.objects.all()
+        self.branches = {
+            name.strip().lower(): pk
+            for pk, name in branches.values_list('pk', 'name')
+        }
+        self.users = {
+            email.lower(): pk
+            for pk, email in User.objects.values_list('pk', 'email')
+        }
+        self.statuses = {key for key, _ in Shift.SHIFT_STATUS_CHOICES}
+
+    def build_shift(self, row):
+        """
+        Validates a parsed row and returns an unsaved Shift for it.
+
+        Raises:
+            RowError: If the row is incomplete or refers to an unknown
+            branch or user.
+        """
+        if row.get('error'):
+            raise RowError(row['error'])
+        for field in ('branch', 'start_time', 'end_time', 'role'):
+            if not row.get(field):
+                raise RowError(f"Missing '{field}'.")
+
+        branch_id = self.branches.get(row['branch'].strip().lower())
+        if branch_id is None:
+            raise RowError(f"Unknown branch '{row['branch']}'.")
+
+        start_time = self.parse_time(row['start_time'])
+        end_time = self.parse_time(row['end_time'])
+        if end_time <= start_time:
+            raise RowError("The shift must end after it starts.")
+
+        assigned_to_id = None
+        if row.get('assigned_to'):
+            email = row['assigned_to'].strip().lower()
+            assigned_to_id = self.users.get(email)
+            if assigned_to_id is None:
+                raise RowError(f"Unknown user '{row['assigned_to']}'.")
+
+        status = (row.get('status') or '').strip().lower()
+        if not status:
+            status = 'filled' if assigned_to_id else 'open'
+        elif status not in self.statuses:
+            raise RowError(f"Unknown status '{status}'.")
+
+        return Shift(
+            branch_id=branch_id,
+            posted_by=self.posted_by,
+            start_time=start_time,
+            end_time=end_time,
+            role=row['role'].strip()[:100],
+            description=(row.get('description') or '').strip(),
+            status=status,
+            assigned_to_id=assigned_to_id,
+        )
+
+    def parse_time(self, value):
+        if isinstance(value, str):
+            try:
+                parsed = parse_datetime(value.strip())
+            except ValueError:
+                # Well formed, but not a real date or time, e.g. 30 February
+                parsed = None
+            if parsed is None:
+                raise RowError(f"Invalid date/time '{value}'.")
+            value = parsed
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def flush(self, batch):
+        with transaction.atomic():
+            created = Shift.objects.bulk_create(batch)
+            sync_stats([], [DailyShiftStat.key_for(s) for s in created])
+        return len(created)
+
+    def run(self, rows):
+        """
+        Imports every row, skipping (and reporting) rows that are invalid.
+
+        Returns:
+            dict: The number of rows processed, shifts created and rows
+            skipped, plus the first `MAX_REPORTED_ERRORS` row errors.
+        """
+        processed = created = skipped = 0
+        errors = []
+        batch = []
+        for processed, row in enumerate(rows, start=1):
+            try:
+                batch.append(self.build_shift(row))
+            except RowError as error:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'row': processed, 'error': str(error)})
+                continue
+
+            if len(batch) >= self.batch_size:
+                created += self.flush(batch)
+                batch = []
+                if self.progress:
+                    self.progress(processed, created)
+
+        if batch:
+            created += self.flush(batch)
+        if self.progress:
+            self.progress(processed, created)
+
+        return {
+            'processed': processed,
+            'created': created,
+            'skipped': skipped,
+            'errors': errors,
+        }
@@ -0,0 +1,96 @@
+"""
+In-memory interval indexes for shift overlap checks.
+
+Checking whether a time range clashes with any of a user's shifts one ORM
+query at a time costs a query per check. These indexes are built once from
+a single query and then answer each check with a binary search.
+"""
+from bisect import bisect_left
+
+
+class IntervalIndex:
+    """
+    A static index over half-open `[start, end)` intervals.
+
+    Intervals are sorted by start and paired with a running maximum of
+    their ends, so an overlap query only has to look at the intervals that
+    start before the query ends: the query overlaps one of them exactly
+    when the latest end among them is after the query's start. Lookups are
+    O(log n) and overlapping intervals within the index are handled.
+    """
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals, key=lambda item: item[:2])
+        self.starts = [interval[0] for interval in self.intervals]
+        self.max_ends = []
+        latest = None
+        for interval in self.intervals:
+            if latest is None or interval[1] > latest:
+                latest = interval[1]
+            self.max_ends.append(latest)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    def overlaps(self, start, end):
+        """
+        Returns whether `[start, end)` overlaps any interval in the index.
+        """
+        index = bisect_left(self.starts, end)
+        return index > 0 and self.max_ends[index - 1] > start
+
+    def overlapping(self, start, end):
+        """
+        Returns every interval that overlaps `[start, end)`, in start order.
+
+        The scan walks back from the last interval starting before `end`
+        and stops as soon as the running maximum end is no later than
+        `start`, since no earlier interval can overlap after that.
+        """
+        found = []
+        index = bisect_left(self.starts, end) - 1
+        while index >= 0 and self.max_ends[index] > start:
+            if self.intervals[index][1] > start:
+                found.append(self.intervals[index])
+            index -= 1
+        found.reverse()
+        return found
+
+
+def group_intervals(rows):
+    """
+    Builds one `IntervalIndex` per group from `(group, start, end, ...)`
+    rows, such as a user id followed by the times of a shift they hold and
+    any payload to carry along.
+
+    Returns:
+        dict: A mapping of group to `IntervalIndex`.
+    """
+    grouped = {}
+    for group, *interval in rows:
+        grouped.setdefault(group, []).append(tuple(interval))
+    return {
+        group: IntervalIndex(intervals)
+        for group, intervals in grouped.items()
+    }
+
+
+def overlapping_pairs(intervals):
+    """
+    Finds every pair of overlapping intervals with a sweep over their
+    starts, in O(n log n + k) for k overlapping pairs.
+
+    Args:
+        intervals (iterable): `(start, end, ...)` tuples.
+
+    Returns:
+        list: `(first, second)` pairs of overlapping intervals, with the
+        earlier-starting one first.
+    """
+    ordered = sorted(intervals, key=lambda item: item[:2])
+    pairs = []
+    active = []
+    for interval in ordered:
+        active = [other for other in active if other[1] > interval[0]]
+        pairs.extend((other, interval) for other in active)
+        active.append(interval)
+    return pairs
@@ -0,0 +1,244 @@
+"""
+A small database-backed job queue.
+
+Work that does not need to finish before a response is sent (emails, image
+processing, imports, rollup rebuilds) is registered as a task with
+`@task` and queued with `enqueue()`, which only writes a `Job` row. Worker
+processes started with the `run_jobs` management command claim due jobs
+one at a time with a conditional `UPDATE`, so any number of workers can
+share the queue without double-running a job, and failed jobs are retried
+with exponential backoff. Clients poll `/api/jobs/<id>/` for the outcome.
+
+A claimed job holds a lease of `JOBS_TIMEOUT` seconds, which its worker
+renews from a heartbeat thread for as long as the job runs. Only a job
+whose lease has run out, because its worker died, is handed to another
+worker, however long the job itself takes.
+
+Jobs are written in the caller's transaction, so a job queued by a request
+that rolls back is never run.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name=None, max_attempts=3, atomic=True):
+    """
+    Registers a function as a background task.
+
+    The function is called with the keyword arguments given to `enqueue`,
+    which must be JSON-serialisable, and its return value, if any, is
+    stored as the job's result. It runs in a transaction unless `atomic`
+    is False, e.g. for tasks that commit in batches themselves.
+    """
+    def register(func):
+        func.task_name = name or func.__name__
+        func.max_attempts = max_attempts
+        func.atomic = atomic
+        TASKS[func.task_name] = func
+        return func
+    return register
+
+
+def enqueue(name, created_by=None, run_at=None, **kwargs):
+    """
+    Queues a registered task to be run by a worker.
+
+    Returns:
+        Job: The queued job.
+    """
+    if name not in TASKS:
+        raise KeyError(f"Unknown task '{name}'.")
+    return Job.objects.create(
+        name=name,
+        kwargs=kwargs,
+        max_attempts=TASKS[name].max_attempts,
+        created_by=created_by,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_next(worker=None):
+    """
+    Claims the next due job for a worker.
+
+    The oldest due job is marked as running, and its attempt counted,
+    with an `UPDATE ... WHERE status='queued'`; if another worker claimed
+    it first the next one is tried.
+
+    Returns:
+        Job: The claimed job, or None if no job is due.
+    """
+    worker = worker or worker_name()
+    while True:
+        now = timezone.now()
+        job_id = Job.objects.filter(
+            status='queued', run_at__lte=now
+        ).order_by('run_at', 'id').values_list('pk', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running',
+            worker=worker,
+            started_at=now,
+            lease_expires_at=lease_expiry(now),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+
+
+def lease_expiry(now=None):
+    return (now or timezone.now()) + timedelta(seconds=settings.JOBS_TIMEOUT)
+
+
+class Heartbeat(threading.Thread):
+    """
+    Renews a running job's lease every third of `JOBS_TIMEOUT` until
+    stopped.
+
+    The renewal runs on the thread's own database connection, so it is
+    committed straight away even while the job's transaction is open.
+    """
+    def __init__(self, job):
+        super().__init__(name=f'job-{job.pk}-heartbeat', daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOBS_TIMEOUT / 3):
+                try:
+                    renewed = Job.objects.filter(
+                        pk=self.job.pk, status='running',
+                        worker=self.job.worker,
+                    ).update(lease_expires_at=lease_expiry())
+                except Exception:
+                    # e.g. SQLite's write lock; the next beat tries again
+                    logger.exception(
+                        'Could not renew the lease of job %s', self.job.pk
+                    )
+                    continue
+                if not renewed:
+                    logger.warning(
+                        'Job %s (%s) lost its lease while running',
+                        self.job.pk, self.job.name
+                    )
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job):
+    """
+    Runs a claimed job and records its outcome.
+
+    A job that raises is re-queued with exponential backoff until it has
+    used up its attempts, and then marked as failed.
+    """
+    func = TASKS.get(job.name)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise KeyError(f"Unknown task '{job.name}'.")
+        with transaction.atomic() if func.atomic else nullcontext():
+            result = func(**job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.name)
+        job.error = traceback.format_exc()
+        if func is not None and job.attempts < job.max_attempts:
+            backoff = settings.JOBS_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(seconds=backoff)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'succeeded'
+        job.result = result
+        job.error = ''
+        job.finished_at = timezone.now()
+    finally:
+        heartbeat.stop()
+    job.lease_expires_at = None
+    job.save(update_fields=[
+        'status', 'run_at', 'result', 'error', 'finished_at',
+        'lease_expires_at'
+    ])
+    return job
+
+
+def requeue_stale():
+    """
+    Puts back jobs whose worker died mid-run, i.e. running jobs whose
+    lease has expired. Jobs that have used up their attempts are marked as
+    failed instead, so a job that kills its worker is not retried forever.
+
+    Returns:
+        int: The number of jobs re-queued.
+    """
+    now = timezone.now()
+    expired = Job.objects.filter(
+        Q(lease_expires_at__lt=now) |
+        # Jobs claimed before leases were recorded
+        Q(lease_expires_at__isnull=True,
+          started_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT)),
+        status='running',
+    )
+    expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed',
+        lease_expires_at=None,
+        finished_at=now,
+        error='The worker running this job stopped before it finished.',
+    )
+    return expired.filter(attempts__lt=F('max_attempts')).update(
+        status='queued', worker='', lease_expires_at=None, run_at=now,
+    )
+
+
+def work(burst=False, sleep=1.0, max_jobs=None):
+    """
+    Runs jobs until stopped, or until the queue is empty with `burst`.
+
+    Returns:
+        int: The number of jobs run.
+    """
+    worker = worker_name()
+    count = 0
+    requeue_stale()
+    while max_jobs is None or count < max_jobs:
+        job = claim_next(worker)
+        if job is None:
+            if burst:
+                break
+            requeue_stale()
+            time.sleep(sleep)
+            continue
+        run_job(job)
+        count += 1
+    return count
@@ -0,0 +1,96 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from shifts.benchmarks import ApiBenchmark, compare
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the REST API against data from `seed_benchmark_data`.
+
+    Each scenario's latency percentiles, query counts and peak memory are
+    written as JSON to `--output`. Given a `--baseline` report from an
+    earlier run, the changes are printed and the command fails if any
+    scenario regressed, so it can gate a change on a laptop or in CI.
+    """
+    help = "Run the API benchmark scenarios and report the results."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            choices=ApiBenchmark.SCENARIOS,
+            help="Scenario to run; may be repeated. Defaults to all.",
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help="Number of timed requests per scenario.",
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help="Number of untimed requests before each scenario.",
+        )
+        parser.add_argument(
+            '--output',
+            help="File to write the JSON report to.",
+        )
+        parser.add_argument(
+            '--baseline',
+            help="JSON report of an earlier run to compare against.",
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help="Percentage increase in p95 latency or peak memory that "
+                 "counts as a regression.",
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        benchmark = ApiBenchmark(
+            iterations=options['iterations'], warmup=options['warmup']
+        )
+        try:
+            report = benchmark.run(
+                options['scenarios'], log=self.stdout.write
+            )
+        except LookupError as error:
+            raise CommandError(str(error))
+
+        failed = [
+            name for name, result in report['scenarios'].items()
+            if result['errors']
+        ]
+        if failed:
+            self.stderr.write(
+                "Unexpected responses in: " + ", ".join(failed)
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Wrote report to {options['output']}.")
+
+        if options['baseline']:
+            with open(options['baseline']) as source:
+                baseline = json.load(source)
+            if baseline['environment']['data'] != (
+                report['environment']['data']
+            ):
+                self.stderr.write(
+                    "The baseline was run against different data."
+                )
+            rows = compare(report, baseline, options['threshold'])
+            for row in rows:
+                self.stdout.write(
+                    f"{row['scenario']:>15} {row['metric']:>16}: "
+                    f"{row['baseline']:>10} -> {row['current']:>10} "
+                    f"({row['change']:+.1f}%)"
+                    + (" REGRESSION" if row['regression'] else "")
+                )
+            regressions = [row for row in rows if row['regression']]
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} metrics regressed against the "
+                    f"baseline."
+                )
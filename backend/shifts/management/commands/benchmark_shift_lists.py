@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from shifts import fast_lists
+from shifts.models import Region, Branch, User, Shift, ShiftClaim
+from shifts.renderers import FastJSONRenderer
+from shifts.serializers import ShiftSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compares the serializer and fast read-only paths for listing shifts.
+
+    Sample data is created inside a transaction that is rolled back
+    afterwards, so the command can be run against any database.
+    """
+    help = "Benchmark ShiftSerializer against the fast shift list path."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--shifts', type=int, default=2000,
+            help="Number of sample shifts to list.",
+        )
+        parser.add_argument(
+            '--claims', type=int, default=2,
+            help="Number of claims per sample shift.",
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help="Number of timed runs per path; the best run is reported.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_sample_data(options['shifts'], options['claims'])
+            results = [
+                self.measure("serializer", self.serializer_path,
+                             options['repeat']),
+                self.measure("fast", self.fast_path, options['repeat']),
+            ]
+            transaction.set_rollback(True)
+
+        baseline = results[0][1]
+        for name, seconds, queries, size in results:
+            self.stdout.write(
+                f"{name:>10}: {seconds * 1000:8.1f} ms  {queries:4d} queries"
+                f"  {size / 1024:8.1f} KiB  ({baseline / seconds:.1f}x)"
+            )
+
+    def create_sample_data(self, shifts, claims):
+        region = Region.objects.create(name="Benchmark Region")
+        branches = Branch.objects.bulk_create(
+            Branch(name=f"Benchmark Branch {i}", region=region)
+            for i in range(10)
+        )
+        users = User.objects.bulk_create(
+            User(
+                email=f"benchmark{i}@example.com", first_name="Bench",
+                last_name=str(i), role="employee",
+                branch=branches[i % len(branches)]
+            )
+            for i in range(max(claims, 1) * 10)
+        )
+        start = timezone.now()
+        created = Shift.objects.bulk_create(
+            Shift(
+                branch=branches[i % len(branches)],
+                posted_by=users[0],
+                assigned_to=users[i % len(users)] if i % 3 == 0 else None,
+                start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i + 8),
+                role="Cashier",
+            )
+            for i in range(shifts)
+        )
+        ShiftClaim.objects.bulk_create(
+            ShiftClaim(shift=shift, user=users[(i + j) % len(users)])
+            for i, shift in enumerate(created)
+            for j in range(claims)
+        )
+
+    def serializer_path(self):
+        queryset = Shift.objects.with_details().order_by('start_time', 'id')
+        data = ShiftSerializer(queryset, many=True).data
+        return JSONRenderer().render(data)
+
+    def fast_path(self):
+        rows = Shift.objects.values(*fast_lists.SHIFT_VALUES).order_by(
+            'start_time', 'id'
+        )
+        return FastJSONRenderer().render(
+            fast_lists.serialize_shifts(list(rows))
+        )
+
+    def measure(self, name, path, repeat):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                body = path()
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return name, best, len(context.captured_queries), len(body)
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shifts.importers import PARSERS, RotaImporter, detect_format
+from shifts.models import User
+
+
+class Command(BaseCommand):
+    """
+    Imports shifts from a CSV or iCalendar rota file.
+
+    The file is parsed row by row and inserted in batches, so very large
+    historical rotas can be imported in bounded memory.
+    """
+    help = "Import shifts from a CSV or iCalendar (.ics) rota file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to the rota file.")
+        parser.add_argument(
+            '--posted-by',
+            required=True,
+            help="Email of the user the shifts are posted by.",
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(PARSERS),
+            help="File format. Guessed from the file extension if omitted.",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help="Number of shifts inserted per batch.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            posted_by = User.objects.get(email__iexact=options['posted_by'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['posted_by']}.")
+
+        fmt = options['format'] or detect_format(options['path'])
+
+        def progress(processed, created):
+            self.stdout.write(
+                f"Processed {processed} rows, created {created} shifts."
+            )
+
+        importer = RotaImporter(
+            posted_by,
+            batch_size=options['batch_size'],
+            progress=progress,
+        )
+        try:
+            with open(
+                options['path'], newline='', encoding='utf-8-sig'
+            ) as stream:
+                result = importer.run(PARSERS[fmt](stream))
+        except OSError as error:
+            raise CommandError(str(error))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} shifts, "
+            f"skipped {result['skipped']} rows."
+        ))
@@ -0,0 +1,126 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+
+from shifts.consumers import ShiftBoardConsumer
+from shifts.models import Branch, User
+from shifts.realtime import (
+    ALL_GROUP, branch_group, region_group, subscription_group
+)
+
+ROLES = ('employee', 'branch_manager', 'floating_employee', 'head_office')
+
+
+class Command(BaseCommand):
+    """
+    Load tests the real-time shift board fan-out in-process.
+
+    Opens thousands of simulated WebSocket connections spread across
+    branches, regions and head office, publishes events to random branches
+    and reports how long connecting took and how quickly each event reached
+    every subscriber in scope. No database rows are created.
+    """
+    help = "Simulate many shift board connections and measure event fan-out."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--connections', type=int, default=2000,
+            help="Number of simulated WebSocket connections.",
+        )
+        parser.add_argument(
+            '--events', type=int, default=50,
+            help="Number of events to publish.",
+        )
+        parser.add_argument(
+            '--branches', type=int, default=50,
+            help="Number of simulated branches.",
+        )
+        parser.add_argument(
+            '--regions', type=int, default=5,
+            help="Number of simulated regions.",
+        )
+
+    def handle(self, *args, **options):
+        async_to_sync(self.run)(**options)
+
+    def build_users(self, connections, branches):
+        users = []
+        for i in range(connections):
+            user = User(pk=i + 1, role=ROLES[i % len(ROLES)])
+            if user.role != 'head_office':
+                user.branch = branches[i % len(branches)]
+            users.append(user)
+        return users
+
+    async def run(self, connections, events, branches, regions, **options):
+        branch_list = [
+            Branch(pk=i + 1, region_id=i % regions + 1)
+            for i in range(branches)
+        ]
+        users = self.build_users(connections, branch_list)
+        application = ShiftBoardConsumer.as_asgi()
+
+        started = time.perf_counter()
+        boards = []
+        for user in users:
+            communicator = WebsocketCommunicator(application, '/ws/shifts/')
+            communicator.scope['user'] = user
+            connected, _ = await communicator.connect(timeout=10)
+            if not connected:
+                raise RuntimeError(f"Connection for user {user.pk} refused.")
+            boards.append((subscription_group(user), communicator))
+        connect_time = time.perf_counter() - started
+
+        layer = get_channel_layer()
+        latencies = []
+        fanout_times = []
+        for i in range(events):
+            branch = branch_list[(i * 7) % len(branch_list)]
+            groups = {
+                branch_group(branch.pk), region_group(branch.region_id),
+                ALL_GROUP
+            }
+            receivers = [board for group, board in boards if group in groups]
+            sent = time.perf_counter()
+
+            async def receive(board):
+                await board.receive_json_from(timeout=10)
+                return time.perf_counter() - sent
+
+            message = {
+                'type': 'shift.event',
+                'payload': {'type': 'loadtest', 'sequence': i},
+            }
+            for group in groups:
+                await layer.group_send(group, message)
+            received = await asyncio.gather(*map(receive, receivers))
+            latencies.extend(received)
+            fanout_times.append(time.perf_counter() - sent)
+
+        for _, board in boards:
+            await board.disconnect()
+
+        latencies.sort()
+        self.stdout.write(
+            f"Connected {len(boards)} boards in {connect_time:.2f}s "
+            f"({len(boards) / connect_time:.0f}/s)."
+        )
+        self.stdout.write(
+            f"Delivered {len(latencies)} messages for {events} events."
+        )
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            self.stdout.write(
+                f"Latency: median {statistics.median(latencies) * 1000:.1f} "
+                f"ms, p95 {p95 * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms."
+            )
+            self.stdout.write(
+                f"Full fan-out per event: median "
+                f"{statistics.median(fanout_times) * 1000:.1f} ms."
+            )
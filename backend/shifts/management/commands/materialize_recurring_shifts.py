@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from shifts import recurrence
+
+
+class Command(BaseCommand):
+    """
+    Materializes the rolling window of every recurring shift.
+
+    Run daily (e.g. from cron) so each pattern's occurrences are posted as
+    shifts `RECURRING_SHIFT_WINDOW_DAYS` days ahead.
+    """
+    help = "Write upcoming occurrences of recurring shifts as shifts."
+
+    def handle(self, *args, **options):
+        result = recurrence.materialize_due()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} shift(s) from "
+            f"{result['templates']} recurring shift(s)."
+        ))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shifts.models import Tombstone
+
+
+class Command(BaseCommand):
+    """
+    Deletes delta sync tombstones older than the retention period.
+
+    Clients holding a token older than `SHIFT_SYNC_RETENTION_DAYS` are sent
+    a full snapshot instead, so these tombstones are no longer read.
+    """
+    help = "Delete delta sync tombstones past the retention period."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            days=settings.SHIFT_SYNC_RETENTION_DAYS
+        )
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} tombstone(s).")
+        )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shifts import cache as analytics_cache
+from shifts.models import DailyShiftStat
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the DailyShiftStat rollup table from the Shift table.
+
+    With `--check` the table is only compared against fresh counts and the
+    command exits with an error if any row has drifted.
+    """
+    help = "Rebuild the daily shift statistics rollup, or check it for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Report drift without rebuilding the table.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            expected = DailyShiftStat.objects.compute()
+            current = DailyShiftStat.objects.current()
+            drifted = sorted(
+                (key, current.get(key, 0), expected.get(key, 0))
+                for key in set(expected) | set(current)
+                if current.get(key, 0) != expected.get(key, 0)
+            )
+            for (branch_id, date, status), stored, actual in drifted:
+                self.stdout.write(
+                    f"branch={branch_id} date={date} status={status}: "
+                    f"stored {stored}, expected {actual}"
+                )
+            if drifted:
+                raise CommandError(
+                    f"{len(drifted)} rollup row(s) have drifted. "
+                    "Run without --check to rebuild."
+                )
+            self.stdout.write(self.style.SUCCESS("No drift detected."))
+            return
+
+        written = DailyShiftStat.objects.rebuild()
+        analytics_cache.invalidate_all()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {written} daily shift stat row(s).")
+        )
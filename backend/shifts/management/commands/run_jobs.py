@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from shifts import jobs
+
+
+class Command(BaseCommand):
+    """
+    Runs a background job worker.
+
+    Start as many workers as needed; each claims due jobs one at a time
+    from the shared queue. With `--burst` the worker exits once the queue
+    is empty, which suits cron jobs and tests.
+    """
+    help = "Run a worker that processes queued background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help="Exit once there are no more due jobs.",
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls of an empty queue.",
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            help="Exit after running this many jobs.",
+        )
+
+    def handle(self, *args, **options):
+        count = jobs.work(
+            burst=options['burst'],
+            sleep=options['sleep'],
+            max_jobs=options['max_jobs'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Ran {count} job(s)."))
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from shifts.benchmarks import EMAIL_PREFIX, SCALES, seed
+from shifts.models import User
+
+
+class Command(BaseCommand):
+    """
+    Seeds a database with synthetic data for `benchmark_api`.
+
+    The data is the same for the same arguments and `--seed`, so databases
+    seeded on different machines or at different commits can be compared.
+    Seed a separate database, not one holding real data.
+    """
+    help = "Create synthetic regions, branches, staff, shifts and claims."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', choices=SCALES, default='small',
+            help="Named number of shifts: " + ", ".join(
+                f"{name}={count}" for name, count in SCALES.items()
+            ) + ".",
+        )
+        parser.add_argument(
+            '--shifts', type=int,
+            help="Number of shifts, overriding --scale.",
+        )
+        parser.add_argument(
+            '--regions', type=int, default=5,
+            help="Number of regions.",
+        )
+        parser.add_argument(
+            '--branches', type=int, default=10,
+            help="Number of branches per region.",
+        )
+        parser.add_argument(
+            '--staff', type=int, default=20,
+            help="Number of employees per branch.",
+        )
+        parser.add_argument(
+            '--claims', type=int, default=2,
+            help="Number of pending claims per unfilled shift.",
+        )
+        parser.add_argument(
+            '--days', type=int, default=90,
+            help="Shifts are spread over this many days either side of "
+                 "today.",
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help="Random seed for the generated data.",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Number of rows written per INSERT.",
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(email__startswith=EMAIL_PREFIX).exists():
+            raise CommandError(
+                "This database already holds benchmark data; seed a fresh "
+                "database instead."
+            )
+        counts = seed(
+            shifts=options['shifts'] or SCALES[options['scale']],
+            regions=options['regions'],
+            branches=options['branches'],
+            staff=options['staff'],
+            claims=options['claims'],
+            days=options['days'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded " + ", ".join(
+                f"{count} {name}" for name, count in counts.items()
+            ) + "."
+        ))
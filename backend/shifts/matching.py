@@ -0,0 +1,204 @@
+"""
+Proposes and ranks candidates for open shifts.
+
+Employees are eligible for open shifts at their own branch and floating
+employees for open shifts anywhere in their branch's region. A candidate
+is excluded if the shift overlaps a shift already assigned to them or
+would take them past `MATCHING_MAX_WEEKLY_HOURS` in that week. The rest
+are scored by spare weekly capacity, with a bonus for working at their
+home branch.
+
+All data is read up front with three queries (shift branches, staff and
+assigned shifts). Within one pool of staff (a branch or a region) and one
+week, every shift ranks staff in the same order, because the score only
+depends on the week's hours. So each pool is sorted once per week, and a
+shift's candidates are found by walking the sorted pool and skipping the
+few people with clashes. That makes a region with thousands of open shifts
+and staff a matter of seconds rather than millions of pair comparisons.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .intervals import group_intervals
+from .models import Branch, Shift, User
+
+# Score added for staff whose home branch posted the shift
+HOME_BRANCH_BONUS = 1.0
+
+
+def week_of(moment):
+    """
+    Returns the ISO (year, week) a datetime falls in, in local time.
+    """
+    if timezone.is_aware(moment):
+        moment = timezone.localtime(moment)
+    return moment.isocalendar()[:2]
+
+
+def hours_between(start, end):
+    return (end - start).total_seconds() / 3600
+
+
+class ShiftMatcher:
+    """
+    Ranks eligible staff for a batch of open shifts.
+
+    Args:
+        shifts (iterable): Open shift rows with `id`, `branch_id`,
+            `start_time` and `end_time` keys.
+        limit (int): The most candidates returned per shift.
+        max_weekly_hours (float): Weekly hours no candidate may exceed.
+    """
+    def __init__(self, shifts, limit=None, max_weekly_hours=None):
+        self.shifts = list(shifts)
+        self.limit = limit or settings.MATCHING_CANDIDATES_PER_SHIFT
+        self.max_hours = (
+            max_weekly_hours or settings.MATCHING_MAX_WEEKLY_HOURS
+        )
+        self._rankings = {}
+
+    def load(self):
+        """
+        Reads the branches, staff and assigned shifts the batch depends on.
+        """
+        branch_ids = {shift['branch_id'] for shift in self.shifts}
+        self.regions = dict(Branch.objects.filter(
+            pk__in=branch_ids
+        ).values_list('pk', 'region_id'))
+
+        self.staff = {
+            row['id']: row for row in User.objects.filter(
+                Q(role='employee', branch_id__in=branch_ids)
+                | Q(
+                    role='floating_employee',
+                    branch__region_id__in=set(self.regions.values())
+                ),
+                is_active=True,
+            ).values(
+                'id', 'email', 'first_name', 'last_name', 'role',
+                'branch_id', branch_region_id=F('branch__region_id')
+            )
+        }
+
+        self.by_branch, self.by_region = {}, {}
+        for user in self.staff.values():
+            self.by_branch.setdefault(user['branch_id'], []).append(
+                user['id']
+            )
+            if user['role'] == 'floating_employee':
+                region_id = user['branch_region_id']
+                self.by_region.setdefault(region_id, []).append(user['id'])
+
+        # Assigned shifts in the weeks the batch covers, for overlap checks
+        # and weekly hours. Whole weeks are read, with a day's margin for
+        # shifts that cross midnight.
+        starts = [shift['start_time'] for shift in self.shifts]
+        first = min(starts) - timedelta(days=8)
+        last = max(starts) + timedelta(days=8)
+        assigned = Shift.objects.filter(
+            assigned_to__isnull=False,
+            start_time__lt=last,
+            end_time__gt=first,
+        ).values_list('assigned_to_id', 'start_time', 'end_time')
+
+        self.hours = {}
+        rows = []
+        for user_id, start, end in assigned:
+            if user_id not in self.staff:
+                continue
+            rows.append((user_id, start, end))
+            week = self.hours.setdefault(user_id, {})
+            key = week_of(start)
+            week[key] = week.get(key, 0) + hours_between(start, end)
+        self.assigned = group_intervals(rows)
+
+    def weekly_hours(self, user_id, week):
+        return self.hours.get(user_id, {}).get(week, 0)
+
+    def ranking(self, pool, key, week):
+        """
+        Returns a pool of staff sorted by hours already worked in a week,
+        then by id, computed once per pool and week.
+        """
+        cache_key = (pool, key, week)
+        if cache_key not in self._rankings:
+            members = (
+                self.by_branch if pool == 'branch' else self.by_region
+            ).get(key, [])
+            self._rankings[cache_key] = sorted(members, key=lambda user_id: (
+                self.weekly_hours(user_id, week), user_id
+            ))
+        return self._rankings[cache_key]
+
+    def pick(self, ranking, shift, week, duration, home):
+        """
+        Walks a ranked pool, returning up to `limit` available candidates.
+        """
+        picked = []
+        for user_id in ranking:
+            hours = self.weekly_hours(user_id, week)
+            if hours + duration > self.max_hours:
+                # The pool is sorted by hours, so nobody later fits either
+                break
+            user = self.staff[user_id]
+            if not home and user['branch_id'] == shift['branch_id']:
+                continue
+            index = self.assigned.get(user_id)
+            if index and index.overlaps(
+                shift['start_time'], shift['end_time']
+            ):
+                continue
+            score = (
+                (HOME_BRANCH_BONUS if home else 0)
+                + 1 - hours / self.max_hours
+            )
+            picked.append({
+                'user': user_id,
+                'email': user['email'],
+                'first_name': user['first_name'],
+                'last_name': user['last_name'],
+                'role': user['role'],
+                'home_branch': home,
+                'weekly_hours': round(hours, 2),
+                'score': round(score, 4),
+            })
+            if len(picked) == self.limit:
+                break
+        return picked
+
+    def candidates(self, shift):
+        """
+        Returns the ranked candidates for one shift.
+        """
+        week = week_of(shift['start_time'])
+        duration = hours_between(shift['start_time'], shift['end_time'])
+        region_id = self.regions.get(shift['branch_id'])
+        found = self.pick(
+            self.ranking('branch', shift['branch_id'], week),
+            shift, week, duration, home=True
+        ) + self.pick(
+            self.ranking('region', region_id, week),
+            shift, week, duration, home=False
+        )
+        found.sort(key=lambda candidate: (
+            -candidate['score'], candidate['user']
+        ))
+        return found[:self.limit]
+
+    def run(self):
+        """
+        Ranks candidates for every shift in the batch.
+
+        Returns:
+            list: One `{'shift', 'candidates'}` entry per shift, in order.
+        """
+        if not self.shifts:
+            return []
+        self.load()
+        return [
+            {'shift': shift['id'], 'candidates': self.candidates(shift)}
+            for shift in self.shifts
+        ]
@@ -0,0 +1,243 @@
+"""
+Per-request query and timing instrumentation.
+
+`RequestMetricsMiddleware` (opt-in, see `MIDDLEWARE`) measures every
+request's SQL query count, time spent in the database, time spent
+serializing and total view time, and tags them with the view and action
+that handled it, e.g. `ShiftViewSet.list`. The figures are returned in a
+`Server-Timing` header, added to the totals served in the Prometheus text
+format by `/api/metrics/`, and requests over `REQUEST_METRICS_QUERY_BUDGET`
+queries are logged.
+
+Serializer time covers the shift, claim and user serializers and the fast
+list path, the serialization that dominates the hot list endpoints.
+Totals are kept per process, so each worker is scraped separately.
+Queries made while a streaming response is consumed happen after the
+middleware returns and are not counted.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (in seconds) of the request duration histogram buckets
+DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    The measurements of one request.
+    """
+    def __init__(self):
+        self.view = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.view_time = 0.0
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting queries and their duration.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+    def server_timing(self):
+        """
+        Returns the measurements as a `Server-Timing` header value.
+        """
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serializer_time * 1000:.1f}',
+            f'view;dur={self.view_time * 1000:.1f}',
+        ])
+
+
+@contextmanager
+def serializing():
+    """
+    Adds the time spent in the block to the current request's serializer
+    time. Nested blocks, such as a shift's claims, are only counted once.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+        metrics.serializing = False
+
+
+def timed_serializer(func):
+    """
+    Decorates a serialization function to count towards serializer time.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with serializing():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def view_name(view_func, method):
+    """
+    Returns the `Class.action` tag of the view handling a request.
+    """
+    cls = getattr(view_func, 'cls', None) or getattr(
+        view_func, 'view_class', None
+    )
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+
+
+class Registry:
+    """
+    Per-view totals of the requests seen by this process.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def record(self, metrics, budget):
+        with self.lock:
+            totals = self.views.setdefault(metrics.view, {
+                'requests': 0,
+                'queries': 0,
+                'db_seconds': 0.0,
+                'serializer_seconds': 0.0,
+                'view_seconds': 0.0,
+                'over_budget': 0,
+                'buckets': [0] * len(DURATION_BUCKETS),
+            })
+            totals['requests'] += 1
+            totals['queries'] += metrics.queries
+            totals['db_seconds'] += metrics.db_time
+            totals['serializer_seconds'] += metrics.serializer_time
+            totals['view_seconds'] += metrics.view_time
+            totals['over_budget'] += metrics.queries > budget
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if metrics.view_time <= bound:
+                    totals['buckets'][index] += 1
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def render(self):
+        """
+        Returns the totals in the Prometheus text exposition format.
+        """
+        with self.lock:
+            views = {
+                view: {**totals, 'buckets': list(totals['buckets'])}
+                for view, totals in sorted(self.views.items())
+            }
+
+        lines = []
+
+        def family(name, kind, text, key):
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for view, totals in views.items():
+                lines.append(f'{name}{{view="{view}"}} {totals[key]}')
+
+        family('rotaiq_requests_total', 'counter',
+               'Requests handled.', 'requests')
+        family('rotaiq_request_queries_total', 'counter',
+               'SQL queries run by requests.', 'queries')
+        family('rotaiq_request_db_seconds_total', 'counter',
+               'Time requests spent in the database.', 'db_seconds')
+        family('rotaiq_request_serializer_seconds_total', 'counter',
+               'Time requests spent serializing.', 'serializer_seconds')
+        family('rotaiq_request_over_query_budget_total', 'counter',
+               'Requests that ran more queries than the budget.',
+               'over_budget')
+
+        name = 'rotaiq_request_duration_seconds'
+        lines.append(f'# HELP {name} Time spent in the view.')
+        lines.append(f'# TYPE {name} histogram')
+        for view, totals in views.items():
+            for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                )
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="+Inf"}} '
+                f'{totals["requests"]}'
+            )
+            lines.append(
+                f'{name}_sum{{view="{view}"}} {totals["view_seconds"]}'
+            )
+            lines.append(
+                f'{name}_count{{view="{view}"}} {totals["requests"]}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures each request handled by a view and reports it through
+    `Server-Timing`, the metrics registry and the query budget log.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        # Requests that never reached a view (e.g. 404s) are not recorded
+        if metrics.view is None:
+            return response
+        metrics.view_time = time.perf_counter() - request._metrics_started
+        response['Server-Timing'] = metrics.server_timing()
+
+        budget = getattr(settings, 'REQUEST_METRICS_QUERY_BUDGET', 50)
+        registry.record(metrics, budget)
+        if metrics.queries > budget:
+            logger.warning(
+                '%s %s (%s) ran %d queries, over the budget of %d '
+                '(%.1f ms in the database)',
+                request.method, request.path, metrics.view, metrics.queries,
+                budget, metrics.db_time * 1000,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.view = view_name(view_func, request.method)
+            request._metrics_started = time.perf_counter()
+        return None
@@ -0,0 +1,35 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed, TokenError
+)
+
+from .authentication import CachedJWTAuthentication
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with a JWT access token passed as
+    the `token` query parameter, since browsers cannot set headers on
+    WebSocket requests.
+    """
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = query.get('token', [None])[0]
+        scope['user'] = await self.get_user(token)
+        return await super().__call__(scope, receive, send)
+
+    @database_sync_to_async
+    def get_user(self, token):
+        if not token:
+            return AnonymousUser()
+        authentication = CachedJWTAuthentication()
+        try:
+            validated = authentication.get_validated_token(token)
+            return authentication.get_user(validated)
+        except (AuthenticationFailed, TokenError):
+            # Includes invalid tokens and inactive, deleted or revoked users
+            return AnonymousUser()
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0007_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(fields=['token', 'is_used'], name='invitation_token_used_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invitation',
+            index=models.Index(fields=['branch', 'created_at'], name='invitation_branch_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['branch', 'start_time'], name='shift_branch_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['branch', 'status', 'start_time'], name='shift_branch_status_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['start_time', 'id'], name='shift_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(condition=models.Q(('status', 'open')), fields=['branch', 'start_time'], name='shift_open_branch_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(condition=models.Q(('status', 'open')), fields=['start_time'], name='shift_open_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftclaim',
+            index=models.Index(fields=['shift', 'status'], name='claim_shift_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftclaim',
+            index=models.Index(fields=['user', 'status'], name='claim_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftclaim',
+            index=models.Index(fields=['created_at', 'id'], name='claim_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_daily_stats(apps, schema_editor):
+    Shift = apps.get_model('shifts', 'Shift')
+    DailyShiftStat = apps.get_model('shifts', 'DailyShiftStat')
+    rows = Shift.objects.annotate(
+        date=TruncDate('start_time')
+    ).values('branch_id', 'date', 'status').annotate(
+        count=Count('pk')
+    ).order_by()
+    DailyShiftStat.objects.bulk_create(
+        DailyShiftStat(**row) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0008_shift_claim_invitation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyShiftStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('open', 'Open'), ('claimed', 'Claimed'), ('filled', 'Filled')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='shifts.branch')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='dailystat_date_idx')],
+                'unique_together': {('branch', 'date', 'status')},
+            },
+        ),
+        migrations.RunPython(
+            populate_daily_stats, migrations.RunPython.noop
+        ),
+    ]
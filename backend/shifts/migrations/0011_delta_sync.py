@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0010_shift_updated_at_shiftclaim_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('shift', 'Shift'), ('claim', 'Shift claim')], max_length=10)),
+                ('object_id', models.IntegerField()),
+                ('branch_id', models.IntegerField()),
+                ('region_id', models.IntegerField(blank=True, null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['branch', 'updated_at'], name='shift_branch_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['updated_at'], name='shift_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shiftclaim',
+            index=models.Index(fields=['updated_at'], name='claim_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['branch_id', 'deleted_at'], name='tombstone_branch_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['region_id', 'deleted_at'], name='tombstone_region_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ),
+    ]
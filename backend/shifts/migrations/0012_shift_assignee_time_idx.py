@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0011_delta_sync'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['assigned_to', 'start_time', 'end_time'], name='shift_assignee_time_idx'),
+        ),
+    ]
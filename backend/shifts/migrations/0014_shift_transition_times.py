@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:20
+
+from django.db import migrations, models
+from django.db.models import Min, OuterRef, Subquery
+
+
+def backfill_transition_times(apps, schema_editor):
+    """
+    Fills in the transitions of existing claims and shifts from the best
+    data available: a decided claim was last written when it was decided,
+    and a shift was filled when its approved claim was. When existing
+    shifts were posted is unknown, rather than the time of the migration.
+    """
+    Shift = apps.get_model('shifts', 'Shift')
+    ShiftClaim = apps.get_model('shifts', 'ShiftClaim')
+    Shift.objects.update(created_at=None)
+    ShiftClaim.objects.filter(
+        status__in=('approved', 'declined')
+    ).update(decided_at=models.F('updated_at'))
+
+    claims = ShiftClaim.objects.filter(shift=OuterRef('pk')).order_by()
+    Shift.objects.update(
+        first_claimed_at=Subquery(
+            claims.values('shift').annotate(
+                first=Min('created_at')
+            ).values('first')
+        )
+    )
+    Shift.objects.filter(status__in=('claimed', 'filled')).update(
+        filled_at=Subquery(
+            claims.filter(status='approved').values('decided_at')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0013_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shift',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='filled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='first_claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='shiftclaim',
+            name='decided_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(
+            backfill_transition_times, migrations.RunPython.noop
+        ),
+    ]
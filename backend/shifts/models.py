@@ -1,6 +1,9 @@
 import uuid
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
 from django.conf import settings
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
@@ -219,10 +222,75 @@ class Invitation(models.Model):
     is_used = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Covers the public token lookup for unused invitations
+            models.Index(
+                fields=['token', 'is_used'],
+                name='invitation_token_used_idx'
+            ),
+            models.Index(
+                fields=['branch', 'created_at'],
+                name='invitation_branch_created_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"Invitation for {self.email} ({self.role})"
 
 
+class ShiftQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Shift model.
+    """
+    def with_details(self, fields=None):
+        """
+        Fetches every relation nested by the ShiftSerializer up front.
+
+        The branch (and its region), the posting and assigned users (and
+        their branches) are joined in the main query, while the claims and
+        their users are loaded with a single prefetch query. This keeps the
+        number of queries fixed regardless of how many shifts are returned.
+
+        Args:
+            fields (iterable): The serializer fields that will be rendered.
+                Only the relations those fields need are loaded. Defaults
+                to all of them.
+
+        Returns:
+            ShiftQuerySet: The queryset with related objects preloaded.
+        """
+        relations = {
+            'branch_details': 'branch__region',
+            'posted_by_details': 'posted_by__branch__region',
+            'assigned_to_details': 'assigned_to__branch__region',
+        }
+        if fields is None:
+            fields = list(relations) + ['claims']
+
+        queryset = self.select_related(*[
+            relation for field, relation in relations.items()
+            if field in fields
+        ])
+        if 'claims' in fields:
+            queryset = queryset.prefetch_related(
+                models.Prefetch(
+                    'claims',
+                    queryset=ShiftClaim.objects.select_related(
+                        'user__branch__region'
+                    )
+                )
+            )
+        return queryset
+
+    def overlapping(self, start, end):
+        """
+        Filters down to shifts that overlap the half-open range
+        `[start, end)`. Shifts that merely touch it do not count.
+        """
+        return self.filter(start_time__lt=end, end_time__gt=start)
+
+
 class Shift(models.Model):
     """
     Represents an available rota gap or shift to be covered.
@@ -239,6 +307,13 @@ class Shift(models.Model):
             'open', 'claimed', 'approved'
         ).
         description (str): A brief description of the shift.
+        created_at (datetime): When the shift was posted (unknown for
+            shifts posted before it was recorded).
+        first_claimed_at (datetime): When the first claim was made.
+        filled_at (datetime): When the shift was covered, by a claim being
+            approved or by being marked filled.
+        recurrence (ForeignKey): The recurring shift this shift is an
+            occurrence of (can be null).
     """
     SHIFT_STATUS_CHOICES = (
         ('open', 'Open'),
@@ -272,6 +347,66 @@ class Shift(models.Model):
         blank=True,
         related_name='assigned_shifts'
     )
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    first_claimed_at = models.DateTimeField(null=True, blank=True)
+    filled_at = models.DateTimeField(null=True, blank=True)
+    recurrence = models.ForeignKey(
+        'RecurringShift',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='shifts'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShiftQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Branch-scoped lists and analytics filtered by date range
+            models.Index(
+                fields=['branch', 'start_time'],
+                name='shift_branch_start_idx'
+            ),
+            models.Index(
+                fields=['branch', 'status', 'start_time'],
+                name='shift_branch_status_start_idx'
+            ),
+            models.Index(
+                fields=['start_time', 'id'],
+                name='shift_start_id_idx'
+            ),
+            # Partial indexes for the open shift board, ignored by backends
+            # without partial index support
+            models.Index(
+                fields=['branch', 'start_time'],
+                condition=models.Q(status='open'),
+                name='shift_open_branch_start_idx'
+            ),
+            models.Index(
+                fields=['start_time'],
+                condition=models.Q(status='open'),
+                name='shift_open_start_idx'
+            ),
+            # Delta sync reads only the rows changed since a token
+            models.Index(
+                fields=['branch', 'updated_at'],
+                name='shift_branch_updated_idx'
+            ),
+            models.Index(fields=['updated_at'], name='shift_updated_idx'),
+            # Clash checks on the shifts a user is working
+            models.Index(
+                fields=['assigned_to', 'start_time', 'end_time'],
+                name='shift_assignee_time_idx'
+            ),
+        ]
+        constraints = [
+            # Each occurrence of a recurring shift is materialized once
+            models.UniqueConstraint(
+                fields=['recurrence', 'start_time'],
+                name='shift_recurrence_start_uniq'
+            ),
+        ]
 
     def __str__(self):
         """
@@ -280,9 +415,69 @@ class Shift(models.Model):
         return f"{self.role} shift at {self.branch.name} on {self.start_time.date()}"
 
 
+class RecurringShift(models.Model):
+    """
+    A shift that repeats on a pattern, e.g. every Saturday 9-17.
+
+    The pattern follows a subset of iCalendar RRULEs: `frequency` (daily
+    or weekly), `interval`, the `weekdays` of weekly patterns (0 is
+    Monday; the weekday of `starts_on` when empty) and an optional
+    `ends_on` date. Times are local to `TIME_ZONE` and a shift ending at
+    or before its start time ends the next day.
+
+    Only occurrences up to `materialized_until` exist as Shift rows; see
+    `shifts.recurrence`.
+    """
+    FREQUENCY_CHOICES = (
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+    )
+
+    branch = models.ForeignKey(
+        'Branch',
+        on_delete=models.CASCADE,
+        related_name='recurring_shifts'
+    )
+    posted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='posted_recurring_shifts'
+    )
+    role = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    frequency = models.CharField(
+        max_length=10,
+        choices=FREQUENCY_CHOICES,
+        default='weekly'
+    )
+    interval = models.PositiveSmallIntegerField(default=1)
+    weekdays = models.JSONField(default=list, blank=True)
+    starts_on = models.DateField()
+    ends_on = models.DateField(null=True, blank=True)
+    materialized_until = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The materialization job looks for patterns still running
+            models.Index(
+                fields=['ends_on', 'materialized_until'],
+                name='recurring_ends_mat_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.role} at {self.branch_id}, {self.frequency}"
+
+
 class ShiftClaim(models.Model):
     """
     Represents an employee's claim on a specific shift.
+
+    `decided_at` records when the claim was approved or declined.
     """
     CLAIM_STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -305,10 +500,282 @@ class ShiftClaim(models.Model):
         default='pending'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    decided_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         # Ensures a user can only claim a specific shift once
         unique_together = ('shift', 'user')
+        indexes = [
+            models.Index(
+                fields=['shift', 'status'],
+                name='claim_shift_status_idx'
+            ),
+            models.Index(
+                fields=['user', 'status'],
+                name='claim_user_status_idx'
+            ),
+            models.Index(
+                fields=['created_at', 'id'],
+                name='claim_created_id_idx'
+            ),
+            models.Index(fields=['updated_at'], name='claim_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name} - {self.shift} ({self.status})"
+
+
+
+class DailyShiftStatManager(models.Manager):
+    """
+    Custom manager for the DailyShiftStat rollup table.
+
+    Provides the incremental adjustment used when a single shift changes
+    and the full rebuild used to (re)populate the table from `Shift`.
+    """
+    def adjust(self, branch_id, date, status, delta):
+        """
+        Adds `delta` to the count for a single (branch, date, status) row,
+        creating the row if it does not exist yet.
+        """
+        lookup = {'branch_id': branch_id, 'date': date, 'status': status}
+        if self.filter(**lookup).update(count=F('count') + delta):
+            return
+        if delta < 0:
+            # Nothing to take away from, e.g. when the branch and its rollup
+            # rows are being deleted along with its shifts
+            return
+        try:
+            with transaction.atomic():
+                self.create(count=delta, **lookup)
+        except IntegrityError:
+            # Another request created the row in the meantime
+            self.filter(**lookup).update(count=F('count') + delta)
+
+    def adjust_many(self, deltas):
+        """
+        Applies many count adjustments at once, for bulk shift changes.
+
+        Existing rows are read with one query and updated with a single
+        `bulk_update`; missing rows are added with a single `bulk_create`.
+
+        Args:
+            deltas (dict): A mapping of (branch_id, date, status) to the
+                amount its count changes by.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        existing = {
+            (stat.branch_id, stat.date, stat.status): stat
+            for stat in self.select_for_update().filter(
+                branch_id__in={key[0] for key in deltas},
+                date__in={key[1] for key in deltas},
+            )
+        }
+        updated, created = [], []
+        for key, delta in deltas.items():
+            stat = existing.get(key)
+            if stat is not None:
+                stat.count = F('count') + delta
+                updated.append(stat)
+            elif delta > 0:
+                branch_id, date, status = key
+                created.append(self.model(
+                    branch_id=branch_id, date=date, status=status,
+                    count=delta
+                ))
+        self.bulk_update(updated, ['count'])
+        try:
+            with transaction.atomic():
+                self.bulk_create(created)
+        except IntegrityError:
+            # Another request created some of the rows in the meantime
+            for stat in created:
+                self.adjust(
+                    stat.branch_id, stat.date, stat.status, stat.count
+                )
+
+    def compute(self):
+        """
+        Aggregates the `Shift` table into rollup counts.
+
+        Returns:
+            dict: A mapping of (branch_id, date, status) to a shift count.
+        """
+        rows = Shift.objects.annotate(
+            date=TruncDate('start_time')
+        ).values('branch_id', 'date', 'status').annotate(
+            count=Count('pk')
+        ).order_by()
+        return {
+            (row['branch_id'], row['date'], row['status']): row['count']
+            for row in rows
+        }
+
+    def current(self):
+        """
+        Returns the stored non-zero counts keyed like `compute()`.
+        """
+        rows = self.filter(count__gt=0).values_list(
+            'branch_id', 'date', 'status', 'count'
+        )
+        return {
+            (branch_id, date, status): count
+            for branch_id, date, status, count in rows
+        }
+
+    @transaction.atomic
+    def rebuild(self):
+        """
+        Replaces the contents of the rollup table with fresh counts.
+
+        Returns:
+            int: The number of rows written.
+        """
+        self.all().delete()
+        stats = self.bulk_create(
+            self.model(
+                branch_id=branch_id, date=date, status=status, count=count
+            )
+            for (branch_id, date, status), count in self.compute().items()
+        )
+        return len(stats)
+
+
+class DailyShiftStat(models.Model):
+    """
+    Pre-aggregated number of shifts per branch, day and status.
+
+    The analytics endpoints read from this table instead of grouping the
+    raw `Shift` table. It is kept up to date by the signal handlers in
+    `shifts.signals` and can be rebuilt with the `rebuild_shift_stats`
+    management command.
+    """
+    branch = models.ForeignKey(
+        'Branch',
+        on_delete=models.CASCADE,
+        related_name='daily_stats'
+    )
+    date = models.DateField()
+    status = models.CharField(
+        max_length=20,
+        choices=Shift.SHIFT_STATUS_CHOICES
+    )
+    count = models.IntegerField(default=0)
+
+    objects = DailyShiftStatManager()
+
+    class Meta:
+        unique_together = ('branch', 'date', 'status')
+        indexes = [
+            models.Index(fields=['date'], name='dailystat_date_idx'),
+        ]
+
+    @staticmethod
+    def key_for(shift):
+        """
+        Returns the (branch_id, date, status) row a shift is counted in.
+        """
+        start_time = shift.start_time
+        if timezone.is_aware(start_time):
+            start_time = timezone.localtime(start_time)
+        return (shift.branch_id, start_time.date(), shift.status)
+
+    def __str__(self):
+        return f"{self.branch_id} {self.date} {self.status}: {self.count}"
+
+
+class Tombstone(models.Model):
+    """
+    Records a deleted shift or shift claim for the delta sync endpoint.
+
+    Deleted rows cannot be found by their `updated_at`, so a tombstone is
+    written for each one by the signal handlers in `shifts.signals`. The
+    branch and region are copied as plain integers, rather than foreign
+    keys, so the tombstones outlive a deleted branch and can still be
+    scoped like the shifts were.
+    """
+    KIND_CHOICES = (
+        ('shift', 'Shift'),
+        ('claim', 'Shift claim'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    branch_id = models.IntegerField()
+    region_id = models.IntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['branch_id', 'deleted_at'],
+                name='tombstone_branch_deleted_idx'
+            ),
+            models.Index(
+                fields=['region_id', 'deleted_at'],
+                name='tombstone_region_deleted_idx'
+            ),
+            models.Index(
+                fields=['deleted_at'], name='tombstone_deleted_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, queued in the database and run by the
+    `run_jobs` worker command.
+
+    See `shifts.jobs` for how jobs are queued, claimed and retried.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_at = models.DateTimeField(default=timezone.now)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Renewed by the worker while the job runs; once it passes, the worker
+    # is assumed lost and the job is handed to another one
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Covers the worker's "next due job" lookup
+            models.Index(
+                fields=['status', 'run_at', 'id'],
+                name='job_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
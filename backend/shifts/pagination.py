@@ -0,0 +1,140 @@
+import json
+import operator
+from functools import reduce
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Base cursor pagination for the list endpoints.
+
+    Pages are located by seeking past the last row of the previous page
+    rather than with an OFFSET, and no COUNT(*) is run, so the cost of
+    fetching a page stays the same however much history builds up. Cursors
+    are opaque, base64-encoded positions handed back in the `next` and
+    `previous` links.
+
+    DRF's cursor only records the first ordering field and steps through
+    rows that share it with an OFFSET. Here the cursor records every
+    ordering field, and as each ordering ends with the unique `id`, the
+    position is seeked with a row comparison such as
+    `start_time > t OR (start_time = t AND id > i)`, however many rows
+    share a start time.
+
+    Pages hold `API_PAGE_SIZE` items by default. Clients may ask for a
+    smaller or larger page with `?page_size=`, capped at the
+    `API_MAX_PAGE_SIZE` setting.
+    """
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 200)
+    ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(
+                self.seek(current_position, reverse)
+            )
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def seek(self, position, reverse):
+        """
+        Returns the filter selecting the rows after a position, in the
+        direction of travel: the lexicographic comparison of the ordering
+        fields with the position's values.
+        """
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        conditions = []
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip('-')
+            # Test for: (cursor reversed) XOR (field reversed)
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            conditions.append(equal & Q(**{f'{field}__{lookup}': value}))
+            equal &= Q(**{field: value})
+        return reduce(operator.or_, conditions)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field = order.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(str(instance[field]))
+            else:
+                values.append(str(getattr(instance, field)))
+        return json.dumps(values)
+
+
+class ShiftCursorPagination(KeysetPagination):
+    """
+    Paginates shifts in chronological order of their start time.
+    """
+    ordering = ('start_time', 'id')
+
+
+class CreatedAtCursorPagination(KeysetPagination):
+    """
+    Paginates claims and invitations in the order they were created.
+    """
+    ordering = ('created_at', 'id')
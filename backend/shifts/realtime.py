@@ -0,0 +1,90 @@
+"""
+Push notifications for the real-time shift board.
+
+Events are fanned out through the Channels layer to groups that mirror the
+scoping rules of `ShiftViewSet.scope_queryset`: each branch, each region and
+an organisation-wide group. Subscribers join exactly one of them.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from . import scopes
+from .models import Branch
+
+ALL_GROUP = 'shifts.all'
+
+
+def branch_group(branch_id):
+    return f'shifts.branch.{branch_id}'
+
+
+def region_group(region_id):
+    return f'shifts.region.{region_id}'
+
+
+def subscription_group(user):
+    """
+    Returns the group a user's board subscribes to, following the same
+    role rules as `ShiftViewSet.scope_queryset`.
+    """
+    if user.role in ['branch_manager', 'employee'] and user.branch_id:
+        return branch_group(user.branch_id)
+    elif user.role == 'floating_employee' and user.branch_id:
+        region_id = scopes.get_scope(user)['branch_region_id']
+        if region_id:
+            return region_group(region_id)
+    return ALL_GROUP
+
+
+def shift_payload(shift):
+    return {
+        'id': shift.pk,
+        'branch': shift.branch_id,
+        'status': shift.status,
+        'role': shift.role,
+        'start_time': shift.start_time.isoformat(),
+        'end_time': shift.end_time.isoformat(),
+        'assigned_to': shift.assigned_to_id,
+    }
+
+
+def claim_payload(claim):
+    return {
+        'id': claim.pk,
+        'shift': claim.shift_id,
+        'user': claim.user_id,
+        'status': claim.status,
+    }
+
+
+def publish(event_type, branch_id, region_id=None, **data):
+    """
+    Sends an event to every group that can see shifts at a branch, once
+    the current transaction commits.
+
+    Args:
+        event_type (str): e.g. 'shift.created' or 'claim.approved'.
+        branch_id (int): The branch the event concerns.
+        region_id (int): The branch's region. Looked up if not given.
+        **data: The event body, sent alongside its `type`.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    if region_id is None:
+        region_id = Branch.objects.filter(pk=branch_id).values_list(
+            'region_id', flat=True
+        ).first()
+
+    message = {
+        'type': 'shift.event',
+        'payload': {'type': event_type, **data},
+    }
+    groups = [branch_group(branch_id), region_group(region_id), ALL_GROUP]
+
+    def send():
+        for group in groups:
+            async_to_sync(layer.group_send)(group, message)
+
+    transaction.on_commit(send)
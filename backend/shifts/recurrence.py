@@ -0,0 +1,207 @@
+"""
+Lazy expansion of recurring shifts.
+
+A `RecurringShift` is one row however many times it repeats. Only the
+occurrences falling within the next `RECURRING_SHIFT_WINDOW_DAYS` days are
+written as Shift rows, which can be claimed like any other shift, by the
+`materialize_recurring_shifts` task; the management command of the same
+name runs it for every pattern and is meant to be run daily. How far each
+pattern has been materialized is kept in `materialized_until`, and
+occurrences beyond it are computed on the fly by `expand()` when read.
+
+Materialized occurrences are ordinary shifts from then on: editing or
+deleting one does not bring it back, and changes to a pattern only apply
+to occurrences that have not been materialized yet.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import realtime
+from .models import RecurringShift, Shift, DailyShiftStat
+from .signals import sync_stats
+
+# Fields of the materialized occurrences returned alongside computed ones
+OCCURRENCE_VALUES = (
+    'id', 'recurrence_id', 'branch_id', 'role', 'description', 'start_time',
+    'end_time', 'status', 'assigned_to_id'
+)
+
+
+def occurrence_dates(template, first, last):
+    """
+    Yields the dates between `first` and `last` inclusive on which a
+    pattern has an occurrence.
+    """
+    first = max(first, template.starts_on)
+    if template.ends_on is not None:
+        last = min(last, template.ends_on)
+    weekdays = set(template.weekdays or [template.starts_on.weekday()])
+    week_zero = template.starts_on - timedelta(
+        days=template.starts_on.weekday()
+    )
+
+    day = first
+    while day <= last:
+        if template.frequency == 'daily':
+            due = (day - template.starts_on).days % template.interval == 0
+        else:
+            week = (day - week_zero).days // 7
+            due = (
+                day.weekday() in weekdays and week % template.interval == 0
+            )
+        if due:
+            yield day
+        day += timedelta(days=1)
+
+
+def occurrence_times(template, day):
+    """
+    Returns the aware start and end of a pattern's occurrence on a day.
+    """
+    start = timezone.make_aware(datetime.combine(day, template.start_time))
+    end_day = day if template.end_time > template.start_time else (
+        day + timedelta(days=1)
+    )
+    end = timezone.make_aware(datetime.combine(end_day, template.end_time))
+    return start, end
+
+
+def window_end():
+    """
+    Returns the last day of the rolling window materialized as shifts.
+    """
+    return timezone.localdate() + timedelta(
+        days=settings.RECURRING_SHIFT_WINDOW_DAYS
+    )
+
+
+def first_unmaterialized(template):
+    """
+    Returns the first day whose occurrence has not been materialized.
+    Occurrences in the past are never materialized.
+    """
+    first = max(template.starts_on, timezone.localdate())
+    if template.materialized_until is not None:
+        first = max(first, template.materialized_until + timedelta(days=1))
+    return first
+
+
+def materialize(template, until=None):
+    """
+    Writes the occurrences of a pattern up to `until` (the end of the
+    rolling window by default) as shifts, with one `bulk_create`.
+
+    The pattern's row is locked while this happens, so concurrent runs
+    cannot write an occurrence twice.
+
+    Returns:
+        list: The shifts created.
+    """
+    until = until or window_end()
+    with transaction.atomic():
+        template = RecurringShift.objects.select_for_update().get(
+            pk=template.pk
+        )
+        first = first_unmaterialized(template)
+        if first > until:
+            return []
+
+        shifts = []
+        for day in occurrence_dates(template, first, until):
+            start, end = occurrence_times(template, day)
+            shifts.append(Shift(
+                branch_id=template.branch_id,
+                posted_by_id=template.posted_by_id,
+                role=template.role,
+                description=template.description,
+                start_time=start,
+                end_time=end,
+                recurrence=template,
+            ))
+        created = Shift.objects.bulk_create(
+            shifts, batch_size=settings.SHIFT_BULK_BATCH_SIZE
+        )
+        RecurringShift.objects.filter(pk=template.pk).update(
+            materialized_until=until
+        )
+        sync_stats([], [DailyShiftStat.key_for(shift) for shift in created])
+        if created:
+            realtime.publish(
+                'shifts.created', template.branch_id,
+                ids=[shift.pk for shift in created]
+            )
+    return created
+
+
+def materialize_due():
+    """
+    Materializes the rolling window of every pattern that is still
+    running and has not been materialized that far yet.
+
+    Returns:
+        dict: The number of patterns extended and shifts created.
+    """
+    until = window_end()
+    today = timezone.localdate()
+    due = RecurringShift.objects.filter(
+        Q(ends_on__isnull=True) | Q(ends_on__gte=today),
+        Q(materialized_until__isnull=True) | Q(materialized_until__lt=until),
+    ).order_by('pk')
+
+    templates = created = 0
+    for template in due.iterator():
+        created += len(materialize(template, until))
+        templates += 1
+    return {'templates': templates, 'created': created}
+
+
+def expand(templates, start, end):
+    """
+    Returns the occurrences of the given patterns starting in the
+    half-open range [`start`, `end`), sorted by start time.
+
+    Materialized occurrences are read from the shifts table with one
+    query and keep their id, status and assignee; later ones are computed
+    from their pattern and have no id.
+    """
+    templates = list(templates)
+    occurrences = [
+        {**row, 'materialized': True}
+        for row in Shift.objects.filter(
+            recurrence__in=templates,
+            start_time__gte=start,
+            start_time__lt=end,
+        ).values(*OCCURRENCE_VALUES)
+    ]
+
+    first = timezone.localtime(start).date()
+    last = timezone.localtime(end).date()
+    for template in templates:
+        dates = occurrence_dates(
+            template, max(first, first_unmaterialized(template)), last
+        )
+        for day in dates:
+            occurrence_start, occurrence_end = occurrence_times(template, day)
+            if not start <= occurrence_start < end:
+                continue
+            occurrences.append({
+                'id': None,
+                'recurrence_id': template.pk,
+                'branch_id': template.branch_id,
+                'role': template.role,
+                'description': template.description,
+                'start_time': occurrence_start,
+                'end_time': occurrence_end,
+                'status': 'open',
+                'assigned_to_id': None,
+                'materialized': False,
+            })
+
+    occurrences.sort(
+        key=lambda row: (row['start_time'], row['recurrence_id'])
+    )
+    return occurrences
@@ -0,0 +1,148 @@
+"""
+Per-user cache of the data read by authentication and role scoping.
+
+Every API request used to load the caller's `User` row during JWT
+authentication and then follow `user.branch` and `user.branch.region` to
+scope its querysets. Here the user fields read by authentication,
+permissions, scoping and the user's own profile are cached together with
+a resolved scope (role, branch, region and the ids of the branches the
+user can see), so a warm request does neither. The password hash and
+login times are never cached: only an MD5 of the password hash is kept,
+for token revocation, and other fields are loaded on first access like
+any deferred field.
+
+Entries are keyed by the JWT user id field (the email address). A user's
+entry is dropped whenever that user is saved or deleted, and every entry
+is expired at once when a branch or region changes, since that can move
+users between scopes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Branch
+
+KEY_PREFIX = 'userscope'
+VERSION_KEY = f'{KEY_PREFIX}:version'
+
+# The fields of a cached user; the rest are deferred
+CACHED_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'role', 'branch_id',
+    'region_id', 'avatar', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+def _key(email):
+    digest = hashlib.md5(email.encode()).hexdigest()
+    return f'{KEY_PREFIX}:{cache.get(VERSION_KEY, 0)}:{digest}'
+
+
+def resolve_scope(user):
+    """
+    Resolves the ids a user's role scoping depends on.
+
+    Returns:
+        dict: The user's role and staff flag, their branch and region ids,
+        the region of their branch, and the ids of the branches they can
+        see, in line with `BranchViewSet.get_queryset`. `branch_ids` is
+        None when every branch is visible.
+    """
+    branch_region_id = None
+    if user.branch_id:
+        branch_region_id = Branch.objects.filter(
+            pk=user.branch_id
+        ).values_list('region_id', flat=True).first()
+
+    branch_ids = None
+    if user.role == 'region_manager' and user.region_id:
+        branch_ids = list(Branch.objects.filter(
+            region_id=user.region_id
+        ).values_list('pk', flat=True))
+    elif user.role == 'branch_manager' and user.branch_id:
+        branch_ids = [user.branch_id]
+
+    return {
+        'role': user.role,
+        'is_staff': user.is_staff,
+        'branch_id': user.branch_id,
+        'region_id': user.region_id,
+        'branch_region_id': branch_region_id,
+        'branch_ids': branch_ids,
+    }
+
+
+def _store(user):
+    User = get_user_model()
+    entry = {
+        # In model order, as `from_db` expects
+        'fields': [
+            (field.attname, getattr(user, field.attname))
+            for field in User._meta.concrete_fields
+            if field.attname in CACHED_FIELDS
+        ],
+        'password_md5': get_md5_hash_password(user.password),
+        'scope': resolve_scope(user),
+    }
+    cache.set(
+        _key(user.email), entry,
+        timeout=getattr(settings, 'USER_SCOPE_CACHE_TIMEOUT', 300)
+    )
+    return entry
+
+
+def get_user(email):
+    """
+    Returns the active `User` with the given email, from the cache when
+    possible. The user comes with its resolved scope and the MD5 of its
+    password hash (`password_md5`) attached.
+
+    Raises:
+        User.DoesNotExist: If there is no such user.
+    """
+    entry = cache.get(_key(email))
+    if entry is None:
+        entry = _store(get_user_model().objects.get(email=email))
+
+    names = [name for name, _ in entry['fields']]
+    values = [value for _, value in entry['fields']]
+    user = get_user_model().from_db(DEFAULT_DB_ALIAS, names, values)
+    user._scope = entry['scope']
+    user.password_md5 = entry['password_md5']
+    return user
+
+
+def get_scope(user):
+    """
+    Returns the resolved scope of a user (see `resolve_scope`).
+
+    Users authenticated by `CachedJWTAuthentication` already carry their
+    scope; for others it is read from, or stored in, the cache once per
+    request.
+    """
+    scope = getattr(user, '_scope', None)
+    if scope is None:
+        entry = cache.get(_key(user.email)) or _store(user)
+        scope = user._scope = entry['scope']
+    return scope
+
+
+def invalidate_user(*emails):
+    """
+    Drops the cached entries for the given email addresses.
+    """
+    cache.delete_many([_key(email) for email in emails if email])
+
+
+def invalidate_all():
+    """
+    Expires every cached user scope.
+    """
+    cache.add(VERSION_KEY, 0, timeout=None)
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
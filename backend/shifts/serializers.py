@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.conf import settings
 from django.db import IntegrityError
 
+from . import avatars, metrics
 from .models import *
 
 
@@ -24,7 +26,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         # Add custom claims
         token['email'] = user.email
         token['role'] = user.role
-        token['branch_id'] = user.branch.id if user.branch else None
+        token['branch_id'] = user.branch_id
         token['id'] = user.id 
         return token
 
@@ -160,6 +162,102 @@ class ManagerRegistrationSerializer(serializers.ModelSerializer):
             )
 
 
+class SparseFieldsMixin:
+    """
+    Lets clients choose which fields a serializer returns.
+
+    The root serializer reads the selection from the `fields` and `expand`
+    keyword arguments or, for GET requests, from the `?fields=` and
+    `?expand=` query parameters. Both take comma-separated names, using
+    dots to reach into nested serializers (e.g. `claims.status`):
+
+    - `fields` limits the output to the listed fields. A nested serializer
+      with no dotted entries of its own returns all of its fields.
+    - `expand` lists which of the serializer's `Meta.expandable_fields`
+      (its nested details) to include. When neither parameter is given all
+      of them are included, as before.
+    """
+    def __init__(self, *args, **kwargs):
+        self._requested_fields = self._split(kwargs.pop('fields', None))
+        self._requested_expand = self._split(kwargs.pop('expand', None))
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def _split(value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = value.split(',')
+        return {name.strip() for name in value if name.strip()}
+
+    def get_sparse_selection(self):
+        """
+        Returns the (fields, expand) selection made on the root serializer.
+        Either may be None when it was not given.
+        """
+        root = self.root
+        if isinstance(root, serializers.ListSerializer):
+            root = root.child
+        requested = getattr(root, '_requested_fields', None)
+        expand = getattr(root, '_requested_expand', None)
+        request = self.context.get('request')
+        if request is not None and request.method == 'GET':
+            if requested is None:
+                requested = self._split(request.query_params.get('fields'))
+            if expand is None:
+                expand = self._split(request.query_params.get('expand'))
+        return requested, expand
+
+    def get_sparse_path(self):
+        """
+        Returns the dotted path of this serializer from the root, with a
+        trailing dot (an empty string for the root itself).
+        """
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return ''.join(f'{name}.' for name in reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self.get_sparse_selection()
+        if requested is None and expand is None:
+            return fields
+
+        path = self.get_sparse_path()
+
+        def names_at_path(selection):
+            return {
+                name[len(path):].split('.')[0]
+                for name in selection if name.startswith(path)
+            }
+
+        expandable = set(getattr(self.Meta, 'expandable_fields', []))
+        expanded = names_at_path(expand) if expand is not None else set()
+        keep = set(fields)
+        if requested is not None and names_at_path(requested):
+            keep = names_at_path(requested) | (expanded & expandable)
+        elif expand is not None:
+            keep -= expandable - expanded
+
+        return {
+            name: field for name, field in fields.items() if name in keep
+        }
+
+
+class TimedRepresentationMixin:
+    """
+    Counts the time spent representing instances towards the request's
+    serializer time, see `shifts.metrics`.
+    """
+    def to_representation(self, instance):
+        with metrics.serializing():
+            return super().to_representation(instance)
+
+
 class RegionSerializer(serializers.ModelSerializer):
     """
     Serializes Region model instances into a JSON format.
@@ -189,7 +287,9 @@ class BranchSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(
+    TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Serializes User model instances for read-only purposes.
 
@@ -200,8 +300,13 @@ class UserSerializer(serializers.ModelSerializer):
     Attributes:
         branch (BranchSerializer):
         A nested serializer to represent the user's branch details.
+        avatar (str): URL of the largest avatar rendition, for profiles.
+        avatar_thumbnail (str): URL of the smallest avatar rendition, for
+        staff lists.
     """
     branch = BranchSerializer(read_only=True)
+    avatar = serializers.SerializerMethodField()
+    avatar_thumbnail = serializers.SerializerMethodField()
 
     class Meta:
         """
@@ -210,16 +315,29 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = [
             'id', 'email', 'first_name', 'last_name', 'role', 'branch',
-            'region'
+            'region', 'avatar', 'avatar_thumbnail'
         ]
         read_only_fields = ('email', 'role', 'branch', 'region')
 
+    def get_avatar(self, obj):
+        return avatars.avatar_url(obj.avatar.name, max(settings.AVATAR_SIZES))
+
+    def get_avatar_thumbnail(self, obj):
+        return avatars.avatar_url(obj.avatar.name, min(settings.AVATAR_SIZES))
+
 
 class UserAvatarSerializer(serializers.ModelSerializer):
     """
-    Serializes user avatar 
+    Serializes user avatar uploads.
+
+    The upload is checked against the size limits before being decoded
+    and stored as is. Its WebP renditions are produced by the
+    `process_avatar` job, named in `pending`, which switches the user over
+    to them; until then the user keeps their current avatar. An image
+    that has been uploaded before is used straight away.
     """
-    avatar = serializers.ImageField(required=True)
+    avatar = serializers.FileField(required=True)
+    pending = ''
 
     class Meta:
         """
@@ -228,6 +346,19 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ['avatar']
 
+    def validate_avatar(self, value):
+        avatars.validate_upload(value)
+        return value
+
+    def update(self, instance, validated_data):
+        name = avatars.store_upload(validated_data['avatar'])
+        if avatars.missing_renditions(name):
+            self.pending = name
+        else:
+            instance.avatar.name = name
+            instance.save(update_fields=['avatar'])
+        return instance
+
 
 class PasswordChangeSerializer(serializers.Serializer):
     current_password = serializers.CharField(required=True)
@@ -266,7 +397,9 @@ class InvitationSerializer(serializers.ModelSerializer):
         read_only_fields = ['is_used', 'created_at']
 
 
-class ShiftClaimSerializer(serializers.ModelSerializer):
+class ShiftClaimSerializer(
+    TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Serializes ShiftClaim model instances.
     """
@@ -280,9 +413,12 @@ class ShiftClaimSerializer(serializers.ModelSerializer):
         model = ShiftClaim
         fields = ['id', 'shift', 'user', 'status', 'created_at']
         read_only_fields = ['user', 'status', 'created_at']
+        expandable_fields = ['user']
 
 
-class ShiftSerializer(serializers.ModelSerializer):
+class ShiftSerializer(
+    TimedRepresentationMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """
     Serializes Shift model instances for API operations.
 
@@ -316,6 +452,110 @@ class ShiftSerializer(serializers.ModelSerializer):
             'assigned_to', 'assigned_to_details', 'claims'
         ]
         read_only_fields = ['status', 'posted_by', 'assigned_to', 'claims']
+        expandable_fields = [
+            'branch_details', 'posted_by_details', 'assigned_to_details',
+            'claims'
+        ]
+
+
+class RecurringShiftSerializer(serializers.ModelSerializer):
+    """
+    Serializes recurring shift patterns.
+    """
+    class Meta:
+        """
+        Meta options for the RecurringShiftSerializer.
+        """
+        model = RecurringShift
+        fields = [
+            'id', 'branch', 'posted_by', 'role', 'description', 'start_time',
+            'end_time', 'frequency', 'interval', 'weekdays', 'starts_on',
+            'ends_on', 'materialized_until', 'created_at', 'updated_at',
+        ]
+        read_only_fields = [
+            'posted_by', 'materialized_until', 'created_at', 'updated_at',
+        ]
+
+    def validate_interval(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Must be at least 1.")
+        return value
+
+    def validate_weekdays(self, value):
+        if not isinstance(value, list) or not all(
+            isinstance(day, int) and 0 <= day <= 6 for day in value
+        ):
+            raise serializers.ValidationError(
+                "Must be a list of weekday numbers from 0 (Monday) to 6."
+            )
+        return sorted(set(value))
+
+    def validate(self, data):
+        def value(name):
+            if name in data:
+                return data[name]
+            return getattr(self.instance, name, None)
+
+        if value('start_time') == value('end_time'):
+            raise serializers.ValidationError(
+                {"end_time": "The shift must end after it starts."}
+            )
+        ends_on = value('ends_on')
+        if ends_on is not None and ends_on < value('starts_on'):
+            raise serializers.ValidationError(
+                {"ends_on": "The pattern must end on or after it starts."}
+            )
+        return data
+
+
+class ShiftBulkCreateSerializer(serializers.Serializer):
+    """
+    Validates a single row of a bulk shift creation request.
+
+    The branch is accepted as a plain ID so that all rows can be resolved
+    with one batched lookup in the view instead of a query per row.
+    """
+    branch = serializers.IntegerField()
+    start_time = serializers.DateTimeField()
+    end_time = serializers.DateTimeField()
+    role = serializers.CharField(max_length=100)
+    description = serializers.CharField(required=False, allow_blank=True)
+
+    def validate(self, data):
+        if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError(
+                {"end_time": "The shift must end after it starts."}
+            )
+        return data
+
+
+class ShiftBulkStatusSerializer(serializers.Serializer):
+    """
+    Validates a single row of a bulk shift status update request.
+    """
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=Shift.SHIFT_STATUS_CHOICES)
+
+
+class ClaimDecisionSerializer(serializers.Serializer):
+    """
+    Validates a single decision of a batch claim approval request.
+    """
+    id = serializers.IntegerField()
+    decision = serializers.ChoiceField(choices=['approve', 'decline'])
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializes a background job's progress for status polling.
+    """
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'result',
+            'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
 
 
 class AnalyticsSerializer(serializers.Serializer):
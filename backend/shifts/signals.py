@@ -0,0 +1,168 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import cache as analytics_cache, conditional, scopes
+from .models import (
+    Branch, Region, User, Shift, ShiftClaim, DailyShiftStat, Tombstone
+)
+
+
+def invalidate_analytics(*branch_ids):
+    """
+    Expires cached analytics for the given branches once the current
+    transaction commits, so a concurrent request cannot re-cache data that
+    is about to change.
+    """
+    branches = list(
+        Branch.objects.filter(pk__in=set(branch_ids)).values_list(
+            'pk', 'region_id'
+        )
+    )
+
+    def invalidate():
+        for branch_id, region_id in branches:
+            analytics_cache.invalidate_branch(branch_id, region_id)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(pre_save, sender=Shift)
+def remember_stat_key(sender, instance, raw=False, **kwargs):
+    """
+    Records which rollup row an existing shift was counted in before it is
+    saved, so a change of branch, day or status can be moved across.
+    """
+    instance._previous_stat_key = None
+    if raw or instance.pk is None:
+        return
+    previous = Shift.objects.filter(pk=instance.pk).only(
+        'branch_id', 'start_time', 'status'
+    ).first()
+    if previous is not None:
+        instance._previous_stat_key = DailyShiftStat.key_for(previous)
+
+
+@receiver(post_save, sender=Shift)
+def update_stats_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Keeps the DailyShiftStat rollup in step with a created or edited shift.
+    """
+    if raw:
+        return
+    previous_key = getattr(instance, '_previous_stat_key', None)
+    key = DailyShiftStat.key_for(instance)
+    if previous_key == key:
+        return
+    if previous_key is not None:
+        DailyShiftStat.objects.adjust(*previous_key, -1)
+    DailyShiftStat.objects.adjust(*key, 1)
+    invalidate_analytics(
+        instance.branch_id, *(previous_key[:1] if previous_key else ())
+    )
+
+
+@receiver(post_delete, sender=Shift)
+def update_stats_on_delete(sender, instance, **kwargs):
+    """
+    Removes a deleted shift from the DailyShiftStat rollup.
+    """
+    DailyShiftStat.objects.adjust(*DailyShiftStat.key_for(instance), -1)
+    invalidate_analytics(instance.branch_id)
+    Tombstone.objects.create(
+        kind='shift', object_id=instance.pk, branch_id=instance.branch_id,
+        region_id=Branch.objects.filter(pk=instance.branch_id).values_list(
+            'region_id', flat=True
+        ).first()
+    )
+
+
+@receiver(post_delete, sender=ShiftClaim)
+def record_claim_deletion(sender, instance, **kwargs):
+    """
+    Leaves a tombstone for a deleted claim so delta sync clients drop it.
+
+    Claims deleted along with their shift are recorded too; the shift row
+    is still present at this point, as dependents are deleted first.
+    """
+    scope = Shift.objects.filter(pk=instance.shift_id).values_list(
+        'branch_id', 'branch__region_id'
+    ).first()
+    if scope is not None:
+        Tombstone.objects.create(
+            kind='claim', object_id=instance.pk,
+            branch_id=scope[0], region_id=scope[1]
+        )
+
+
+def sync_stats(previous_keys, keys):
+    """
+    Applies a batch of shift changes made without model signals (e.g. via
+    `bulk_create` or `bulk_update`) to the DailyShiftStat rollup.
+
+    Args:
+        previous_keys (iterable): Rollup keys the shifts were counted in
+            before the change (empty for newly created shifts).
+        keys (iterable): Rollup keys the shifts are counted in afterwards
+            (empty for deleted shifts).
+    """
+    deltas = Counter(keys)
+    deltas.subtract(Counter(previous_keys))
+    changed = {key: delta for key, delta in deltas.items() if delta}
+    if changed:
+        DailyShiftStat.objects.adjust_many(changed)
+        invalidate_analytics(*(branch_id for branch_id, _, _ in changed))
+
+
+@receiver(pre_save, sender=User)
+def remember_email(sender, instance, raw=False, **kwargs):
+    """
+    Records an existing user's stored email before it is saved, so the
+    scope cached under the old address can be dropped if it changes.
+    """
+    instance._previous_email = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_email = User.objects.filter(
+        pk=instance.pk
+    ).values_list('email', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_scope(sender, instance, **kwargs):
+    """
+    Drops a user's cached scope once their row changes, e.g. a new role,
+    branch or region.
+    """
+    scopes.invalidate_user(
+        instance.email, getattr(instance, '_previous_email', None)
+    )
+
+
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+@receiver(post_delete, sender=Region)
+def invalidate_all_scopes(sender, **kwargs):
+    """
+    Expires every cached user scope when branches or regions change, as
+    that can change which branches users belong to or can see.
+    """
+    scopes.invalidate_all()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Branch)
+@receiver(post_delete, sender=Branch)
+@receiver(post_save, sender=Region)
+@receiver(post_delete, sender=Region)
+def touch_conditional_validators(sender, **kwargs):
+    """
+    Moves every list's ETag and Last-Modified on once a user, branch or
+    region change commits, as their names and avatars are embedded in the
+    responses.
+    """
+    transaction.on_commit(conditional.touch_nested)
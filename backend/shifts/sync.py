@@ -0,0 +1,162 @@
+"""
+Delta sync of shifts and claims for offline-capable clients.
+
+A client keeps a local copy of its rota and sends back the token it was
+last given. Only the shifts and claims whose `updated_at` is at or after
+that point, and the tombstones of rows deleted since, are read and
+returned, so the work done per sync grows with the number of changes
+rather than the size of the rota.
+
+Each response carries at most `SHIFT_SYNC_PAGE_SIZE` shifts, claims and
+deletions. When there are more, `has_more` is set and the token resumes
+from the last `(updated_at, id)` returned of each kind; the client keeps
+syncing until `has_more` is false, and the token it then holds is for the
+moment the first page was read.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from . import fast_lists
+
+TOKEN_SALT = 'shifts.sync'
+
+
+class InvalidToken(Exception):
+    """
+    Raised when a sync token was not issued by this server.
+    """
+
+
+def make_token(moment, resume=None):
+    """
+    Returns an opaque, signed sync token for a point in time or, with
+    `resume`, for the next page of a sync started at that point.
+    """
+    data = {'at': moment.isoformat()}
+    if resume is not None:
+        data['resume'] = resume
+    return signing.dumps(data, salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """
+    Returns the point in time a sync token was issued for and, for a
+    token from a page with more to follow, where to resume.
+
+    Raises:
+        InvalidToken: If the token is malformed or has been tampered with.
+    """
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+        # Tokens issued before responses were paged are bare timestamps
+        if isinstance(data, str):
+            data = {'at': data}
+        return datetime.fromisoformat(data['at']), data.get('resume')
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken('Invalid sync token.')
+
+
+def read_page(queryset, field, after, values):
+    """
+    Reads the next page of rows ordered by `(field, id)`, starting after
+    the `[field, id]` position `after`.
+
+    Returns:
+        tuple: The rows, the position of the last one (`after` if there
+        are none) and whether more rows follow.
+    """
+    if after is not None:
+        moment, pk = datetime.fromisoformat(after[0]), after[1]
+        queryset = queryset.filter(
+            Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+        )
+    limit = settings.SHIFT_SYNC_PAGE_SIZE
+    rows = list(
+        queryset.order_by(field, 'id').values(*values, field)[:limit + 1]
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        after = [rows[-1][field].isoformat(), rows[-1]['id']]
+    return rows, after, more
+
+
+def collect_changes(shifts, claims, tombstones, token=None):
+    """
+    Collects what changed since a sync token, one page at a time.
+
+    Rows are re-read from `SHIFT_SYNC_OVERLAP_SECONDS` before the token so
+    that changes committed by slower transactions are not missed; clients
+    upsert by id, so seeing a row twice is harmless. Without a token, or
+    with one older than the tombstone retention period, a full snapshot is
+    returned with `reset` set on its first page so the client replaces its
+    local copy.
+
+    Args:
+        shifts (QuerySet): The shifts in the caller's scope.
+        claims (QuerySet): The claims on those shifts.
+        tombstones (QuerySet): Tombstones in the caller's scope.
+        token (str): The token from the client's previous sync, if any.
+
+    Returns:
+        dict: The changed shifts and claims, the ids of deleted ones, the
+        token to send next time and whether more pages follow.
+
+    Raises:
+        InvalidToken: If the token cannot be read.
+    """
+    now = timezone.now()
+    moment, resume = read_token(token) if token else (None, None)
+    if resume is None:
+        started, after = now, {}
+        retention = timedelta(days=settings.SHIFT_SYNC_RETENTION_DAYS)
+        reset = moment is None or moment < now - retention
+        since = None if reset else moment
+    else:
+        started, after, reset = moment, resume.get('after', {}), False
+        since = resume.get('since') and datetime.fromisoformat(
+            resume['since']
+        )
+
+    deleted = {'shifts': [], 'claims': []}
+    deleted_more = False
+    if since is not None:
+        overlap = since - timedelta(
+            seconds=settings.SHIFT_SYNC_OVERLAP_SECONDS
+        )
+        shifts = shifts.filter(updated_at__gte=overlap)
+        claims = claims.filter(updated_at__gte=overlap)
+        rows, after['deleted'], deleted_more = read_page(
+            tombstones.filter(deleted_at__gte=overlap), 'deleted_at',
+            after.get('deleted'), ('id', 'kind', 'object_id')
+        )
+        for row in rows:
+            deleted[f"{row['kind']}s"].append(row['object_id'])
+
+    shift_rows, after['shifts'], shifts_more = read_page(
+        shifts, 'updated_at', after.get('shifts'), fast_lists.SHIFT_VALUES
+    )
+    claim_rows, after['claims'], claims_more = read_page(
+        claims, 'updated_at', after.get('claims'), fast_lists.CLAIM_VALUES
+    )
+
+    has_more = shifts_more or claims_more or deleted_more
+    if has_more:
+        token = make_token(started, {
+            'since': since and since.isoformat(),
+            'after': after,
+        })
+    else:
+        token = make_token(started)
+    return {
+        'token': token,
+        'reset': reset,
+        'has_more': has_more,
+        'shifts': fast_lists.serialize_shifts(shift_rows),
+        'claims': fast_lists.serialize_claims(claim_rows),
+        'deleted': deleted,
+    }
@@ -0,0 +1,116 @@
+"""
+Background tasks run by the `shifts.jobs` queue.
+"""
+import io
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.mail import send_mail
+
+from . import avatars, recurrence
+from . import cache as analytics_cache
+from .importers import PARSERS, RotaImporter
+from .jobs import task
+from .models import (
+    Branch, DailyShiftStat, Invitation, RecurringShift, User
+)
+
+
+@task(max_attempts=5)
+def send_invitation_email(invitation_id):
+    """
+    Emails an invitation link to the person being invited.
+    """
+    invitation = Invitation.objects.select_related('branch').get(
+        pk=invitation_id
+    )
+    if invitation.is_used:
+        return {'sent': False}
+
+    link = settings.INVITATION_URL.format(token=invitation.token)
+    send_mail(
+        subject=f"You're invited to join {invitation.branch.name}",
+        message=(
+            f"Hi {invitation.first_name or 'there'},\n\n"
+            f"You have been invited to join {invitation.branch.name}. "
+            f"Register using the link below:\n\n{link}\n"
+        ),
+        from_email=None,
+        recipient_list=[invitation.email],
+    )
+    return {'sent': True}
+
+
+@task()
+def process_avatar(user_id, previous='', avatar=''):
+    """
+    Renders an uploaded avatar, if it is not rendered yet, and switches the
+    user over to it. The renditions it replaced are then deleted, unless
+    another user has uploaded the same image.
+    """
+    replaced = {previous}
+    if avatar:
+        avatars.render_avatar(avatar)
+        user = User.objects.select_for_update().filter(pk=user_id).first()
+        if user is not None:
+            replaced.add(user.avatar.name)
+            user.avatar.name = avatar
+            # Saved rather than updated, so the signal handlers drop the
+            # user's cached scope
+            user.save(update_fields=['avatar'])
+
+    current = User.objects.filter(pk=user_id).values_list(
+        'avatar', flat=True
+    ).first()
+    deleted = [
+        name for name in replaced
+        if name and name != current
+        and not User.objects.filter(avatar=name).exists()
+    ]
+    for name in deleted:
+        avatars.delete_avatar(name)
+    return {'avatar': current, 'deleted': bool(deleted)}
+
+
+@task(max_attempts=1, atomic=False)
+def import_rota(path, fmt, user_id, branch_ids):
+    """
+    Imports an uploaded rota file saved to storage by the import endpoint,
+    deleting the file afterwards. The importer commits batch by batch.
+    """
+    try:
+        importer = RotaImporter(
+            User.objects.get(pk=user_id),
+            branches=Branch.objects.filter(pk__in=branch_ids)
+        )
+        with default_storage.open(path, 'rb') as upload:
+            stream = io.TextIOWrapper(
+                upload, encoding='utf-8-sig', newline=''
+            )
+            return importer.run(PARSERS[fmt](stream))
+    finally:
+        default_storage.delete(path)
+
+
+@task(max_attempts=1)
+def rebuild_shift_stats():
+    """
+    Rebuilds the DailyShiftStat rollup table and expires cached analytics.
+    """
+    written = DailyShiftStat.objects.rebuild()
+    analytics_cache.invalidate_all()
+    return {'rows': written}
+
+
+@task()
+def materialize_recurring_shifts(template_id=None):
+    """
+    Writes the occurrences of recurring shifts within the rolling window
+    as shifts, for one pattern or for every pattern that is due.
+    """
+    if template_id is None:
+        return recurrence.materialize_due()
+    template = RecurringShift.objects.filter(pk=template_id).first()
+    if template is None:
+        return {'templates': 0, 'created': 0}
+    return {'templates': 1, 'created': len(recurrence.materialize(template))}
@@ -1,3 +1,2075 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    Region, Branch, User, Shift, ShiftClaim, DailyShiftStat, Tombstone, Job,
+    RecurringShift
+)
+from . import (
+    benchmarks, fast_lists, jobs, metrics, recurrence, scopes, sync
+)
+from .intervals import IntervalIndex
+from .matching import ShiftMatcher, week_of
+from .middleware import JWTAuthMiddleware
+from .pagination import ShiftCursorPagination
+from .renderers import FastJSONRenderer
+from .routing import websocket_urlpatterns
+from .serializers import ShiftSerializer, ShiftClaimSerializer
+
+
+class ShiftTestCase(TestCase):
+    """
+    Base test case that builds a small region with a couple of branches,
+    a manager at each level and a pool of employees.
+    """
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.create(name="London")
+        self.branch = Branch.objects.create(
+            name="Kilburn High Road", region=self.region
+        )
+        self.other_branch = Branch.objects.create(
+            name="Camden Town", region=self.region
+        )
+        self.head_office = User.objects.create_user(
+            email="head@example.com", password="pass",
+            first_name="Head", last_name="Office", role="head_office"
+        )
+        self.manager = User.objects.create_user(
+            email="manager@example.com", password="pass",
+            first_name="Branch", last_name="Manager",
+            role="branch_manager", branch=self.branch
+        )
+        self.employees = [
+            User.objects.create_user(
+                email=f"employee{i}@example.com", password="pass",
+                first_name="Employee", last_name=str(i),
+                role="employee", branch=self.branch
+            )
+            for i in range(3)
+        ]
+        self.client = APIClient()
+
+    def create_shifts(self, count, branch=None, **kwargs):
+        """
+        Creates `count` shifts at the given branch, one day apart.
+        """
+        start = timezone.now().replace(microsecond=0)
+        return [
+            Shift.objects.create(
+                branch=branch or self.branch,
+                posted_by=self.manager,
+                start_time=start + timedelta(days=i),
+                end_time=start + timedelta(days=i, hours=8),
+                role="Cashier",
+                **kwargs
+            )
+            for i in range(count)
+        ]
+
+
+class ShiftListQueryCountTests(ShiftTestCase):
+    """
+    Ensures the shift list endpoint does not issue a query per nested object.
+    """
+    def list_query_count(self, url='/api/shifts/'):
+        self.client.force_authenticate(self.head_office)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_shifts(self):
+        for shift in self.create_shifts(5, assigned_to=self.employees[0]):
+            for employee in self.employees:
+                ShiftClaim.objects.create(shift=shift, user=employee)
+        small = self.list_query_count()
+
+        for shift in self.create_shifts(20, branch=self.other_branch):
+            ShiftClaim.objects.create(shift=shift, user=self.employees[1])
+        large = self.list_query_count()
+
+        self.assertLessEqual(large, 5)
+        self.assertEqual(small, large)
+
+    def test_claim_list_query_count_is_bounded(self):
+        for shift in self.create_shifts(10):
+            for employee in self.employees:
+                ShiftClaim.objects.create(shift=shift, user=employee)
+        self.assertLessEqual(self.list_query_count('/api/claims/'), 4)
+
+
+class CursorPaginationTests(ShiftTestCase):
+    """
+    Ensures the list endpoints are paginated with stable cursors.
+    """
+    def test_shifts_are_paged_in_start_time_order(self):
+        shifts = self.create_shifts(5)
+        self.client.force_authenticate(self.head_office)
+
+        seen = []
+        url = '/api/shifts/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            self.assertNotIn('count', response.data)
+            seen.extend(shift['id'] for shift in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(seen, [shift.id for shift in shifts])
+
+    def test_shared_start_times_are_paged_without_offsets(self):
+        start = timezone.now().replace(microsecond=0)
+        shifts = [
+            Shift.objects.create(
+                branch=self.branch, posted_by=self.manager, role='Cashier',
+                start_time=start, end_time=start + timedelta(hours=8),
+            )
+            for _ in range(7)
+        ]
+        self.client.force_authenticate(self.head_office)
+
+        seen, sql = [], []
+        url = '/api/shifts/?page_size=3'
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            sql += [query['sql'] for query in context.captured_queries]
+            seen.extend(shift['id'] for shift in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [shift.id for shift in shifts])
+        self.assertFalse([query for query in sql if 'OFFSET' in query])
+
+        # And back again from the last page
+        url = response.data['previous']
+        response = self.client.get(url)
+        self.assertEqual(
+            [shift['id'] for shift in response.data['results']],
+            [shift.id for shift in shifts[3:6]]
+        )
+
+    def test_page_size_is_capped(self):
+        self.create_shifts(3)
+        self.client.force_authenticate(self.head_office)
+        with mock.patch.object(ShiftCursorPagination, 'max_page_size', 2):
+            response = self.client.get('/api/shifts/?page_size=100')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+
+class AnalyticsPeriodFilterTests(ShiftTestCase):
+    """
+    Ensures the timeline's year/month filters select the right shifts.
+    """
+    def setUp(self):
+        super().setUp()
+        for start in [
+            datetime(2024, 12, 31, 23, tzinfo=dt_timezone.utc),
+            datetime(2025, 1, 1, 9, tzinfo=dt_timezone.utc),
+            datetime(2025, 1, 31, 23, tzinfo=dt_timezone.utc),
+            datetime(2025, 2, 1, 0, tzinfo=dt_timezone.utc),
+        ]:
+            Shift.objects.create(
+                branch=self.branch, posted_by=self.manager, role="Cashier",
+                start_time=start, end_time=start + timedelta(hours=8)
+            )
+        self.client.force_authenticate(self.head_office)
+
+    def timeline_total(self, query):
+        response = self.client.get(
+            f'/api/analytics/all-shifts-timeline/?{query}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return sum(day.get('open', 0) for day in response.data)
+
+    def test_year_and_month_range(self):
+        self.assertEqual(self.timeline_total('year=2025&month=1'), 2)
+        self.assertEqual(self.timeline_total('year=2025'), 3)
+        self.assertEqual(self.timeline_total('year=2024&month=12'), 1)
+        self.assertEqual(self.timeline_total('month=1'), 2)
+
+    def test_invalid_period_is_rejected(self):
+        for query in ('year=2025&month=13', 'year=9999', 'year=0',
+                      'year=10000&month=1'):
+            # The timeline filters dates, time to fill datetimes
+            for action in ('all-shifts-timeline', 'time-to-fill'):
+                response = self.client.get(
+                    f'/api/analytics/{action}/?{query}'
+                )
+                self.assertEqual(response.status_code, 400, query)
+
+
+class AnalyticsSummaryTests(ShiftTestCase):
+    """
+    Ensures the analytics summary computes every metric per branch and
+    period in a single query.
+    """
+    url = '/api/analytics/summary/'
+
+    def setUp(self):
+        super().setUp()
+        start = datetime(2025, 1, 6, 9, tzinfo=dt_timezone.utc)
+        self.open, self.claimed, self.filled = [
+            Shift.objects.create(
+                branch=self.branch, posted_by=self.manager, role="Cashier",
+                start_time=start + timedelta(days=i),
+                end_time=start + timedelta(days=i, hours=8),
+                status=status
+            )
+            for i, status in enumerate(['open', 'open', 'filled'])
+        ]
+        Shift.objects.create(
+            branch=self.other_branch, posted_by=self.manager, role="Cashier",
+            start_time=start + timedelta(days=30),
+            end_time=start + timedelta(days=30, hours=6),
+        )
+        for employee in self.employees[:2]:
+            ShiftClaim.objects.create(shift=self.open, user=employee)
+        claim = ShiftClaim.objects.create(
+            shift=self.claimed, user=self.employees[2]
+        )
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(f'/api/claims/{claim.pk}/approve/')
+        self.assertEqual(response.status_code, 200)
+        ShiftClaim.objects.filter(pk=claim.pk).update(
+            created_at=start - timedelta(hours=3),
+            decided_at=start - timedelta(hours=1),
+        )
+        self.client.force_authenticate(self.head_office)
+
+    def test_metrics_per_branch_and_month(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'{self.url}?year=2025')
+        self.assertEqual(response.status_code, 200)
+        # One query for the conditional GET validators, one for the data
+        self.assertEqual(len(context.captured_queries), 2)
+
+        kilburn, camden = response.data
+        self.assertEqual(str(kilburn['period']), '2025-01-01')
+        self.assertEqual(kilburn['branch_id'], self.branch.pk)
+        self.assertEqual(
+            [kilburn[key] for key in ('total', 'open', 'claimed', 'filled')],
+            [3, 1, 1, 1]
+        )
+        self.assertEqual(kilburn['fill_rate'], 0.6667)
+        self.assertEqual(kilburn['claims_per_shift'], 1.0)
+        self.assertEqual(kilburn['avg_time_to_fill_hours'], 2.0)
+        self.assertEqual(kilburn['hours_covered'], 16.0)
+
+        self.assertEqual(str(camden['period']), '2025-02-01')
+        self.assertEqual(camden['fill_rate'], 0)
+        self.assertIsNone(camden['avg_time_to_fill_hours'])
+
+    def test_granularity_and_scope(self):
+        response = self.client.get(f'{self.url}?granularity=day&month=1')
+        self.assertEqual(
+            [row['total'] for row in response.data], [1, 1, 1]
+        )
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(f'{self.url}?granularity=week')
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(str(response.data[0]['period']), '2025-01-06')
+
+        response = self.client.get(f'{self.url}?granularity=year')
+        self.assertEqual(response.status_code, 400)
+
+
+class FillTimeTests(ShiftTestCase):
+    """
+    Ensures claim and shift transitions are timestamped and summarised as
+    per-branch funnels and time-to-fill percentiles.
+    """
+    url = '/api/analytics/time-to-fill/'
+
+    def test_transitions_are_timestamped(self):
+        shift, other = self.create_shifts(2)
+        self.assertIsNotNone(shift.created_at)
+        for employee in self.employees[:2]:
+            self.client.force_authenticate(employee)
+            response = self.client.post(f'/api/shifts/{shift.pk}/claim/')
+            self.assertEqual(response.status_code, 201)
+        first, second = ShiftClaim.objects.filter(shift=shift).order_by('pk')
+        shift.refresh_from_db()
+        self.assertEqual(shift.first_claimed_at, first.created_at)
+        # The write moves the shift's ETag and delta sync cursor on
+        self.assertGreaterEqual(shift.updated_at, first.created_at)
+
+        self.client.force_authenticate(self.manager)
+        self.client.post(f'/api/claims/{first.pk}/approve/')
+        shift.refresh_from_db()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNotNone(shift.filled_at)
+        self.assertEqual(first.decided_at, shift.filled_at)
+        self.assertEqual(second.decided_at, shift.filled_at)
+
+        for status, filled in [('filled', True), ('open', False)]:
+            response = self.client.post(
+                '/api/shifts/bulk_update/',
+                [{'id': other.pk, 'status': status}], format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            other.refresh_from_db()
+            self.assertEqual(other.filled_at is not None, filled)
+
+    def test_funnel_and_percentiles_per_branch(self):
+        posted = datetime(2025, 1, 1, 9, tzinfo=dt_timezone.utc)
+        shifts = self.create_shifts(10)
+        for hours, shift in enumerate(shifts, start=1):
+            Shift.objects.filter(pk=shift.pk).update(
+                created_at=posted,
+                first_claimed_at=posted + timedelta(hours=hours),
+                filled_at=(
+                    posted + timedelta(hours=2 * hours) if hours <= 4
+                    else None
+                ),
+                status='claimed' if hours <= 4 else 'open',
+            )
+            ShiftClaim.objects.create(
+                shift=shift, user=self.employees[0],
+                status='approved' if hours <= 4 else 'pending'
+            )
+        self.create_shifts(1, branch=self.other_branch)
+
+        self.client.force_authenticate(self.head_office)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        camden, kilburn = response.data
+
+        self.assertEqual(kilburn['funnel'], {
+            'shifts': 10, 'claimed': 10, 'filled': 4, 'claims_made': 10,
+            'approved': 4, 'declined': 0, 'pending': 6,
+        })
+        self.assertEqual(kilburn['time_to_first_claim_hours'], {
+            'count': 10, 'p50': 5.0, 'p90': 9.0, 'p95': 10.0,
+        })
+        self.assertEqual(kilburn['time_to_fill_hours'], {
+            'count': 4, 'p50': 4.0, 'p90': 8.0, 'p95': 8.0,
+        })
+        self.assertEqual(camden['funnel']['shifts'], 1)
+        self.assertEqual(camden['time_to_fill_hours']['count'], 0)
+        self.assertIsNone(camden['time_to_fill_hours']['p50'])
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [row['branch_id'] for row in response.data], [self.branch.pk]
+        )
+
+
+class DailyShiftStatTests(ShiftTestCase):
+    """
+    Ensures the rollup table follows shift changes and can be rebuilt.
+    """
+    def assertNoDrift(self):
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+    def test_rollup_follows_create_update_and_delete(self):
+        shifts = self.create_shifts(3)
+        self.assertNoDrift()
+
+        shifts[0].status = 'claimed'
+        shifts[0].save()
+        shifts[1].branch = self.other_branch
+        shifts[1].start_time += timedelta(days=10)
+        shifts[1].save()
+        self.assertNoDrift()
+
+        shifts[2].delete()
+        self.assertNoDrift()
+
+        self.other_branch.delete()
+        self.assertNoDrift()
+
+    def test_rebuild_command_fixes_drift(self):
+        self.create_shifts(2)
+        DailyShiftStat.objects.update(count=F('count') + 5)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_shift_stats', '--check', stdout=StringIO())
+        call_command('rebuild_shift_stats', stdout=StringIO())
+        self.assertNoDrift()
+
+
+class AnalyticsCacheTests(ShiftTestCase):
+    """
+    Ensures analytics responses are cached per scope and expire on change.
+    """
+    url = '/api/analytics/all_shifts_by_branch/'
+
+    def get(self, user, query=''):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'{self.url}?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_repeat_requests_are_served_from_cache(self):
+        self.create_shifts(2)
+        self.assertEqual(self.get(self.manager)['X-Cache'], 'MISS')
+        response = self.get(self.manager)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data[0]['value'], 2)
+
+        # Different scopes never share an entry
+        self.assertEqual(self.get(self.head_office)['X-Cache'], 'MISS')
+
+        self.client.force_authenticate(self.head_office)
+        stats = self.client.get('/api/analytics/cache-stats/').data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_shift_changes_invalidate_only_their_scope(self):
+        self.create_shifts(1)
+        self.get(self.manager)
+        self.get(self.head_office, f'branch_id={self.other_branch.pk}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_shifts(1)
+
+        response = self.get(self.manager)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data[0]['value'], 2)
+        response = self.get(
+            self.head_office, f'branch_id={self.other_branch.pk}'
+        )
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_cache_stats_requires_head_office(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/analytics/cache-stats/')
+        self.assertEqual(response.status_code, 403)
+
+
+class BulkShiftTests(ShiftTestCase):
+    """
+    Ensures shifts can be created and updated in bulk.
+    """
+    def row(self, day, branch=None):
+        start = datetime(2025, 3, day, 9, tzinfo=dt_timezone.utc)
+        return {
+            'branch': (branch or self.branch).pk,
+            'start_time': start.isoformat(),
+            'end_time': (start + timedelta(hours=8)).isoformat(),
+            'role': 'Cashier',
+        }
+
+    def test_bulk_create_in_bounded_queries(self):
+        self.client.force_authenticate(self.manager)
+        rows = [self.row(day) for day in range(1, 29)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                '/api/shifts/bulk_create/', rows, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 28)
+        self.assertLessEqual(len(context.captured_queries), 10)
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+    def test_bulk_create_reports_row_errors_and_writes_nothing(self):
+        self.client.force_authenticate(self.manager)
+        bad_time = dict(self.row(2), end_time=self.row(1)['start_time'])
+        rows = [self.row(1), bad_time, self.row(3, self.other_branch)]
+        response = self.client.post(
+            '/api/shifts/bulk_create/', rows, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [error['index'] for error in response.data['errors']], [1, 2]
+        )
+        self.assertFalse(Shift.objects.exists())
+
+    def test_bulk_update_status(self):
+        shifts = self.create_shifts(3)
+        self.client.force_authenticate(self.manager)
+        rows = [{'id': shift.pk, 'status': 'filled'} for shift in shifts]
+        response = self.client.post(
+            '/api/shifts/bulk_update/', rows, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 3)
+        self.assertEqual(
+            Shift.objects.filter(status='filled').count(), 3
+        )
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+    def test_bulk_reopen_clears_the_assignee(self):
+        shift, = self.create_shifts(
+            1, status='claimed', assigned_to=self.employees[0],
+            filled_at=timezone.now()
+        )
+        claim = ShiftClaim.objects.create(
+            shift=shift, user=self.employees[0], status='approved'
+        )
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(
+            '/api/shifts/bulk_update/', [{'id': shift.pk, 'status': 'open'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        shift.refresh_from_db()
+        self.assertEqual(shift.status, 'open')
+        self.assertIsNone(shift.assigned_to)
+        self.assertIsNone(shift.filled_at)
+        claim.refresh_from_db()
+        self.assertEqual(claim.status, 'declined')
+
+    def test_bulk_endpoints_require_a_manager(self):
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.post(
+            '/api/shifts/bulk_create/', [self.row(1)], format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class RotaImportTests(ShiftTestCase):
+    """
+    Ensures rotas can be imported from CSV and iCalendar files.
+    """
+    csv_rota = (
+        "branch,start_time,end_time,role,assigned_to\n"
+        "Kilburn High Road,2025-03-01T09:00:00Z,2025-03-01T17:00:00Z,"
+        "Cashier,employee0@example.com\n"
+        "kilburn high road,2025-03-02T09:00:00Z,2025-03-02T17:00:00Z,"
+        "Baker,\n"
+        "Camden Town,2025-03-03T09:00:00Z,2025-03-03T17:00:00Z,Cashier,\n"
+        "Nowhere,2025-03-04T09:00:00Z,2025-03-04T17:00:00Z,Cashier,\n"
+    )
+    ics_rota = (
+        "BEGIN:VCALENDAR\r\n"
+        "BEGIN:VEVENT\r\n"
+        "DTSTART:20250301T090000Z\r\n"
+        "DTEND:20250301T170000Z\r\n"
+        "SUMMARY:Cashier\r\n"
+        "LOCATION:Camden Town\r\n"
+        "DESCRIPTION:Covering the\r\n"
+        "  early shift\r\n"
+        "END:VEVENT\r\n"
+        "BEGIN:VEVENT\r\n"
+        "DTSTART;TZID=Europe/London:20250701T090000\r\n"
+        "DTEND;TZID=Europe/London:20250701T170000\r\n"
+        "SUMMARY:Baker\r\n"
+        "LOCATION:Kilburn High Road\r\n"
+        "ATTENDEE;CN=Employee:mailto:employee1@example.com\r\n"
+        "END:VEVENT\r\n"
+        "END:VCALENDAR\r\n"
+    )
+
+    def test_upload_csv_within_manager_scope(self):
+        self.client.force_authenticate(self.manager)
+        upload = SimpleUploadedFile('rota.csv', self.csv_rota.encode())
+        response = self.client.post(
+            '/api/shifts/import/', {'file': upload}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            [error['row'] for error in response.data['errors']], [3, 4]
+        )
+        assigned = Shift.objects.get(role='Cashier')
+        self.assertEqual(assigned.assigned_to, self.employees[0])
+        self.assertEqual(assigned.status, 'filled')
+
+    def test_impossible_dates_are_reported_not_raised(self):
+        self.client.force_authenticate(self.manager)
+        rota = (
+            "branch,start_time,end_time,role\n"
+            "Kilburn High Road,2026-02-30T09:00,2026-02-30T17:00,Cashier\n"
+            "Kilburn High Road,2026-03-02T09:00,2026-03-02T17:00,Baker\n"
+        )
+        upload = SimpleUploadedFile('rota.csv', rota.encode())
+        response = self.client.post(
+            '/api/shifts/import/', {'file': upload}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(
+            [error['row'] for error in response.data['errors']], [1]
+        )
+
+    def test_command_imports_ics_in_batches(self):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.ics', delete=False
+        ) as rota:
+            rota.write(self.ics_rota)
+        self.addCleanup(os.remove, rota.name)
+
+        out = StringIO()
+        call_command(
+            'import_rota', rota.name, '--posted-by', 'head@example.com',
+            '--batch-size', '1', stdout=out
+        )
+        self.assertIn("Imported 2 shifts", out.getvalue())
+        self.assertEqual(out.getvalue().count("Processed"), 3)
+
+        early = Shift.objects.get(role='Cashier')
+        self.assertEqual(early.branch, self.other_branch)
+        self.assertEqual(early.description, 'Covering the early shift')
+        baker = Shift.objects.get(role='Baker')
+        self.assertEqual(baker.assigned_to, self.employees[1])
+        self.assertEqual(baker.start_time.hour, 8)
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+
+class ShiftExportTests(ShiftTestCase):
+    """
+    Ensures shifts and their claims can be streamed as CSV and NDJSON.
+    """
+    def setUp(self):
+        super().setUp()
+        self.shifts = self.create_shifts(2, assigned_to=self.employees[0])
+        for employee in self.employees[:2]:
+            ShiftClaim.objects.create(shift=self.shifts[0], user=employee)
+        self.client.force_authenticate(self.manager)
+
+    def test_csv_export_has_a_row_per_claim(self):
+        response = self.client.get('/api/shifts/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = list(csv.DictReader(lines))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['assigned_to'], 'employee0@example.com')
+        self.assertEqual(
+            {row['claim_user'] for row in rows[:2]},
+            {'employee0@example.com', 'employee1@example.com'}
+        )
+        self.assertEqual(rows[2]['claim_id'], '')
+
+    def test_ndjson_export_nests_claims(self):
+        response = self.client.get('/api/shifts/export/?output=ndjson')
+        self.assertEqual(response.status_code, 200)
+        shifts = [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(
+            [shift['id'] for shift in shifts],
+            [shift.id for shift in self.shifts]
+        )
+        self.assertEqual(len(shifts[0]['claims']), 2)
+        self.assertEqual(shifts[1]['claims'], [])
+
+    def test_employees_cannot_export(self):
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.get('/api/shifts/export/')
+        self.assertEqual(response.status_code, 403)
+
+
+class ClaimApprovalTests(ShiftTestCase):
+    """
+    Ensures approving a claim assigns the shift and settles its other
+    claims.
+    """
+    def setUp(self):
+        super().setUp()
+        self.shift = self.create_shifts(1)[0]
+        self.claims = [
+            ShiftClaim.objects.create(shift=self.shift, user=employee)
+            for employee in self.employees
+        ]
+        self.client.force_authenticate(self.manager)
+
+    def approve(self, claim):
+        return self.client.post(f'/api/claims/{claim.pk}/approve/')
+
+    def test_approval_declines_competing_claims(self):
+        self.assertEqual(self.approve(self.claims[0]).status_code, 200)
+        self.shift.refresh_from_db()
+        self.assertEqual(self.shift.status, 'claimed')
+        self.assertEqual(self.shift.assigned_to, self.employees[0])
+        self.assertEqual(
+            [claim.status for claim in ShiftClaim.objects.order_by('pk')],
+            ['approved', 'declined', 'declined']
+        )
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+        response = self.approve(self.claims[1])
+        self.assertEqual(response.status_code, 409)
+
+    def test_decline_leaves_the_shift_open(self):
+        response = self.client.post(
+            f'/api/claims/{self.claims[0].pk}/decline/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.approve(self.claims[1]).status_code, 200)
+
+
+class ConcurrentClaimApprovalTests(TransactionTestCase):
+    """
+    Fires approvals for competing claims in parallel and checks that only
+    one of them wins.
+    """
+    def setUp(self):
+        cache.clear()
+        branch = Branch.objects.create(
+            name="Kilburn High Road",
+            region=Region.objects.create(name="London")
+        )
+        self.manager = User.objects.create_user(
+            email="manager@example.com", password="pass",
+            first_name="Branch", last_name="Manager",
+            role="branch_manager", branch=branch
+        )
+        start = timezone.now()
+        self.shift = Shift.objects.create(
+            branch=branch, posted_by=self.manager, role="Cashier",
+            start_time=start, end_time=start + timedelta(hours=8)
+        )
+        self.claims = [
+            ShiftClaim.objects.create(
+                shift=self.shift,
+                user=User.objects.create_user(
+                    email=f"employee{i}@example.com", password="pass",
+                    first_name="Employee", last_name=str(i),
+                    role="employee", branch=branch
+                )
+            )
+            for i in range(4)
+        ]
+
+    def test_parallel_approvals_assign_the_shift_once(self):
+        barrier = threading.Barrier(len(self.claims))
+        results = {}
+
+        def approve(claim):
+            client = APIClient()
+            client.force_authenticate(self.manager)
+            barrier.wait()
+            try:
+                response = client.post(f'/api/claims/{claim.pk}/approve/')
+                results[claim.pk] = response.status_code
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=approve, args=(claim,))
+            for claim in self.claims
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [pk for pk, code in results.items() if code == 200]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(
+            sorted(results.values()), [200] + [409] * (len(self.claims) - 1)
+        )
+
+        self.shift.refresh_from_db()
+        winner = ShiftClaim.objects.get(pk=winners[0])
+        self.assertEqual(self.shift.assigned_to_id, winner.user_id)
+        self.assertEqual(
+            ShiftClaim.objects.filter(status='approved').count(), 1
+        )
+        self.assertFalse(ShiftClaim.objects.filter(status='pending').exists())
+
+
+class BatchClaimDecisionTests(ShiftTestCase):
+    """
+    Ensures claims can be approved and declined in batches.
+    """
+    def setUp(self):
+        super().setUp()
+        self.shifts = self.create_shifts(3)
+        self.claims = {
+            (shift_index, employee_index): ShiftClaim.objects.create(
+                shift=self.shifts[shift_index],
+                user=self.employees[employee_index]
+            )
+            for shift_index in range(3)
+            for employee_index in range(2)
+        }
+        self.client.force_authenticate(self.manager)
+
+    def decide(self, decisions):
+        return self.client.post('/api/claims/batch/', [
+            {'id': self.claims[key].pk, 'decision': decision}
+            for key, decision in decisions
+        ], format='json')
+
+    def test_batch_applies_decisions_and_reports_conflicts(self):
+        response = self.decide([
+            ((0, 0), 'approve'),
+            ((1, 0), 'approve'),
+            ((1, 1), 'approve'),
+            ((2, 1), 'decline'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [report['result'] for report in response.data['results']],
+            ['approved', 'conflict', 'conflict', 'declined']
+        )
+
+        self.shifts[0].refresh_from_db()
+        self.assertEqual(self.shifts[0].assigned_to, self.employees[0])
+        self.claims[0, 1].refresh_from_db()
+        self.assertEqual(self.claims[0, 1].status, 'declined')
+        self.assertEqual(
+            Shift.objects.filter(status='open').count(), 2
+        )
+        self.assertEqual(
+            ShiftClaim.objects.filter(status='pending').count(), 3
+        )
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+    def test_batch_publishes_one_event_per_branch(self):
+        with mock.patch('shifts.realtime.publish') as publish:
+            self.decide([
+                ((0, 0), 'approve'),
+                ((1, 0), 'decline'),
+                ((1, 1), 'decline'),
+            ])
+        self.assertEqual(publish.call_args_list, [
+            mock.call(
+                'claims.approved', self.branch.pk, self.branch.region_id,
+                ids=[self.claims[0, 0].pk],
+            ),
+            mock.call(
+                'claims.declined', self.branch.pk, self.branch.region_id,
+                ids=[
+                    self.claims[0, 1].pk,
+                    self.claims[1, 0].pk,
+                    self.claims[1, 1].pk,
+                ],
+            ),
+        ])
+
+    def test_decided_claims_conflict_on_retry(self):
+        self.decide([((0, 0), 'approve')])
+        response = self.decide([((0, 1), 'approve')])
+        self.assertEqual(response.data['results'][0]['result'], 'conflict')
+
+    def test_claims_at_other_branches_are_not_decided(self):
+        other_shift, = self.create_shifts(1, branch=self.other_branch)
+        other_claim = ShiftClaim.objects.create(
+            shift=other_shift, user=self.employees[2]
+        )
+        response = self.client.post('/api/claims/batch/', [
+            {'id': other_claim.pk, 'decision': 'approve'},
+            {'id': self.claims[0, 0].pk, 'decision': 'decline'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [report['result'] for report in response.data['results']],
+            ['error', 'declined']
+        )
+
+        other_shift.refresh_from_db()
+        other_claim.refresh_from_db()
+        self.assertEqual(other_shift.status, 'open')
+        self.assertEqual(other_claim.status, 'pending')
+
+
+class SparseFieldsetTests(ShiftTestCase):
+    """
+    Ensures clients can pick the fields and nested details they receive.
+    """
+    def setUp(self):
+        super().setUp()
+        for shift in self.create_shifts(3, assigned_to=self.employees[0]):
+            ShiftClaim.objects.create(shift=shift, user=self.employees[1])
+        self.client.force_authenticate(self.head_office)
+
+    def get(self, query):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/shifts/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], len(context.captured_queries)
+
+    def test_fields_limit_output_and_queries(self):
+        results, queries = self.get('fields=id,start_time,status,role')
+        self.assertEqual(
+            set(results[0]), {'id', 'start_time', 'status', 'role'}
+        )
+        _, full_queries = self.get('')
+        self.assertLess(queries, full_queries)
+
+    def test_expand_selects_nested_details(self):
+        results, _ = self.get('expand=branch_details')
+        self.assertIn('branch_details', results[0])
+        self.assertNotIn('claims', results[0])
+        self.assertNotIn('posted_by_details', results[0])
+        self.assertIn('role', results[0])
+
+    def test_dotted_fields_reach_nested_serializers(self):
+        results, _ = self.get('fields=id,claims.status,claims.user.email')
+        self.assertEqual(set(results[0]), {'id', 'claims'})
+        self.assertEqual(
+            results[0]['claims'][0],
+            {'status': 'pending', 'user': {'email': 'employee1@example.com'}}
+        )
+
+
+class FastListTests(ShiftTestCase):
+    """
+    Ensures the fast list path renders exactly what the serializers do.
+    """
+    def setUp(self):
+        super().setUp()
+        shifts = self.create_shifts(3, assigned_to=self.employees[0])
+        shifts += self.create_shifts(2, branch=self.other_branch)
+        Shift.objects.filter(pk=shifts[-1].pk).update(
+            posted_by=self.head_office
+        )
+        for shift in shifts[:3]:
+            for employee in self.employees[1:]:
+                ShiftClaim.objects.create(shift=shift, user=employee)
+
+    def render(self, data):
+        return json.loads(JSONRenderer().render(data))
+
+    def test_shifts_match_serializer(self):
+        queryset = Shift.objects.order_by('start_time', 'id')
+        expected = ShiftSerializer(queryset.with_details(), many=True).data
+        rows = list(queryset.values(*fast_lists.SHIFT_VALUES))
+        actual = fast_lists.serialize_shifts(rows)
+        self.assertEqual(self.render(actual), self.render(expected))
+        self.assertEqual(list(actual[0]), list(expected[0]))
+
+    def test_claims_match_serializer(self):
+        queryset = ShiftClaim.objects.order_by('created_at', 'id')
+        expected = ShiftClaimSerializer(queryset, many=True).data
+        rows = list(queryset.values(*fast_lists.CLAIM_VALUES))
+        self.assertEqual(
+            self.render(fast_lists.serialize_claims(rows)),
+            self.render(expected)
+        )
+
+    def test_list_endpoint_uses_fast_renderer(self):
+        self.client.force_authenticate(self.head_office)
+        response = self.client.get('/api/shifts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_fast_renderer_matches_the_standard_renderer(self):
+        for data in [{1: 'a', 'b': 2}, {'total': 2 ** 70}]:
+            self.assertEqual(
+                json.loads(FastJSONRenderer().render(data)),
+                self.render(data)
+            )
+
+
+class ConditionalGetTests(ShiftTestCase):
+    """
+    Ensures unchanged list and analytics responses are revalidated with a
+    304 from a single aggregate query.
+    """
+    def setUp(self):
+        super().setUp()
+        self.shifts = self.create_shifts(3)
+        ShiftClaim.objects.create(shift=self.shifts[2], user=self.employees[1])
+        self.client.force_authenticate(self.head_office)
+
+    def test_matching_etag_returns_not_modified(self):
+        for url in [
+            '/api/shifts/', '/api/claims/',
+            '/api/analytics/all_shifts_by_branch/',
+        ]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+            self.assertEqual(len(context.captured_queries), 1, url)
+
+    def test_if_modified_since_returns_not_modified(self):
+        last_modified = self.client.get('/api/shifts/')['Last-Modified']
+        response = self.client.get(
+            '/api/shifts/', HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_produce_a_new_etag(self):
+        etag = self.client.get('/api/shifts/')['ETag']
+
+        ShiftClaim.objects.create(shift=self.shifts[0], user=self.employees[0])
+        response = self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        self.shifts[1].delete()
+        response = self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_embedded_user_and_branch_changes_produce_a_new_etag(self):
+        etag = self.client.get('/api/shifts/')['ETag']
+        for instance, field in [
+            (self.manager, 'first_name'), (self.branch, 'name'),
+        ]:
+            setattr(instance, field, 'Renamed')
+            with self.captureOnCommitCallbacks(execute=True):
+                instance.save()
+            response = self.client.get(
+                '/api/shifts/', HTTP_IF_NONE_MATCH=etag
+            )
+            self.assertEqual(response.status_code, 200, field)
+            etag = response['ETag']
+
+    def test_etag_depends_on_user_and_query(self):
+        etag = self.client.get('/api/shifts/')['ETag']
+        self.assertNotEqual(
+            self.client.get('/api/shifts/?page_size=1')['ETag'], etag
+        )
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_updates_bump_updated_at(self):
+        before = self.shifts[0].updated_at
+        self.client.force_authenticate(self.manager)
+        response = self.client.post(
+            '/api/shifts/bulk_update/',
+            [{'id': self.shifts[0].pk, 'status': 'claimed'}], format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.shifts[0].refresh_from_db()
+        self.assertGreater(self.shifts[0].updated_at, before)
+
+
+class DeltaSyncTests(ShiftTestCase):
+    """
+    Ensures the changes endpoint returns only what changed since a token,
+    within the caller's scope.
+    """
+    url = '/api/shifts/changes/'
+
+    def setUp(self):
+        super().setUp()
+        self.shifts = self.create_shifts(3)
+        self.other_shifts = self.create_shifts(2, branch=self.other_branch)
+        self.client.force_authenticate(self.employees[0])
+
+    def sync(self, token=None):
+        response = self.client.get(
+            self.url, {'since': token} if token else {}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def backdate(self, seconds=60):
+        """
+        Moves every existing row out of the overlap window.
+        """
+        past = timezone.now() - timedelta(seconds=seconds)
+        Shift.objects.update(updated_at=past)
+        ShiftClaim.objects.update(updated_at=past)
+        Tombstone.objects.update(deleted_at=past)
+
+    def test_initial_sync_returns_scoped_snapshot(self):
+        data = self.sync()
+        self.assertTrue(data['reset'])
+        self.assertEqual(
+            {shift['id'] for shift in data['shifts']},
+            {shift.pk for shift in self.shifts}
+        )
+
+    def test_only_changes_since_token_are_returned(self):
+        token = self.sync()['token']
+        self.backdate()
+
+        claim = ShiftClaim.objects.create(
+            shift=self.shifts[0], user=self.employees[1]
+        )
+        self.shifts[1].status = 'filled'
+        self.shifts[1].save()
+        deleted_pk = self.shifts[2].pk
+        self.shifts[2].delete()
+        self.other_shifts[0].delete()
+
+        with CaptureQueriesContext(connection) as context:
+            data = self.sync(token)
+        self.assertFalse(data['reset'])
+        self.assertEqual(
+            [shift['id'] for shift in data['shifts']], [self.shifts[1].pk]
+        )
+        self.assertEqual([c['id'] for c in data['claims']], [claim.pk])
+        self.assertEqual(
+            data['deleted'], {'shifts': [deleted_pk], 'claims': []}
+        )
+        self.assertLessEqual(len(context.captured_queries), 8)
+
+        self.backdate()
+        data = self.sync(data['token'])
+        self.assertEqual(data['shifts'], [])
+        self.assertEqual(data['deleted'], {'shifts': [], 'claims': []})
+
+    def test_changes_are_paged(self):
+        for shift in self.shifts:
+            ShiftClaim.objects.create(shift=shift, user=self.employees[1])
+        token = self.sync()['token']
+        self.backdate()
+        for shift in self.shifts:
+            shift.save()
+        self.shifts[0].claims.all().delete()
+
+        seen, pages = [], 0
+        with self.settings(SHIFT_SYNC_PAGE_SIZE=2):
+            while True:
+                data = self.sync(token)
+                token, pages = data['token'], pages + 1
+                self.assertLessEqual(len(data['shifts']), 2)
+                self.assertFalse(data['reset'])
+                seen += [shift['id'] for shift in data['shifts']]
+                if not data['has_more']:
+                    break
+        self.assertEqual(pages, 2)
+        self.assertEqual(seen, [shift.pk for shift in self.shifts])
+
+        # The final token is for when the first page was read
+        self.backdate()
+        data = self.sync(token)
+        self.assertEqual((data['shifts'], data['has_more']), ([], False))
+
+    def test_claim_deletions_are_scoped(self):
+        claim = ShiftClaim.objects.create(
+            shift=self.shifts[0], user=self.employees[1]
+        )
+        other = ShiftClaim.objects.create(
+            shift=self.other_shifts[0], user=self.employees[1]
+        )
+        token = self.sync()['token']
+        self.backdate()
+        claim_pk = claim.pk
+        claim.delete()
+        other.delete()
+        self.assertEqual(
+            self.sync(token)['deleted'], {'shifts': [], 'claims': [claim_pk]}
+        )
+
+    def test_expired_and_invalid_tokens(self):
+        token = sync.make_token(timezone.now() - timedelta(days=60))
+        self.assertTrue(self.sync(token)['reset'])
+
+        response = self.client.get(self.url, {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prune_tombstones(self):
+        self.shifts[0].delete()
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=60)
+        )
+        kept_pk = self.shifts[1].pk
+        self.shifts[1].delete()
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)),
+            [kept_pk]
+        )
+
+
+class UserScopeCacheTests(ShiftTestCase):
+    """
+    Ensures JWT authentication and role scoping are served from the user
+    scope cache and follow changes to the user, branch and region.
+    """
+    def setUp(self):
+        super().setUp()
+        self.floater = User.objects.create_user(
+            email="floater@example.com", password="pass",
+            first_name="Floating", last_name="Employee",
+            role="floating_employee", branch=self.branch
+        )
+        self.other_region = Region.objects.create(name="Leeds")
+        self.far_branch = Branch.objects.create(
+            name="Headingley", region=self.other_region
+        )
+        self.create_shifts(2)
+        self.create_shifts(1, branch=self.far_branch)
+
+    def get(self, user, url='/api/shifts/'):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def visible(self, user):
+        return len(self.get(user).json()['results'])
+
+    def test_warm_requests_do_not_load_the_user_or_branch(self):
+        self.get(self.floater)
+        with CaptureQueriesContext(connection) as context:
+            response = self.get(self.floater)
+        self.assertEqual(len(response.json()['results']), 2)
+        user_lookup = 'FROM "shifts_user" WHERE "shifts_user"."email"'
+        scope_queries = [
+            query['sql'] for query in context.captured_queries
+            if user_lookup in query['sql']
+            or 'FROM "shifts_region"' in query['sql']
+        ]
+        self.assertEqual(scope_queries, [])
+
+    def test_role_and_branch_changes_invalidate_the_scope(self):
+        self.assertEqual(self.visible(self.employees[0]), 2)
+
+        self.employees[0].branch = self.far_branch
+        self.employees[0].save()
+        self.assertEqual(self.visible(self.employees[0]), 1)
+
+        self.employees[0].role = 'head_office'
+        self.employees[0].save()
+        self.assertEqual(self.visible(self.employees[0]), 3)
+
+    def test_branch_changes_invalidate_every_scope(self):
+        self.get(self.floater)
+        self.far_branch.region = self.region
+        self.far_branch.save()
+        self.assertEqual(self.visible(self.floater), 3)
+
+    def test_deactivated_users_are_rejected(self):
+        self.get(self.floater)
+        self.floater.is_active = False
+        self.floater.save()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.floater)}'
+        )
+        self.assertEqual(self.client.get('/api/shifts/').status_code, 401)
+
+    def test_cached_user_can_be_saved(self):
+        self.get(self.floater)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.floater)}'
+        )
+        response = self.client.post('/api/users/change_password/', {
+            'current_password': 'pass',
+            'new_password': 'new-pass',
+            'confirm_new_password': 'new-pass',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.floater.refresh_from_db()
+        self.assertTrue(self.floater.check_password('new-pass'))
+        self.assertEqual(self.floater.branch, self.branch)
+        self.assertEqual(self.floater.first_name, 'Floating')
+
+    def test_password_hash_is_not_cached(self):
+        self.get(self.floater)
+        entry = cache.get(scopes._key(self.floater.email))
+        names = {name for name, _ in entry['fields']}
+        self.assertFalse(names & {'password', 'last_login'})
+        self.assertNotIn(self.floater.password, str(entry))
+
+        # Deferred fields are still loaded on access
+        user = scopes.get_user(self.floater.email)
+        self.assertTrue(user.check_password('pass'))
+
+
+class IntervalIndexTests(TestCase):
+    """
+    Ensures the interval index finds overlaps, including with intervals
+    that overlap each other.
+    """
+    def test_overlaps(self):
+        index = IntervalIndex([(0, 10, 'a'), (2, 4, 'b'), (20, 30, 'c')])
+        self.assertTrue(index.overlaps(5, 6))
+        self.assertTrue(index.overlaps(29, 40))
+        self.assertFalse(index.overlaps(10, 20))
+        self.assertFalse(index.overlaps(-5, 0))
+        self.assertEqual(
+            [item[2] for item in index.overlapping(3, 21)], ['a', 'b', 'c']
+        )
+        self.assertEqual(index.overlapping(12, 18), [])
+
+
+class ShiftMatchingTests(ShiftTestCase):
+    """
+    Ensures open shifts get ranked, eligible candidates.
+    """
+    def setUp(self):
+        super().setUp()
+        self.floater = User.objects.create_user(
+            email="floater@example.com", password="pass",
+            first_name="Floating", last_name="Employee",
+            role="floating_employee", branch=self.other_branch
+        )
+        far_branch = Branch.objects.create(
+            name="Headingley", region=Region.objects.create(name="Leeds")
+        )
+        self.outsider = User.objects.create_user(
+            email="outsider@example.com", password="pass",
+            first_name="Far", last_name="Away",
+            role="floating_employee", branch=far_branch
+        )
+        self.shift = self.create_shifts(1)[0]
+        start = self.shift.start_time
+
+        # employees[0] is already working at the same time
+        Shift.objects.create(
+            branch=self.other_branch, posted_by=self.manager,
+            start_time=start + timedelta(hours=2),
+            end_time=start + timedelta(hours=6), role="Cashier",
+            status="claimed", assigned_to=self.employees[0]
+        )
+        # employees[1] already has hours elsewhere in the week
+        Shift.objects.create(
+            branch=self.branch, posted_by=self.manager,
+            start_time=start - timedelta(days=1),
+            end_time=start - timedelta(days=1) + timedelta(hours=10),
+            role="Cashier", status="claimed", assigned_to=self.employees[1]
+        )
+        self.client.force_authenticate(self.manager)
+
+    def candidates(self, query=''):
+        response = self.client.get(
+            f'/api/shifts/{self.shift.pk}/candidates/{query}'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [c['user'] for c in response.data['candidates']]
+
+    def test_candidates_are_ranked_and_filtered(self):
+        if week_of(self.shift.start_time) != week_of(
+            self.shift.start_time - timedelta(days=1)
+        ):
+            self.skipTest("The earlier shift falls in a different week.")
+        self.assertEqual(self.candidates(), [
+            self.employees[2].pk, self.employees[1].pk, self.floater.pk
+        ])
+        self.assertEqual(self.candidates('?limit=1'), [self.employees[2].pk])
+
+    def test_weekly_hours_limit(self):
+        with self.settings(MATCHING_MAX_WEEKLY_HOURS=8):
+            self.assertNotIn(self.employees[1].pk, self.candidates())
+
+    def test_suggestions_cover_open_shifts(self):
+        response = self.client.get('/api/shifts/suggestions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [entry['shift'] for entry in response.data['results']],
+            [self.shift.pk]
+        )
+
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.get('/api/shifts/suggestions/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_matching_uses_a_fixed_number_of_queries(self):
+        shifts = self.create_shifts(20) + self.create_shifts(
+            10, branch=self.other_branch
+        )
+        rows = Shift.objects.filter(
+            pk__in=[shift.pk for shift in shifts]
+        ).values('id', 'branch_id', 'start_time', 'end_time')
+        with CaptureQueriesContext(connection) as context:
+            results = ShiftMatcher(rows).run()
+        self.assertEqual(len(context.captured_queries), 4)
+        self.assertEqual(len(results), 30)
+
+
+class DoubleBookingTests(ShiftTestCase):
+    """
+    Ensures nobody can claim or be given overlapping shifts, and that
+    existing double bookings are reported.
+    """
+    def setUp(self):
+        super().setUp()
+        self.working = self.create_shifts(
+            1, status='claimed', assigned_to=self.employees[0]
+        )[0]
+        start = self.working.start_time
+        self.clashing = Shift.objects.create(
+            branch=self.branch, posted_by=self.manager,
+            start_time=start + timedelta(hours=4),
+            end_time=start + timedelta(hours=12), role="Cashier"
+        )
+        self.back_to_back = Shift.objects.create(
+            branch=self.branch, posted_by=self.manager,
+            start_time=self.working.end_time,
+            end_time=self.working.end_time + timedelta(hours=4),
+            role="Cashier"
+        )
+
+    def test_claiming_a_clashing_shift_is_rejected(self):
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.post(f'/api/shifts/{self.clashing.pk}/claim/')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            f'/api/shifts/{self.back_to_back.pk}/claim/'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_approving_a_clashing_claim_conflicts(self):
+        claim = ShiftClaim.objects.create(
+            shift=self.clashing, user=self.employees[0]
+        )
+        self.client.force_authenticate(self.head_office)
+        response = self.client.post(f'/api/claims/{claim.pk}/approve/')
+        self.assertEqual(response.status_code, 409)
+        self.clashing.refresh_from_db()
+        self.assertEqual(self.clashing.status, 'open')
+
+    def test_batch_rejects_clashes_within_the_batch(self):
+        later = self.create_shifts(2)
+        overlapping = Shift.objects.create(
+            branch=self.branch, posted_by=self.manager,
+            start_time=later[1].start_time + timedelta(hours=1),
+            end_time=later[1].end_time + timedelta(hours=1), role="Cashier"
+        )
+        claims = [
+            ShiftClaim.objects.create(shift=shift, user=self.employees[1])
+            for shift in [later[1], overlapping]
+        ] + [ShiftClaim.objects.create(
+            shift=self.clashing, user=self.employees[0]
+        )]
+        self.client.force_authenticate(self.head_office)
+        response = self.client.post('/api/claims/batch/', [
+            {'id': claim.pk, 'decision': 'approve'} for claim in claims
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [report['result'] for report in response.data['results']],
+            ['approved', 'conflict', 'conflict']
+        )
+
+    def test_conflict_report(self):
+        Shift.objects.filter(pk=self.clashing.pk).update(
+            status='claimed', assigned_to=self.employees[0]
+        )
+        self.client.force_authenticate(self.manager)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/shifts/conflicts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(context.captured_queries), 2)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(
+            response.data['results'][0]['shifts'],
+            [self.working.pk, self.clashing.pk]
+        )
+
+        start = (timezone.localdate() + timedelta(days=3)).isoformat()
+        response = self.client.get(f'/api/shifts/conflicts/?start={start}')
+        self.assertEqual(response.data['count'], 0)
+        response = self.client.get('/api/shifts/conflicts/?start=nope')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.get('/api/shifts/conflicts/')
+        self.assertEqual(response.status_code, 403)
+
+
+class BackgroundJobTests(ShiftTestCase):
+    """
+    Ensures background jobs are queued, run, retried and can be polled.
+    """
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_failed_jobs_are_retried_then_marked_failed(self):
+        calls = []
+
+        with mock.patch.dict(jobs.TASKS):
+            @jobs.task(max_attempts=2)
+            def flaky(value):
+                calls.append(value)
+                raise RuntimeError('boom')
+
+            job = jobs.enqueue('flaky', value=1)
+            with self.assertLogs('shifts.jobs', 'ERROR'):
+                self.assertEqual(jobs.work(burst=True), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('queued', 1))
+            self.assertGreater(job.run_at, timezone.now())
+
+            # Not due yet, so a worker leaves it alone
+            self.assertIsNone(jobs.claim_next())
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            with self.assertLogs('shifts.jobs', 'ERROR'):
+                jobs.work(burst=True)
+            job.refresh_from_db()
+
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIn('RuntimeError: boom', job.error)
+        self.assertEqual(calls, [1, 1])
+
+    def test_jobs_are_claimed_once_and_stale_jobs_requeued(self):
+        job = jobs.enqueue('materialize_recurring_shifts')
+        self.assertEqual(jobs.claim_next('worker-1').pk, job.pk)
+        self.assertIsNone(jobs.claim_next('worker-2'))
+
+        # A long job keeps its lease for as long as it is renewed
+        Job.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(jobs.requeue_stale(), 0)
+
+        Job.objects.filter(pk=job.pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(jobs.requeue_stale(), 1)
+        job = jobs.claim_next('worker-2')
+        self.assertEqual((job.worker, job.attempts), ('worker-2', 2))
+        self.assertGreater(job.lease_expires_at, timezone.now())
+
+    def test_stale_jobs_out_of_attempts_are_failed(self):
+        # Rebuilds are only attempted once
+        job = jobs.enqueue('rebuild_shift_stats')
+        jobs.claim_next('worker-1')
+        Job.objects.filter(pk=job.pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        self.assertIsNone(jobs.claim_next('worker-2'))
+
+    def test_invitation_email_is_sent_by_a_worker(self):
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/api/invitations/', {
+            'email': 'new@example.com', 'first_name': 'New',
+            'last_name': 'Starter', 'branch': self.branch.pk,
+            'role': 'employee',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mail.outbox, [])
+
+        jobs.work(burst=True)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(response.data['token'], mail.outbox[0].body)
+
+    def test_large_imports_run_in_the_background(self):
+        self.client.force_authenticate(self.manager)
+        upload = SimpleUploadedFile(
+            'rota.csv', RotaImportTests.csv_rota.encode()
+        )
+        response = self.client.post(
+            '/api/shifts/import/', {'file': upload, 'background': 'true'},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Shift.objects.count(), 0)
+
+        jobs.work(burst=True)
+        response = self.client.get(f"/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.data['status'], 'succeeded')
+        self.assertEqual(response.data['result']['created'], 2)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media.name, 'imports')), []
+        )
+
+        # Other users cannot see the job
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.get(f"/api/jobs/{response.data['id']}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_rollup_rebuild_is_queued(self):
+        self.create_shifts(2)
+        DailyShiftStat.objects.all().delete()
+        self.client.force_authenticate(self.head_office)
+        response = self.client.post('/api/analytics/rebuild/')
+        self.assertEqual(response.status_code, 202)
+        jobs.work(burst=True)
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+        self.client.force_authenticate(self.manager)
+        response = self.client.post('/api/analytics/rebuild/')
+        self.assertEqual(response.status_code, 403)
+
+
+class AvatarPipelineTests(ShiftTestCase):
+    """
+    Ensures avatar uploads are bounded, resized to WebP renditions under
+    content-hash names in the background and cleaned up when replaced.
+    """
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = self.employees[0]
+        self.client.force_authenticate(self.user)
+
+    def image(self, size=(600, 400), color='red', fmt='PNG'):
+        output = BytesIO()
+        Image.new('RGB', size, color).save(output, fmt)
+        return SimpleUploadedFile(
+            f'avatar.{fmt.lower()}', output.getvalue()
+        )
+
+    def stored_files(self):
+        root = os.path.join(self.media.name, 'avatars')
+        return sorted(
+            os.path.relpath(os.path.join(path, name), root)
+            for path, _, names in os.walk(root) for name in names
+        )
+
+    def upload(self, upload):
+        return self.client.post(
+            '/api/users/upload_avatar/', {'avatar': upload},
+            format='multipart'
+        )
+
+    def test_upload_is_stored_as_webp_renditions(self):
+        response = self.upload(self.image())
+        self.assertEqual(response.status_code, 200)
+        # The current avatar is kept until the renditions exist
+        self.assertIsNone(response.data['avatar'])
+        # Caches the user, as token authentication does
+        self.client.force_authenticate()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+        )
+        self.assertIsNone(self.client.get('/api/users/me/').data['avatar'])
+        [original] = self.stored_files()
+        self.assertTrue(original.endswith('/original'))
+
+        jobs.work(burst=True)
+        self.user.refresh_from_db()
+        directory = os.path.dirname(self.user.avatar.name)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.media.name, directory))),
+            ['256.webp', '64.webp']
+        )
+        for size in (64, 256):
+            path = os.path.join(self.media.name, directory, f'{size}.webp')
+            with Image.open(path) as rendition:
+                self.assertEqual(rendition.format, 'WEBP')
+                self.assertEqual(rendition.size, (size, size))
+
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(
+            response.data['avatar'], f'/media/{directory}/256.webp'
+        )
+        self.assertEqual(
+            response.data['avatar_thumbnail'], f'/media/{directory}/64.webp'
+        )
+
+    def test_identical_uploads_share_renditions(self):
+        self.upload(self.image())
+        jobs.work(burst=True)
+        other = self.employees[1]
+        self.client.force_authenticate(other)
+        response = self.upload(self.image())
+        # Already rendered, so used straight away
+        self.assertTrue(response.data['avatar'].endswith('/256.webp'))
+
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.user.avatar.name, other.avatar.name)
+        self.assertEqual(len(self.stored_files()), 2)
+
+    def test_oversized_uploads_are_rejected(self):
+        with self.settings(AVATAR_MAX_UPLOAD_BYTES=100):
+            response = self.upload(self.image())
+        self.assertEqual(response.status_code, 400)
+
+        with self.settings(AVATAR_MAX_PIXELS=100 * 100):
+            response = self.upload(self.image(size=(101, 100)))
+        self.assertEqual(response.status_code, 400)
+
+        response = self.upload(SimpleUploadedFile('avatar.png', b'nope'))
+        self.assertEqual(response.status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+
+    def test_replaced_avatar_is_deleted_unless_shared(self):
+        self.upload(self.image(color='red'))
+        self.client.force_authenticate(self.employees[1])
+        self.upload(self.image(color='red'))
+        self.client.force_authenticate(self.user)
+        self.upload(self.image(color='blue'))
+        jobs.work(burst=True)
+
+        # The red avatar is still used by the other employee
+        self.assertEqual(len(self.stored_files()), 4)
+
+        # Switched over by the job, outside the authenticated instance
+        self.employees[1].refresh_from_db()
+        self.client.force_authenticate(self.employees[1])
+        self.upload(self.image(color='blue'))
+        jobs.work(burst=True)
+        self.user.refresh_from_db()
+        digest = os.path.basename(os.path.dirname(self.user.avatar.name))
+        self.assertEqual(
+            self.stored_files(),
+            [f'{digest}/256.webp', f'{digest}/64.webp']
+        )
+
+    def test_fast_lists_render_avatar_urls(self):
+        self.upload(self.image())
+        jobs.work(burst=True)
+        self.create_shifts(1, assigned_to=self.user)
+        queryset = Shift.objects.all()
+        expected = ShiftSerializer(queryset.with_details(), many=True).data
+        actual = fast_lists.serialize_shifts(
+            list(queryset.values(*fast_lists.SHIFT_VALUES))
+        )
+        self.assertEqual(
+            json.loads(JSONRenderer().render(actual)),
+            json.loads(JSONRenderer().render(expected))
+        )
+        self.assertTrue(
+            actual[0]['assigned_to_details']['avatar_thumbnail']
+            .endswith('/64.webp')
+        )
+
+
+class BenchmarkTests(TestCase):
+    """
+    Ensures the benchmark data generator and scenarios run cleanly.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def test_scenarios_run_against_seeded_data(self):
+        counts = benchmarks.seed(
+            shifts=40, regions=1, branches=2, staff=3, claims=1,
+            batch_size=16
+        )
+        self.assertEqual(counts['shifts'], 40)
+        self.assertEqual(Shift.objects.count(), 40)
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+        report = benchmarks.ApiBenchmark(iterations=2, warmup=1).run()
+        self.assertEqual(
+            list(report['scenarios']), list(benchmarks.ApiBenchmark.SCENARIOS)
+        )
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertEqual(result['requests'], 2)
+            self.assertGreater(result['queries']['max'], 0, name)
+            self.assertGreater(result['peak_memory_kib'], 0, name)
+
+        # The write scenarios leave the seeded data as it was
+        self.assertEqual(report['environment']['data']['shifts'], 40)
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_regressions_are_flagged_against_a_baseline(self):
+        def report(p95, queries):
+            return {'scenarios': {'shift_list': {
+                'latency_ms': {'p50': 10, 'p95': p95},
+                'queries': {'min': queries},
+                'peak_memory_kib': 100,
+            }}}
+
+        rows = benchmarks.compare(report(11, 4), report(10, 4), 20)
+        self.assertFalse(any(row['regression'] for row in rows))
+
+        rows = benchmarks.compare(report(13, 5), report(10, 4), 20)
+        self.assertEqual(
+            [row['metric'] for row in rows if row['regression']],
+            ['p95_ms', 'queries']
+        )
+
+
+class RequestMetricsTests(ShiftTestCase):
+    """
+    Ensures requests are measured per view and action when the metrics
+    middleware is enabled.
+    """
+    def setUp(self):
+        super().setUp()
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        middleware = self.modify_settings(MIDDLEWARE={
+            'prepend': 'shifts.metrics.RequestMetricsMiddleware',
+        })
+        middleware.enable()
+        self.addCleanup(middleware.disable)
+
+    def test_requests_report_server_timing_per_action(self):
+        self.create_shifts(3)
+        self.client.force_authenticate(self.head_office)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/shifts/')
+        self.assertEqual(response.status_code, 200)
+
+        queries = len(context.captured_queries)
+        timing = response['Server-Timing']
+        self.assertIn(f'desc="{queries} queries"', timing)
+        self.assertIn('serialize;dur=', timing)
+        self.assertIn('view;dur=', timing)
+
+        self.client.get('/api/analytics/all-shifts-timeline/')
+        views = metrics.registry.views
+        self.assertEqual(
+            set(views),
+            {'ShiftViewSet.list', 'AnalyticsViewSet.all_shifts_timeline'}
+        )
+        self.assertEqual(views['ShiftViewSet.list']['queries'], queries)
+        self.assertGreater(views['ShiftViewSet.list']['serializer_seconds'], 0)
+
+    def test_requests_over_the_query_budget_are_logged(self):
+        self.client.force_authenticate(self.head_office)
+        with self.settings(REQUEST_METRICS_QUERY_BUDGET=0):
+            with self.assertLogs('shifts.metrics', 'WARNING') as logs:
+                self.client.get('/api/claims/')
+        self.assertIn('ShiftClaimViewSet.list', logs.output[0])
+        self.assertEqual(
+            metrics.registry.views['ShiftClaimViewSet.list']['over_budget'], 1
+        )
+
+    def test_metrics_are_served_to_staff_at_allowed_addresses(self):
+        self.client.force_authenticate(self.manager)
+        self.client.get('/api/shifts/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        self.manager.is_staff = True
+        self.manager.save()
+        self.client.force_authenticate(self.manager)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('rotaiq_requests_total{view="ShiftViewSet.list"} 1', body)
+        self.assertIn(
+            'rotaiq_request_duration_seconds_count'
+            '{view="ShiftViewSet.list"} 1', body
+        )
+
+        with self.settings(REQUEST_METRICS_ALLOWED_IPS=()):
+            self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+
+class RecurringShiftTests(ShiftTestCase):
+    """
+    Ensures recurring shifts are posted as one row, materialized only
+    within the rolling window and expanded lazily beyond it.
+    """
+    url = '/api/recurring-shifts/'
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        # Patterns start tomorrow, so no occurrence is already under way
+        self.tomorrow = self.today + timedelta(days=1)
+        self.saturday = self.tomorrow + timedelta(
+            days=(5 - self.tomorrow.weekday()) % 7
+        )
+
+    def post_weekly(self, **data):
+        self.client.force_authenticate(self.manager)
+        return self.client.post(self.url, {
+            'branch': self.branch.pk, 'role': 'Cashier',
+            'start_time': '09:00', 'end_time': '17:00',
+            'frequency': 'weekly', 'weekdays': [5],
+            'starts_on': self.tomorrow.isoformat(), **data
+        }, format='json')
+
+    def test_only_the_window_is_materialized(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_weekly()
+        self.assertEqual(response.status_code, 201)
+        inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT')
+        ]
+        # The pattern and the job that materializes it
+        self.assertEqual(len(inserts), 2)
+        self.assertFalse(Shift.objects.exists())
+
+        with self.settings(RECURRING_SHIFT_WINDOW_DAYS=14):
+            jobs.work(burst=True)
+            self.assertEqual(
+                recurrence.materialize_due(),
+                {'templates': 0, 'created': 0}
+            )
+        shifts = list(Shift.objects.order_by('start_time'))
+        self.assertEqual(len(shifts), 2)
+        for week, shift in enumerate(shifts):
+            start = timezone.localtime(shift.start_time)
+            self.assertEqual(
+                start.date(), self.saturday + timedelta(weeks=week)
+            )
+            self.assertEqual(start.hour, 9)
+            self.assertEqual(shift.end_time - shift.start_time,
+                             timedelta(hours=8))
+            self.assertEqual(shift.recurrence_id, response.data['id'])
+        template = RecurringShift.objects.get()
+        self.assertEqual(
+            template.materialized_until, self.today + timedelta(days=14)
+        )
+        self.assertEqual(
+            DailyShiftStat.objects.current(), DailyShiftStat.objects.compute()
+        )
+
+    def test_occurrences_beyond_the_window_are_computed(self):
+        template_id = self.post_weekly().data['id']
+        with self.settings(RECURRING_SHIFT_WINDOW_DAYS=14):
+            jobs.work(burst=True)
+
+        end = self.saturday + timedelta(weeks=5)
+        response = self.client.get(
+            f'{self.url}{template_id}/occurrences/'
+            f'?start={self.today}&end={end}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['materialized'] for row in response.data],
+            [True] * 2 + [False] * 4
+        )
+        self.assertIsNotNone(response.data[0]['id'])
+        self.assertIsNone(response.data[2]['id'])
+        self.assertEqual(
+            timezone.localtime(response.data[-1]['start_time']).date(), end
+        )
+
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.get(
+            f'{self.url}occurrences/?start={self.today}&end={end}'
+        )
+        self.assertEqual(len(response.data), 6)
+
+    def test_daily_interval_and_overnight_shifts(self):
+        template = RecurringShift(
+            branch=self.branch, posted_by=self.manager, role='Night',
+            start_time=datetime.strptime('22:00', '%H:%M').time(),
+            end_time=datetime.strptime('06:00', '%H:%M').time(),
+            frequency='daily', interval=2, starts_on=self.today,
+            ends_on=self.today + timedelta(days=6),
+        )
+        days = list(recurrence.occurrence_dates(
+            template, self.today, self.today + timedelta(days=30)
+        ))
+        self.assertEqual(
+            days, [self.today + timedelta(days=n) for n in (0, 2, 4, 6)]
+        )
+        start, end = recurrence.occurrence_times(template, days[0])
+        self.assertEqual(end - start, timedelta(hours=8))
+
+    def test_delete_removes_upcoming_unclaimed_occurrences(self):
+        template_id = self.post_weekly().data['id']
+        jobs.work(burst=True)
+        claimed = Shift.objects.order_by('start_time').first()
+        ShiftClaim.objects.create(shift=claimed, user=self.employees[0])
+
+        response = self.client.delete(f'{self.url}{template_id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(list(Shift.objects.all()), [claimed])
+        claimed.refresh_from_db()
+        self.assertIsNone(claimed.recurrence_id)
+
+    def test_only_managers_of_the_branch_can_post(self):
+        self.client.force_authenticate(self.employees[0])
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+        response = self.post_weekly(branch=self.other_branch.pk)
+        self.assertEqual(response.status_code, 403)
+        response = self.post_weekly(weekdays=[7])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RecurringShift.objects.exists())
+
+
+class ShiftBoardTests(ShiftTestCase):
+    """
+    Ensures board connections are authenticated and receive the events of
+    their own scope only.
+    """
+    application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def setUp(self):
+        super().setUp()
+        # Channels closes "old" connections around each database call,
+        # which would close the test case's connection mid-transaction
+        patcher = mock.patch('channels.db.close_old_connections')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.other_manager = User.objects.create_user(
+            email="other@example.com", password="pass",
+            first_name="Other", last_name="Manager",
+            role="branch_manager", branch=self.other_branch
+        )
+        self.inactive = User.objects.create_user(
+            email="left@example.com", password="pass",
+            first_name="Former", last_name="Employee",
+            branch=self.branch, is_active=False
+        )
+
+    async def connect(self, user=None):
+        path = '/ws/shifts/'
+        if user is not None:
+            path += f'?token={AccessToken.for_user(user)}'
+        communicator = WebsocketCommunicator(self.application, path)
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    def post_shift(self):
+        self.client.force_authenticate(self.manager)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/shifts/', {
+                'branch': self.branch.pk,
+                'start_time': '2025-03-01T09:00:00Z',
+                'end_time': '2025-03-01T17:00:00Z',
+                'role': 'Cashier',
+            }, format='json')
+        return response.data['id']
+
+    async def test_anonymous_connections_are_refused(self):
+        communicator, connected = await self.connect()
+        self.assertFalse(connected)
+
+    async def test_inactive_users_are_refused(self):
+        communicator, connected = await self.connect(self.inactive)
+        self.assertFalse(connected)
+
+    async def test_events_reach_matching_scopes_only(self):
+        employee, _ = await self.connect(self.employees[0])
+        head_office, _ = await self.connect(self.head_office)
+        other_branch, connected = await self.connect(self.other_manager)
+        self.assertTrue(connected)
+
+        shift_id = await sync_to_async(self.post_shift)()
+
+        for communicator in (employee, head_office):
+            event = await communicator.receive_json_from(timeout=1)
+            self.assertEqual(event['type'], 'shift.created')
+            self.assertEqual(event['shift']['id'], shift_id)
+        self.assertTrue(await other_branch.receive_nothing())
+
+        for communicator in (employee, head_office, other_branch):
+            await communicator.disconnect()
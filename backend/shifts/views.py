@@ -1,19 +1,88 @@
+import csv
+import io
+import uuid
+from datetime import date, datetime, time, timedelta
+
 from rest_framework import viewsets, mixins, status, generics, permissions
 from rest_framework.response import Response
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import (
+    HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
-from django.db import transaction
-from django.db.models import Q, Count
+from django.utils import timezone
+from django.db import models, transaction
+from django.db.models import (
+    Avg, Count, DurationField, ExpressionWrapper, OuterRef, Q, Subquery, Sum,
+    Window
+)
 from django.db.models.expressions import F
-from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.db.models.functions import (
+    Coalesce, ExtractDay, ExtractMonth, ExtractYear, RowNumber, Trunc
+)
 from django.contrib.auth import get_user_model
 
+from . import (
+    cache as analytics_cache, fast_lists, jobs, metrics, realtime,
+    recurrence, scopes, sync
+)
+from .conditional import conditional_response
+from .claims import (
+    ClaimConflict, approve_claim, decide_claims, decline_claim, has_clash
+)
+from .exports import FORMATS as EXPORT_FORMATS, iter_rows as iter_export_rows
+from .importers import PARSERS, RotaImporter, detect_format
+from .intervals import overlapping_pairs
+from .matching import ShiftMatcher
 from .models import *
+from .pagination import (
+    KeysetPagination, ShiftCursorPagination, CreatedAtCursorPagination
+)
 from .permissions import IsManagerOrReadOnly
 from .serializers import *
+from .signals import sync_stats
+
+
+# Periods the analytics summary can be grouped by
+SUMMARY_GRANULARITIES = ('day', 'week', 'month')
+
+# Percentiles reported by the time-to-fill analytics
+FILL_TIME_PERCENTILES = (50, 90, 95)
+
+
+def use_fast_list(request):
+    """
+    Returns whether a list request can be answered by `shifts.fast_lists`,
+    which always renders the complete serializer schema.
+    """
+    return not (
+        request.query_params.get('fields')
+        or request.query_params.get('expand')
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def request_metrics(request):
+    """
+    Serves the per-view request metrics in the Prometheus text format to
+    staff users connecting from the addresses listed in
+    `REQUEST_METRICS_ALLOWED_IPS`.
+    """
+    allowed = getattr(
+        settings, 'REQUEST_METRICS_ALLOWED_IPS', ('127.0.0.1', '::1')
+    )
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -47,20 +116,23 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         queryset = super().get_queryset()
+        if 'branch' in self.get_serializer().fields:
+            queryset = queryset.select_related('branch__region')
 
         if user.is_staff or user.role == 'head_office':
             # Head Office can see all users
             return queryset
         elif user.role == 'region_manager':
             # Region managers can see employees in their region
-            return queryset.filter(region=user.region)
+            return queryset.filter(region_id=user.region_id)
         elif user.role == 'branch_manager':
             # Branch managers can only see employees in their own branch
-            return queryset.filter(branch=user.branch)
+            return queryset.filter(branch_id=user.branch_id)
 
         # Regular employees can only see their own profile
         return queryset.filter(id=user.id)
@@ -101,9 +173,14 @@ class UserViewSet(viewsets.ModelViewSet):
             )
         
         user = request.user
+        previous = user.avatar.name if user.avatar else ''
         serializer = UserAvatarSerializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            jobs.enqueue(
+                'process_avatar', created_by=user, user_id=user.pk,
+                previous=previous, avatar=serializer.pending
+            )
             
             # Use the full user serializer to return the complete user object
             full_serializer = self.get_serializer(user)
@@ -159,15 +236,11 @@ class BranchViewSet(viewsets.ReadOnlyModelViewSet):
         if region_id:
             queryset = queryset.filter(region__id=region_id)
 
-        # Filter branches based on the user's role.
-        if user.role == 'region_manager':
-            # Region manager sees all branches within their region.
-            if user.region:
-                queryset = queryset.filter(region=user.region)
-        elif user.role == 'branch_manager':
-            # Branch manager sees only their own branch.
-            if user.branch:
-                queryset = queryset.filter(pk=user.branch.pk)
+        # Filter branches based on the user's role: region managers see the
+        # branches within their region, branch managers only their own.
+        branch_ids = scopes.get_scope(user)['branch_ids']
+        if branch_ids is not None:
+            queryset = queryset.filter(pk__in=branch_ids)
 
         return queryset
 
@@ -186,6 +259,7 @@ class InvitationViewSet(
     queryset = Invitation.objects.all()
     serializer_class = InvitationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     @action(detail=False, methods=['get'], permission_classes=[AllowAny])
     def details(self, request):
@@ -250,6 +324,12 @@ class InvitationViewSet(
             raise PermissionDenied(
                 "You do not have permission to perform this action."
             )
+
+        # Send the invitation email from a worker, off the request path
+        jobs.enqueue(
+            'send_invitation_email', created_by=user,
+            invitation_id=serializer.instance.pk
+        )
             
         headers = self.get_success_headers(serializer.data)
         return Response(
@@ -257,39 +337,581 @@ class InvitationViewSet(
         )
 
 
-class ShiftViewSet(viewsets.ModelViewSet):
+class ShiftScopeMixin:
     """
-    A ViewSet for viewing and editing shifts.
+    Role scoping and branch permissions shared by the viewsets of shifts
+    and of the rows that belong to them, such as claims and recurring
+    patterns.
     """
-    queryset = Shift.objects.all()
-    serializer_class = ShiftSerializer
-
-    def get_queryset(self):
+    def scope_queryset(
+        self, queryset, branch_field='branch', region_field='branch__region'
+    ):
         """
-        Custom get_queryset to filter shifts based on the user's role.
+        Filters a shift queryset down to what the user's role may see.
+
+        Querysets of rows related to shifts, such as claims or tombstones,
+        can be scoped the same way by naming their branch and region
+        fields.
         """
         user = self.request.user
-        queryset = Shift.objects.all()
 
         if user.is_authenticated:
+            scope = scopes.get_scope(user)
             if user.role in ['branch_manager', 'employee']:
-                if user.branch:
-                    queryset = queryset.filter(branch=user.branch)
+                if scope['branch_id']:
+                    queryset = queryset.filter(
+                        **{f'{branch_field}_id': scope['branch_id']}
+                    )
             elif user.role == 'floating_employee':
-                if user.branch and user.branch.region:
-                    queryset = queryset.filter(branch__region=user.branch.region)
+                if scope['branch_region_id']:
+                    queryset = queryset.filter(
+                        **{f'{region_field}_id': scope['branch_region_id']}
+                    )
             elif user.role == 'head_office':
                 # Head office can see all shifts
                 pass
-            
+
         return queryset
 
+    def can_manage_branch(self, branch):
+        """
+        Returns whether the current user may post or edit shifts at a branch.
+        """
+        user = self.request.user
+        if user.is_staff or user.role == 'head_office':
+            return True
+        elif user.role == 'region_manager':
+            return branch.region_id == user.region_id
+        elif user.role in ['manager', 'branch_manager']:
+            return branch.pk == user.branch_id
+        return False
+
+    def get_date_range(self, default_days=28, max_days=366):
+        """
+        Reads the `start` and `end` dates of a report, defaulting to the
+        next `default_days` days.
+
+        Returns:
+            tuple: Aware datetimes for the start of `start` and the end of
+            `end`.
+        """
+        params = self.request.query_params
+        try:
+            start = (
+                date.fromisoformat(params['start']) if params.get('start')
+                else timezone.localdate()
+            )
+            end = (
+                date.fromisoformat(params['end']) if params.get('end')
+                else start + timedelta(days=default_days)
+            )
+        except ValueError:
+            raise ValidationError(
+                {'detail': 'Dates must be in YYYY-MM-DD format.'}
+            )
+        if end < start or (end - start).days > max_days:
+            raise ValidationError({'detail': (
+                f'The end date must be on or after the start date and at '
+                f'most {max_days} days later.'
+            )})
+
+        def as_datetime(day):
+            return timezone.make_aware(datetime.combine(day, time.min))
+
+        return as_datetime(start), as_datetime(end + timedelta(days=1))
+
+
+class ShiftViewSet(ShiftScopeMixin, viewsets.ModelViewSet):
+    """
+    A ViewSet for viewing and editing shifts.
+    """
+    queryset = Shift.objects.all()
+    serializer_class = ShiftSerializer
+    pagination_class = ShiftCursorPagination
+
+    def get_queryset(self):
+        """
+        Custom get_queryset to filter shifts based on the user's role.
+        """
+        fields = self.get_serializer().fields
+        return self.scope_queryset(Shift.objects.with_details(fields))
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists shifts through the fast read-only path unless the client asked
+        for a sparse fieldset, which needs the full serializer.
+
+        The response carries `ETag` and `Last-Modified` validators taken
+        from the shifts in scope and their claims, and a 304 is returned
+        while they still match the client's copy.
+        """
+        def build():
+            if not use_fast_list(request):
+                return super(ShiftViewSet, self).list(
+                    request, *args, **kwargs
+                )
+
+            queryset = self.filter_queryset(
+                self.scope_queryset(Shift.objects.all())
+            ).values(*fast_lists.SHIFT_VALUES)
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(
+                    fast_lists.serialize_shifts(page)
+                )
+            return Response(fast_lists.serialize_shifts(list(queryset)))
+
+        return conditional_response(
+            request, self.scope_queryset(Shift.objects.all()), build,
+            related=('claims',)
+        )
+
     def perform_create(self, serializer):
         """
         Set the `posted_by` field to the current authenticated user.
         """
-        serializer.save(posted_by=self.request.user)
+        shift = serializer.save(posted_by=self.request.user)
+        realtime.publish(
+            'shift.created', shift.branch_id,
+            shift=realtime.shift_payload(shift)
+        )
     
+    def validate_bulk_rows(self, serializer_class):
+        """
+        Validates every row of a bulk request in a single pass.
+
+        Returns:
+            tuple: A list of (index, validated_data) pairs for the valid rows
+            and a list of per-row errors for the invalid ones.
+        """
+        rows = self.request.data
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError(
+                {'detail': 'Expected a non-empty list of shifts.'}
+            )
+        max_rows = settings.SHIFT_BULK_MAX_ROWS
+        if len(rows) > max_rows:
+            raise ValidationError(
+                {'detail': f'A bulk request may contain at most {max_rows} '
+                           'shifts.'}
+            )
+
+        valid, errors = [], []
+        for index, row in enumerate(rows):
+            serializer = serializer_class(data=row)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        return valid, errors
+
+    def publish_bulk(self, event_type, shifts):
+        """
+        Publishes one board event per branch listing the affected shift IDs,
+        rather than one event per shift.
+        """
+        by_branch = {}
+        for shift in shifts:
+            by_branch.setdefault(shift.branch_id, []).append(shift.pk)
+        for branch_id, ids in by_branch.items():
+            realtime.publish(event_type, branch_id, ids=ids)
+
+    def bulk_error_response(self, errors):
+        return Response(
+            {'errors': sorted(errors, key=lambda error: error['index'])},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(
+        detail=False, methods=['post'],
+        permission_classes=[IsManagerOrReadOnly]
+    )
+    def bulk_create(self, request):
+        """
+        Creates many shifts in one request.
+
+        Expects a list of shifts. Branches are resolved with one query and
+        the shifts are written with `bulk_create` in a single transaction.
+        If any row is invalid nothing is written and the per-row errors are
+        returned.
+        """
+        rows, errors = self.validate_bulk_rows(ShiftBulkCreateSerializer)
+
+        branches = Branch.objects.in_bulk({data['branch'] for _, data in rows})
+        shifts = []
+        for index, data in rows:
+            branch = branches.get(data['branch'])
+            if branch is None:
+                errors.append(
+                    {'index': index, 'errors': {'branch': ['Invalid branch.']}}
+                )
+            elif not self.can_manage_branch(branch):
+                errors.append({'index': index, 'errors': {'branch': [
+                    'You cannot post shifts for this branch.'
+                ]}})
+            else:
+                shifts.append(Shift(
+                    branch=branch,
+                    posted_by=request.user,
+                    start_time=data['start_time'],
+                    end_time=data['end_time'],
+                    role=data['role'],
+                    description=data.get('description', ''),
+                ))
+
+        if errors:
+            return self.bulk_error_response(errors)
+
+        with transaction.atomic():
+            created = Shift.objects.bulk_create(
+                shifts, batch_size=settings.SHIFT_BULK_BATCH_SIZE
+            )
+            sync_stats([], [DailyShiftStat.key_for(s) for s in created])
+            self.publish_bulk('shifts.created', created)
+
+        return Response(
+            {'created': len(created), 'ids': [shift.pk for shift in created]},
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(
+        detail=False, methods=['post'],
+        permission_classes=[IsManagerOrReadOnly]
+    )
+    def bulk_update(self, request):
+        """
+        Updates the status of many shifts in one request.
+
+        Expects a list of `{"id": ..., "status": ...}` objects. The shifts
+        are loaded with one query and written with `bulk_update` in a single
+        transaction. Reopened shifts lose their assignee, and the claim that
+        was approved for them is declined. If any row is invalid nothing is
+        written and the per-row errors are returned.
+        """
+        rows, errors = self.validate_bulk_rows(ShiftBulkStatusSerializer)
+
+        with transaction.atomic():
+            shifts = Shift.objects.select_for_update().in_bulk(
+                {data['id'] for _, data in rows}
+            )
+            branches = Branch.objects.in_bulk(
+                {shift.branch_id for shift in shifts.values()}
+            )
+            seen = set()
+            updates = []
+            for index, data in rows:
+                shift = shifts.get(data['id'])
+                if shift is None:
+                    errors.append(
+                        {'index': index, 'errors': {'id': ['Invalid shift.']}}
+                    )
+                elif data['id'] in seen:
+                    errors.append({'index': index, 'errors': {'id': [
+                        'This shift appears more than once.'
+                    ]}})
+                elif not self.can_manage_branch(branches[shift.branch_id]):
+                    errors.append({'index': index, 'errors': {'id': [
+                        'You cannot edit shifts for this branch.'
+                    ]}})
+                else:
+                    updates.append((shift, data['status']))
+                seen.add(data['id'])
+
+            if errors:
+                return self.bulk_error_response(errors)
+
+            previous_keys = []
+            reopened = []
+            now = timezone.now()
+            for shift, new_status in updates:
+                previous_keys.append(DailyShiftStat.key_for(shift))
+                # Record when a shift is first covered, and forget it and
+                # the assignee if the shift is reopened
+                if new_status == 'open':
+                    shift.filled_at = None
+                    shift.assigned_to_id = None
+                    reopened.append(shift.pk)
+                elif shift.status == 'open':
+                    shift.filled_at = now
+                shift.status = new_status
+                shift.updated_at = now
+            changed = [shift for shift, _ in updates]
+            Shift.objects.bulk_update(
+                changed, ['status', 'assigned_to', 'filled_at', 'updated_at'],
+                batch_size=settings.SHIFT_BULK_BATCH_SIZE
+            )
+            # The former assignee no longer holds the shift, so their claim
+            # must not stay approved
+            ShiftClaim.objects.filter(
+                shift_id__in=reopened, status='approved'
+            ).update(status='declined', decided_at=now, updated_at=now)
+            sync_stats(
+                previous_keys, [DailyShiftStat.key_for(s) for s in changed]
+            )
+            self.publish_bulk('shifts.updated', changed)
+
+        return Response({'updated': len(changed)})
+
+    def get_manageable_branches(self):
+        """
+        Returns the branches the current user may post shifts at, matching
+        `can_manage_branch`.
+        """
+        user = self.request.user
+        branches = Branch.objects.all()
+        if user.is_staff or user.role == 'head_office':
+            return branches
+        elif user.role == 'region_manager':
+            return branches.filter(region_id=user.region_id)
+        elif user.role in ['manager', 'branch_manager']:
+            return branches.filter(pk=user.branch_id)
+        return branches.none()
+
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        parser_classes=(MultiPartParser, FormParser),
+        permission_classes=[IsManagerOrReadOnly]
+    )
+    def import_rota(self, request):
+        """
+        Imports shifts from an uploaded CSV or iCalendar rota file.
+
+        The upload is parsed row by row and inserted in batches. Rows that
+        are invalid, or that refer to a branch the user cannot manage, are
+        skipped and reported.
+
+        Uploads larger than `ROTA_IMPORT_INLINE_MAX_BYTES`, or sent with
+        `background=true`, are saved and imported by a background job
+        instead; the response is then a 202 with the job to poll.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'detail': 'A rota file is required.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fmt = request.data.get('format') or detect_format(upload.name)
+        if fmt not in PARSERS:
+            return Response(
+                {'detail': f"Unsupported format '{fmt}'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        background = str(request.data.get('background', '')).lower()
+        if (
+            background in ('1', 'true', 'yes')
+            or upload.size > settings.ROTA_IMPORT_INLINE_MAX_BYTES
+        ):
+            path = default_storage.save(
+                f'imports/{uuid.uuid4().hex}.{fmt}', upload
+            )
+            job = jobs.enqueue(
+                'import_rota', created_by=request.user, path=path, fmt=fmt,
+                user_id=request.user.pk,
+                branch_ids=list(self.get_manageable_branches().values_list(
+                    'pk', flat=True
+                )),
+            )
+            return Response(
+                JobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+            )
+
+        importer = RotaImporter(
+            request.user, branches=self.get_manageable_branches()
+        )
+        stream = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+        try:
+            result = importer.run(PARSERS[fmt](stream))
+        except (UnicodeDecodeError, csv.Error) as error:
+            return Response(
+                {'detail': f'Could not read the rota file: {error}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Streams every shift in the user's scope, with claims and assignees,
+        as CSV (the default) or NDJSON (`?output=ndjson`).
+
+        Rows are read with a server-side iterator over a flat `values()`
+        projection and written out as they arrive, so memory use stays flat
+        however many shifts are exported.
+        """
+        user = request.user
+        if not (user.is_staff or user.role in [
+            'manager', 'branch_manager', 'region_manager', 'head_office'
+        ]):
+            raise PermissionDenied("Only managers can export shifts.")
+
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {'detail': f"Unsupported output '{output}'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        render, content_type = EXPORT_FORMATS[output]
+        rows = iter_export_rows(self.scope_queryset(Shift.objects.all()))
+        response = StreamingHttpResponse(
+            render(rows), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shifts.{output}"'
+        )
+        return response
+
+    def get_candidate_limit(self):
+        """
+        Reads the `limit` query parameter of the matching actions.
+        """
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return settings.MATCHING_CANDIDATES_PER_SHIFT
+        try:
+            limit = int(limit)
+            if not 1 <= limit <= 50:
+                raise ValueError
+        except ValueError:
+            raise ValidationError(
+                {'limit': ['Must be a number between 1 and 50.']}
+            )
+        return limit
+
+    @action(detail=True, methods=['get'])
+    def candidates(self, request, pk=None):
+        """
+        Custom action to rank the staff best placed to cover an open shift.
+        """
+        shift = self.get_object()
+        if not self.can_manage_branch(shift.branch):
+            raise PermissionDenied(
+                "You can only view candidates for shifts you manage."
+            )
+        if shift.status != 'open':
+            return Response(
+                {'error': 'This shift is not open.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        row = {
+            'id': shift.pk, 'branch_id': shift.branch_id,
+            'start_time': shift.start_time, 'end_time': shift.end_time,
+        }
+        matcher = ShiftMatcher([row], limit=self.get_candidate_limit())
+        return Response(matcher.run()[0])
+
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        """
+        Custom action to rank candidates for every open shift the manager
+        can post at, a page of shifts at a time. `branch_id` narrows the
+        shifts down to one branch.
+        """
+        user = request.user
+        if not (user.is_staff or user.role in [
+            'manager', 'branch_manager', 'region_manager', 'head_office'
+        ]):
+            raise PermissionDenied("Only managers can view suggestions.")
+
+        queryset = Shift.objects.filter(
+            status='open',
+            branch__in=self.get_manageable_branches(),
+        )
+        branch_id = request.query_params.get('branch_id')
+        if branch_id:
+            queryset = queryset.filter(branch_id=branch_id)
+        rows = queryset.values('id', 'branch_id', 'start_time', 'end_time')
+
+        page = self.paginate_queryset(rows)
+        matcher = ShiftMatcher(
+            page if page is not None else rows,
+            limit=self.get_candidate_limit()
+        )
+        if page is not None:
+            return self.get_paginated_response(matcher.run())
+        return Response(matcher.run())
+
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """
+        Custom action to report double bookings: pairs of overlapping
+        shifts assigned to the same person between the `start` and `end`
+        dates, where at least one of the shifts is at a branch the manager
+        can post at.
+
+        Every assigned shift in the range is read with one indexed query
+        and the overlaps are found with a sweep per person, rather than a
+        query per shift.
+        """
+        user = request.user
+        if not (user.is_staff or user.role in [
+            'manager', 'branch_manager', 'region_manager', 'head_office'
+        ]):
+            raise PermissionDenied("Only managers can view conflicts.")
+
+        start, end = self.get_date_range()
+        branch_ids = set(
+            self.get_manageable_branches().values_list('pk', flat=True)
+        )
+        in_range = Shift.objects.filter(
+            assigned_to__isnull=False
+        ).overlapping(start, end)
+        rows = in_range.filter(
+            assigned_to__in=in_range.filter(
+                branch_id__in=branch_ids
+            ).values('assigned_to')
+        ).values_list(
+            'assigned_to_id', 'start_time', 'end_time', 'id', 'branch_id'
+        )
+
+        by_user = {}
+        for user_id, *shift in rows:
+            by_user.setdefault(user_id, []).append(tuple(shift))
+
+        conflicts = []
+        for user_id, shifts in by_user.items():
+            for first, second in overlapping_pairs(shifts):
+                if first[3] in branch_ids or second[3] in branch_ids:
+                    conflicts.append({
+                        'user': user_id,
+                        'shifts': [first[2], second[2]],
+                        'overlap_start': max(first[0], second[0]),
+                        'overlap_end': min(first[1], second[1]),
+                    })
+        conflicts.sort(key=lambda item: (item['overlap_start'], item['user']))
+        return Response({'count': len(conflicts), 'results': conflicts})
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Custom action to return the shifts and claims created, updated or
+        deleted since the `since` token from a previous call.
+
+        Without a token, or with one too old to be served from the
+        tombstones, the whole rota in scope is returned with `reset` set.
+        Large responses are split into pages: while `has_more` is set the
+        client calls again with the token it was given.
+        """
+        tombstones = self.scope_queryset(
+            Tombstone.objects.all(), 'branch', 'region'
+        )
+        try:
+            data = sync.collect_changes(
+                self.scope_queryset(Shift.objects.all()),
+                self.scope_queryset(
+                    ShiftClaim.objects.all(), 'shift__branch',
+                    'shift__branch__region'
+                ),
+                tombstones,
+                token=request.query_params.get('since'),
+            )
+        except sync.InvalidToken as error:
+            raise ValidationError({'since': [str(error)]})
+        return Response(data)
+
     @action(detail=True, methods=['post'])
     def claim(self, request, pk=None):
         """
@@ -304,89 +926,244 @@ class ShiftViewSet(viewsets.ModelViewSet):
         if shift.status != 'open':
             return Response({'error': 'This shift is not open for claims.'}, status=400)
 
-        try:
-            # Use get_or_create to atomically check for and create the claim
-            claim, created = ShiftClaim.objects.get_or_create(
-                shift=shift,
-                user=user,
-                defaults={'status': 'pending'}
+        if has_clash(user.pk, shift):
+            return Response(
+                {'error': 'This shift clashes with a shift you are already '
+                          'working.'},
+                status=400
             )
-            
-            if not created:
-                # If the claim was not created, it means it already exists
-                return Response({'error': 'You have already submitted a claim for this shift.'}, status=400)
 
+        try:
+            with transaction.atomic():
+                # Use get_or_create to atomically check for and create the claim
+                claim, created = ShiftClaim.objects.get_or_create(
+                    shift=shift,
+                    user=user,
+                    defaults={'status': 'pending'}
+                )
+
+                if not created:
+                    # If the claim was not created, it means it already exists
+                    return Response({'error': 'You have already submitted a claim for this shift.'}, status=400)
+
+                Shift.objects.filter(
+                    pk=shift.pk, first_claimed_at__isnull=True
+                ).update(
+                    first_claimed_at=claim.created_at,
+                    updated_at=timezone.now()
+                )
+
+            realtime.publish(
+                'shift.claimed', shift.branch_id,
+                claim=realtime.claim_payload(claim)
+            )
             return Response({'status': 'Shift claimed successfully.'}, status=201)
 
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
 
-class ShiftClaimViewSet(viewsets.ModelViewSet):
+class RecurringShiftViewSet(ShiftScopeMixin, viewsets.ModelViewSet):
+    """
+    A ViewSet for posting shifts that repeat on a pattern.
+
+    Saving a pattern is a single write; its occurrences within the rolling
+    window are then posted as shifts by a background job, and later ones
+    are computed when read through the `occurrences` actions.
+    """
+    queryset = RecurringShift.objects.all()
+    serializer_class = RecurringShiftSerializer
+    pagination_class = CreatedAtCursorPagination
+    permission_classes = [IsManagerOrReadOnly]
+
+    def get_queryset(self):
+        return self.scope_queryset(self.queryset)
+
+    def check_branch(self, branch):
+        if not self.can_manage_branch(branch):
+            raise PermissionDenied(
+                "You cannot post shifts for this branch."
+            )
+
+    def perform_create(self, serializer):
+        self.check_branch(serializer.validated_data['branch'])
+        template = serializer.save(posted_by=self.request.user)
+        jobs.enqueue(
+            'materialize_recurring_shifts', created_by=self.request.user,
+            template_id=template.pk
+        )
+
+    def perform_update(self, serializer):
+        self.check_branch(serializer.instance.branch)
+        if 'branch' in serializer.validated_data:
+            self.check_branch(serializer.validated_data['branch'])
+        template = serializer.save()
+        jobs.enqueue(
+            'materialize_recurring_shifts', created_by=self.request.user,
+            template_id=template.pk
+        )
+
+    def perform_destroy(self, instance):
+        """
+        Deletes a pattern along with its upcoming occurrences that are
+        still open and unclaimed. Past and claimed ones are kept.
+        """
+        self.check_branch(instance.branch)
+        with transaction.atomic():
+            instance.shifts.filter(
+                status='open', start_time__gte=timezone.now(),
+                claims__isnull=True,
+            ).delete()
+            instance.delete()
+
+    def occurrence_response(self, templates):
+        start, end = self.get_date_range()
+        return Response(recurrence.expand(templates, start, end))
+
+    @action(detail=True, methods=['get'])
+    def occurrences(self, request, pk=None):
+        """
+        Lists a pattern's occurrences between the `start` and `end` dates,
+        both materialized shifts and the ones still to be posted.
+        """
+        return self.occurrence_response([self.get_object()])
+
+    @action(detail=False, methods=['get'], url_path='occurrences')
+    def all_occurrences(self, request):
+        """
+        Lists the occurrences of every pattern the user can see between
+        the `start` and `end` dates.
+        """
+        return self.occurrence_response(self.get_queryset())
+
+
+class ShiftClaimViewSet(ShiftScopeMixin, viewsets.ModelViewSet):
     """
     A ViewSet for managing ShiftClaim instances.
     """
     queryset = ShiftClaim.objects.all()
     serializer_class = ShiftClaimSerializer
+    pagination_class = CreatedAtCursorPagination
+
+    def list(self, request, *args, **kwargs):
+        """
+        Lists claims through the fast read-only path unless the client asked
+        for a sparse fieldset, which needs the full serializer. Unchanged
+        lists are revalidated with a 304, as for shifts.
+        """
+        def build():
+            if not use_fast_list(request):
+                return super(ShiftClaimViewSet, self).list(
+                    request, *args, **kwargs
+                )
+
+            queryset = self.filter_queryset(
+                ShiftClaim.objects.all()
+            ).values(*fast_lists.CLAIM_VALUES)
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(
+                    fast_lists.serialize_claims(page)
+                )
+            return Response(fast_lists.serialize_claims(list(queryset)))
+
+        return conditional_response(
+            request, ShiftClaim.objects.all(), build
+        )
+
+    def get_queryset(self):
+        """
+        Joins the claimant only when the user field is being rendered.
+        """
+        queryset = super().get_queryset()
+        if 'user' in self.get_serializer().fields:
+            queryset = queryset.select_related('user__branch__region')
+        return queryset
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         """
         Approves a specific shift claim.
+
+        The claim is approved, the shift assigned and any other pending
+        claims on the shift declined in one atomic operation. If another
+        request got there first a 409 is returned.
         """
+        claim = self.get_object()
         try:
-            claim = self.get_object()
-            if claim.status != 'pending':
-                return Response(
-                    {'error': 'Claim is not in a pending state.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Update the claim's status to 'approved'
-            claim.status = 'approved'
-            claim.save()
-            
-            # Find the shift and assign the user to it
-            shift = claim.shift
-            shift.assigned_to = claim.user
-            shift.status = 'claimed'
-            shift.save()
-
-            return Response({'status': 'Shift claim approved.'})
-        except ShiftClaim.DoesNotExist:
+            approve_claim(claim)
+        except ClaimConflict as error:
             return Response(
-                {'error': 'Shift claim not found.'},
-                status=status.HTTP_404_NOT_FOUND
+                {'error': str(error)}, status=status.HTTP_409_CONFLICT
             )
+        return Response({'status': 'Shift claim approved.'})
 
     @action(detail=True, methods=['post'])
     def decline(self, request, pk=None):
         """
         Declines a specific shift claim.
+
+        The shift itself is left untouched: a pending claim never changes
+        its status, so it is still open for the other claimants.
         """
+        claim = self.get_object()
         try:
-            claim = self.get_object()
-            if claim.status != 'pending':
-                return Response(
-                    {'error': 'Claim is not in a pending state.'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Update the claim's status to 'declined'
-            claim.status = 'declined'
-            claim.save()
+            decline_claim(claim)
+        except ClaimConflict as error:
+            return Response(
+                {'error': str(error)}, status=status.HTTP_409_CONFLICT
+            )
+        return Response({'status': 'Shift claim declined.'})
+
+    @action(
+        detail=False, methods=['post'],
+        permission_classes=[IsManagerOrReadOnly]
+    )
+    def batch(self, request):
+        """
+        Approves and declines many claims in one request.
+
+        Expects a list of `{"id": ..., "decision": "approve"|"decline"}`
+        objects and returns a per-claim report. Conflicting decisions, and
+        decisions on claims at branches the caller cannot manage, are
+        reported and skipped; the rest are applied in one transaction.
+        """
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            raise ValidationError(
+                {'detail': 'Expected a non-empty list of decisions.'}
+            )
+        max_rows = settings.SHIFT_BULK_MAX_ROWS
+        if len(rows) > max_rows:
+            raise ValidationError(
+                {'detail': f'A batch may contain at most {max_rows} '
+                           'decisions.'}
+            )
 
-            # Get the shift and return its status to 'open'
-            shift = claim.shift
-            shift.status = 'open'
-            shift.save()
+        decisions, errors = [], []
+        for index, row in enumerate(rows):
+            serializer = ClaimDecisionSerializer(data=row)
+            if serializer.is_valid():
+                decisions.append((
+                    serializer.validated_data['id'],
+                    serializer.validated_data['decision']
+                ))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        if errors:
+            return Response(
+                {'errors': errors}, status=status.HTTP_400_BAD_REQUEST
+            )
 
-            return Response({'status': 'Shift claim declined.'})
-        except ShiftClaim.DoesNotExist:
+        try:
+            results = decide_claims(
+                decisions, can_manage=self.can_manage_branch
+            )
+        except ClaimConflict as error:
             return Response(
-                {'error': 'Shift claim not found.'},
-                status=status.HTTP_404_NOT_FOUND
+                {'error': str(error)}, status=status.HTTP_409_CONFLICT
             )
+        return Response({'results': results})
 
 
 class AnalyticsViewSet(viewsets.ViewSet):
@@ -398,16 +1175,112 @@ class AnalyticsViewSet(viewsets.ViewSet):
     # New method to get the base queryset based on user role
     def get_base_queryset(self):
         user = self.request.user
-        queryset = Shift.objects.all()
+        queryset = DailyShiftStat.objects.filter(count__gt=0)
 
         if user.role == 'branch_manager':
-            return queryset.filter(branch=user.branch)
+            return queryset.filter(branch_id=user.branch_id)
         elif user.role == 'region_manager':
-            return queryset.filter(branch__region=user.region)
+            return queryset.filter(
+                branch_id__in=scopes.get_scope(user)['branch_ids'] or []
+            )
         elif user.is_staff or user.role == 'head_office':
             return queryset
         
-        return Shift.objects.none()
+        return DailyShiftStat.objects.none()
+
+    def filter_by_period(self, queryset, year, month, field='date'):
+        """
+        Restricts the rows to days in the given year/month, by the `date`
+        of rollup rows or the given date or datetime field.
+
+        The period is expressed as a half-open `date` range rather than
+        EXTRACT() lookups, so the database can use the date index. A month
+        on its own (without a year) cannot be expressed as a single range
+        and falls back to the month lookup.
+        """
+        try:
+            year = int(year) if year else None
+            month = int(month) if month else None
+            if month is not None and not 1 <= month <= 12:
+                raise ValueError
+            if year is None:
+                bounds = None
+            elif month is None:
+                bounds = (date(year, 1, 1), date(year + 1, 1, 1))
+            else:
+                bounds = (
+                    date(year, month, 1),
+                    date(year + 1, 1, 1) if month == 12
+                    else date(year, month + 1, 1)
+                )
+            if bounds and isinstance(
+                queryset.model._meta.get_field(field), models.DateTimeField
+            ):
+                bounds = tuple(
+                    timezone.make_aware(datetime.combine(day, time.min))
+                    for day in bounds
+                )
+        except (ValueError, OverflowError):
+            # Includes years out of the range dates can represent
+            raise ValidationError(
+                {'detail': 'Year and month must be valid numbers.'}
+            )
+
+        if bounds is None:
+            if month is not None:
+                queryset = queryset.filter(**{f'{field}__month': month})
+            return queryset
+
+        start, end = bounds
+        return queryset.filter(
+            **{f'{field}__gte': start, f'{field}__lt': end}
+        )
+
+    def get_shift_queryset(self):
+        """
+        Returns the shifts behind the user's analytics, in line with
+        `get_base_queryset` and the `branch_id`/`region_id` filters.
+        """
+        user = self.request.user
+        queryset = Shift.objects.all()
+
+        if user.role == 'branch_manager':
+            queryset = queryset.filter(branch_id=user.branch_id)
+        elif user.role == 'region_manager':
+            queryset = queryset.filter(
+                branch_id__in=scopes.get_scope(user)['branch_ids'] or []
+            )
+        elif not (user.is_staff or user.role == 'head_office'):
+            return Shift.objects.none()
+
+        branch_id = self.request.query_params.get('branch_id')
+        region_id = self.request.query_params.get('region_id')
+        if branch_id:
+            queryset = queryset.filter(branch__id=branch_id)
+        elif region_id:
+            queryset = queryset.filter(branch__region__id=region_id)
+        return queryset
+
+    def cached_response(self, name, compute):
+        """
+        Serves an analytics response from the cache, calling `compute` to
+        build it on a miss. The `X-Cache` header reports which one happened.
+
+        Clients revalidating with `If-None-Match` or `If-Modified-Since` get
+        a 304 while the shifts in scope are unchanged, before the cache is
+        consulted at all.
+        """
+        def build():
+            data, hit = analytics_cache.get_or_compute(
+                name, self.request.user, self.request.query_params, compute
+            )
+            response = Response(data)
+            response['X-Cache'] = 'HIT' if hit else 'MISS'
+            return response
+
+        return conditional_response(
+            self.request, self.get_shift_queryset(), build
+        )
 
     # This is a key action that counts all shifts by branch
     @action(detail=False, methods=['get'])
@@ -423,12 +1296,14 @@ class AnalyticsViewSet(viewsets.ViewSet):
         elif region_id:
             queryset = queryset.filter(branch__region__id=region_id)
 
-        # The corrected query
+        # Sum the pre-aggregated daily counts per branch
         data = queryset.values(
             name=F('branch__name')
-            ).annotate(value=Count('branch')).order_by('branch__name')
+            ).annotate(value=Sum('count')).order_by('branch__name')
         
-        return Response(data)
+        return self.cached_response(
+            'all_shifts_by_branch', lambda: list(data)
+        )
 
     @action(detail=False, methods=['get'], url_path='all-shifts-timeline')
     def all_shifts_timeline(self, request):
@@ -446,31 +1321,288 @@ class AnalyticsViewSet(viewsets.ViewSet):
         elif region_id:
             queryset = queryset.filter(branch__region__id=region_id)
 
-        # Apply year and month filtering
-        year = request.query_params.get('year')
-        month = request.query_params.get('month')
+        def compute():
+            # Apply year and month filtering
+            filtered = self.filter_by_period(queryset, year, month)
 
-        if year:
-            queryset = queryset.filter(start_time__year=year)
-        if month:
-            queryset = queryset.filter(start_time__month=month)
-
-        data = queryset.annotate(
-            day=ExtractDay('start_time')
-        ).values('day', 'status').annotate(
-            count=Count('pk')
-        ).order_by('day', 'status')
-
-        transformed_data = {}
-        for item in data:
-            day = item['day']
-            status = item['status']
-            count = item['count']
-
-            if day not in transformed_data:
-                transformed_data[day] = {'day': day}
-            
-            transformed_data[day][status] = count
-        
-        return Response(list(transformed_data.values()))
+            data = filtered.annotate(
+                day=ExtractDay('date')
+            ).values('day', 'status').annotate(
+                total=Sum('count')
+            ).order_by('day', 'status')
+
+            transformed_data = {}
+            for item in data:
+                day = item['day']
+                status = item['status']
+                count = item['total']
+
+                if day not in transformed_data:
+                    transformed_data[day] = {'day': day}
+                
+                transformed_data[day][status] = count
+
+            return list(transformed_data.values())
+
+        return self.cached_response('all_shifts_timeline', compute)
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """
+        Returns the dashboard metrics per branch and period: shift counts
+        by status, fill rate, claims per shift, hours covered and the
+        average time from a claim being made to it being approved.
+
+        Everything is computed in one query: claim counts and time-to-fill
+        are correlated subqueries per shift, aggregated with conditional
+        counts and sums grouped by branch and `granularity` (`day`, `week`
+        or `month`). `year`, `month`, `branch_id` and `region_id` filter
+        as for the other actions. Responses depend on claims as well as
+        shifts, so they are not served from the analytics cache, but they
+        support conditional GET on both.
+        """
+        granularity = request.query_params.get('granularity', 'month')
+        if granularity not in SUMMARY_GRANULARITIES:
+            raise ValidationError({'granularity': [
+                f"Must be one of: {', '.join(SUMMARY_GRANULARITIES)}."
+            ]})
+        queryset = self.filter_by_period(
+            self.get_shift_queryset(),
+            request.query_params.get('year'),
+            request.query_params.get('month'),
+            field='start_time',
+        )
+
+        def build():
+            claims = ShiftClaim.objects.filter(
+                shift=OuterRef('pk')
+            ).order_by()
+            claim_count = claims.values('shift').annotate(
+                count=Count('pk')
+            ).values('count')
+            time_to_fill = claims.filter(status='approved').annotate(
+                duration=ExpressionWrapper(
+                    F('decided_at') - F('created_at'),
+                    output_field=DurationField()
+                )
+            ).values('duration')[:1]
+            covered = Q(status__in=('claimed', 'filled'))
+
+            rows = queryset.annotate(
+                period=Trunc(
+                    'start_time', granularity,
+                    output_field=models.DateField()
+                ),
+                claim_count=Coalesce(Subquery(claim_count), 0),
+                time_to_fill=Subquery(
+                    time_to_fill, output_field=DurationField()
+                ),
+            ).values(
+                'branch_id', 'branch__name', 'period'
+            ).annotate(
+                total=Count('pk'),
+                open=Count('pk', filter=Q(status='open')),
+                claimed=Count('pk', filter=Q(status='claimed')),
+                filled=Count('pk', filter=Q(status='filled')),
+                claims=Sum('claim_count'),
+                avg_time_to_fill=Avg('time_to_fill'),
+                hours_covered=Sum(
+                    ExpressionWrapper(
+                        F('end_time') - F('start_time'),
+                        output_field=DurationField()
+                    ),
+                    filter=covered,
+                ),
+            ).order_by('period', 'branch__name')
+
+            def hours(duration):
+                if duration is None:
+                    return None
+                return round(duration.total_seconds() / 3600, 2)
+
+            return Response([
+                {
+                    'branch_id': row['branch_id'],
+                    'branch': row['branch__name'],
+                    'period': row['period'],
+                    'total': row['total'],
+                    'open': row['open'],
+                    'claimed': row['claimed'],
+                    'filled': row['filled'],
+                    'fill_rate': round(
+                        (row['claimed'] + row['filled']) / row['total'], 4
+                    ),
+                    'claims_per_shift': round(row['claims'] / row['total'], 2),
+                    'avg_time_to_fill_hours': hours(row['avg_time_to_fill']),
+                    'hours_covered': hours(row['hours_covered']) or 0,
+                }
+                for row in rows
+            ])
+
+        return conditional_response(
+            request, queryset, build, related=('claims',)
+        )
+
+    def duration_percentiles(self, queryset, start, end):
+        """
+        Returns nearest-rank percentiles of the time between two datetime
+        fields per branch, in hours.
+
+        Shifts are ranked within their branch by duration with window
+        functions and only the rows at the percentile ranks are fetched,
+        so no more than a few rows per branch leave the database.
+
+        Returns:
+            dict: `{'count', 'p50', ...}` per branch id.
+        """
+        def duration():
+            return ExpressionWrapper(
+                F(end) - F(start), output_field=DurationField()
+            )
+
+        ranked = queryset.filter(**{
+            f'{start}__isnull': False, f'{end}__isnull': False,
+        }).annotate(
+            duration=duration(),
+            rank=Window(
+                RowNumber(), partition_by=[F('branch_id')],
+                order_by=[duration().asc(), F('pk').asc()],
+            ),
+            total=Window(Count('pk'), partition_by=[F('branch_id')]),
+        ).annotate(**{
+            # Nearest rank, ceil(total * pct / 100), in integer arithmetic
+            # so it is exact; each row comes back with every percentile's
+            # rank and is matched against them as is
+            f'p{pct}_rank': (F('total') * pct + 99) / 100
+            for pct in FILL_TIME_PERCENTILES
+        })
+        at_percentiles = Q()
+        for pct in FILL_TIME_PERCENTILES:
+            at_percentiles |= Q(rank=F(f'p{pct}_rank'))
+
+        results = {}
+        for row in ranked.filter(at_percentiles).values(
+            'branch_id', 'rank', 'total', 'duration',
+            *(f'p{pct}_rank' for pct in FILL_TIME_PERCENTILES)
+        ):
+            result = results.setdefault(row['branch_id'], {
+                'count': row['total'],
+                **{f'p{pct}': None for pct in FILL_TIME_PERCENTILES},
+            })
+            hours = round(row['duration'].total_seconds() / 3600, 2)
+            for pct in FILL_TIME_PERCENTILES:
+                if row['rank'] == row[f'p{pct}_rank']:
+                    result[f'p{pct}'] = hours
+        return results
+
+    @action(detail=False, methods=['get'], url_path='time-to-fill')
+    def time_to_fill(self, request):
+        """
+        Returns each branch's claim funnel (shifts posted, claimed and
+        filled; claims made, approved, declined and pending) and the
+        distributions of the hours from a shift being posted to its first
+        claim and to being filled.
+
+        The funnel is one conditional aggregation and each distribution is
+        one windowed query. `year`, `month`, `branch_id` and `region_id`
+        filter as for the other actions; shifts posted before posting
+        times were recorded are left out of the distributions.
+        """
+        queryset = self.filter_by_period(
+            self.get_shift_queryset(),
+            request.query_params.get('year'),
+            request.query_params.get('month'),
+            field='start_time',
+        )
+
+        def build():
+            funnel = queryset.values('branch_id', 'branch__name').annotate(
+                shifts=Count('pk', distinct=True),
+                claimed=Count(
+                    'pk', distinct=True, filter=Q(claims__isnull=False)
+                ),
+                filled=Count(
+                    'pk', distinct=True,
+                    filter=Q(status__in=('claimed', 'filled'))
+                ),
+                claims_made=Count('claims'),
+                approved=Count('claims', filter=Q(claims__status='approved')),
+                declined=Count('claims', filter=Q(claims__status='declined')),
+                pending=Count('claims', filter=Q(claims__status='pending')),
+            ).order_by('branch__name')
+            first_claim = self.duration_percentiles(
+                queryset, 'created_at', 'first_claimed_at'
+            )
+            fill = self.duration_percentiles(
+                queryset, 'created_at', 'filled_at'
+            )
+            empty = {
+                'count': 0,
+                **{f'p{pct}': None for pct in FILL_TIME_PERCENTILES},
+            }
+
+            return Response([
+                {
+                    'branch_id': row['branch_id'],
+                    'branch': row['branch__name'],
+                    'funnel': {
+                        key: row[key] for key in (
+                            'shifts', 'claimed', 'filled', 'claims_made',
+                            'approved', 'declined', 'pending',
+                        )
+                    },
+                    'time_to_first_claim_hours': first_claim.get(
+                        row['branch_id'], empty
+                    ),
+                    'time_to_fill_hours': fill.get(row['branch_id'], empty),
+                }
+                for row in funnel
+            ])
+
+        return conditional_response(
+            request, queryset, build, related=('claims',)
+        )
+
+    @action(detail=False, methods=['post'])
+    def rebuild(self, request):
+        """
+        Custom action to queue a rebuild of the analytics rollup table.
+        """
+        user = request.user
+        if not (user.is_staff or user.role == 'head_office'):
+            raise PermissionDenied(
+                "You do not have permission to perform this action."
+            )
+        job = jobs.enqueue('rebuild_shift_stats', created_by=user)
+        return Response(
+            JobSerializer(job).data, status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """
+        Returns the analytics cache hit and miss counters.
+        """
+        user = request.user
+        if not (user.is_staff or user.role == 'head_office'):
+            raise PermissionDenied(
+                "You do not have permission to perform this action."
+            )
+        return Response(analytics_cache.get_stats())
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    A viewset for polling the status of background jobs.
 
+    Users see the jobs they started; head office and staff see all jobs.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff or user.role == 'head_office':
+            return self.queryset
+        return self.queryset.filter(created_by=user)
@@ -7,7 +7,9 @@ import apiClient from '../api/apiClient.js';
 
 const ShiftList = ({ viewType, onUpdate }) => {
     const { user } = useAuth();
-    const { shifts, loading, error, fetchShifts } = useShiftList();
+    const {
+        shifts, loading, error, fetchShifts, loadMore, hasMore
+    } = useShiftList();
     const [claiming, setClaiming] = useState(false);
 
     useEffect(() => {
@@ -81,6 +83,11 @@ const ShiftList = ({ viewType, onUpdate }) => {
             ) : (
                 <Text color="dimmed">No shifts to display for this view.</Text>
             )}
+            {hasMore && (
+                <Button variant="subtle" onClick={loadMore}>
+                    Load more shifts
+                </Button>
+            )}
         </Stack>
     );
 };
@@ -10,6 +10,7 @@ import { useAuth } from './useAuth.jsx';
 export const useShiftList = () => {
     const { user, loading: authLoading } = useAuth();
     const [shifts, setShifts] = useState([]);
+    const [nextPage, setNextPage] = useState(null);
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
 
@@ -25,7 +26,8 @@ export const useShiftList = () => {
             // The backend's get_queryset will handle filtering shifts based on
             // the user's role
             const response = await apiClient.get('api/shifts/');
-            setShifts(response.data);
+            setShifts(response.data.results);
+            setNextPage(response.data.next);
         } catch (err) {
             console.error("Error fetching shifts:", err);
             setError('Failed to load shifts.');
@@ -34,11 +36,43 @@ export const useShiftList = () => {
         }
     }, [user, authLoading]); // The dependencies for useCallback are the same as useEffect
 
+    // Appends the next page of shifts using the cursor link returned by the
+    // backend.
+    const loadMore = useCallback(async () => {
+        if (!nextPage) return;
+
+        try {
+            const response = await apiClient.get(nextPage);
+            setShifts(prev => [...prev, ...response.data.results]);
+            setNextPage(response.data.next);
+        } catch (err) {
+            console.error("Error fetching more shifts:", err);
+            setError('Failed to load shifts.');
+        }
+    }, [nextPage]);
+
     useEffect(() => {
         // We now call fetchShifts inside this useEffect, which will run when
         // the dependencies (user, authLoading) change.
         fetchShifts();
     }, [fetchShifts]); // Pass the memoized function here
 
-    return { shifts, loading, error, fetchShifts };
+    // Subscribe to the real-time shift board and refresh whenever a shift
+    // or claim in the user's scope changes, instead of polling.
+    useEffect(() => {
+        const token = localStorage.getItem('token');
+        if (!user || authLoading || !token) return;
+
+        const wsUrl = new URL('ws/shifts/', apiClient.defaults.baseURL);
+        wsUrl.protocol = wsUrl.protocol === 'https:' ? 'wss:' : 'ws:';
+        wsUrl.searchParams.set('token', token);
+
+        const socket = new WebSocket(wsUrl);
+        socket.onmessage = () => fetchShifts();
+        return () => socket.close();
+    }, [user, authLoading, fetchShifts]);
+
+    return {
+        shifts, loading, error, fetchShifts, loadMore, hasMore: !!nextPage
+    };
 };
@@ -24,7 +24,7 @@ export const useUserList = () => {
                 // The backend API already handles filtering by role/branch
                 // based on the authenticated user
                 const response = await apiClient.get('api/users/');
-                setUserList(response.data);
+                setUserList(response.data.results);
             } catch (err) {
                 console.error('Failed to fetch user list:', err);
                 setError('Failed to load user data.');